@@ -0,0 +1,84 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from dotenv import load_dotenv
+from sqlalchemy.orm import make_transient_to_detached
+
+from database.models.user import User
+
+load_dotenv()
+
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+AUTH_CACHE_ENTRIES = int(os.getenv("AUTH_CACHE_ENTRIES", "10000"))
+
+
+class PrincipalCache:
+    """
+    Cache zweryfikowanych tokenów w obrębie workera: token -> migawka użytkownika.
+
+    Wpis żyje najwyżej TTL sekund (i nie dłużej niż sam token), więc zmiany
+    w innych workerach są widoczne najpóźniej po TTL. Zmiany w tym workerze
+    (usunięcie użytkownika, zmiana is_active) unieważniają wpisy od razu.
+    """
+
+    def __init__(self, ttl: float = AUTH_CACHE_TTL_SECONDS, max_entries: int = AUTH_CACHE_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple[float, User]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str) -> Optional[User]:
+        """Zwraca odłączoną migawkę użytkownika (do session.merge(..., load=False)) albo None"""
+        if self.ttl <= 0:
+            return None
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[token]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, token: str, user: User, token_exp: Optional[float] = None) -> None:
+        if self.ttl <= 0:
+            return
+        ttl = self.ttl
+        if token_exp is not None:
+            ttl = min(ttl, token_exp - time.time())
+            if ttl <= 0:
+                return
+        # Kopia bez powiązania z sesją żądania - każde kolejne żądanie dołącza ją do własnej sesji
+        snapshot = User(**user.model_dump())
+        make_transient_to_detached(snapshot)
+        with self._lock:
+            self._entries[token] = (time.monotonic() + ttl, snapshot)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def revoke_user(self, user_id: int) -> None:
+        """Usuwa wszystkie tokeny danego użytkownika"""
+        with self._lock:
+            for token in [t for t, (_, u) in self._entries.items() if u.id == user_id]:
+                del self._entries[token]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+principal_cache = PrincipalCache()
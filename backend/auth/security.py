@@ -1,3 +1,5 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 
@@ -7,18 +9,46 @@ from passlib.context import CryptContext
 import os
 from  dotenv import load_dotenv
 
+from services.logger import get_logger
+
 
 load_dotenv()
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+logger = get_logger("auth")
+
+# Koszt bcrypt (log2 liczby rund) - zmiana powoduje przehaszowanie hasła przy kolejnym logowaniu
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Ile haszowań bcrypt może działać naraz w jednym workerze (reszta czeka w kolejce)
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 
-# Funkcje do haszowania/weryfikacji haseł (mogą być też w models.py)
+# bcrypt zwalnia GIL, więc wątki nie blokują pętli zdarzeń ani siebie nawzajem
+_password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+
+# Funkcje do haszowania/weryfikacji haseł
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+def verify_and_update_password(plain_password, hashed_password):
+    """Zwraca (czy hasło poprawne, nowy hash albo None, gdy koszt się nie zmienił)"""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+async def _run_password_task(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(_password_executor, fn, *args)
+
+async def verify_password_async(plain_password, hashed_password):
+    return await _run_password_task(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password):
+    return await _run_password_task(get_password_hash, password)
+
+async def verify_and_update_password_async(plain_password, hashed_password):
+    return await _run_password_task(verify_and_update_password, plain_password, hashed_password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -32,11 +62,10 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
 def decode_access_token(token: str):
     try:
         payload = jwt.decode(token, os.getenv('JWT_SECRET_KEY'), algorithms=[os.getenv("ALGORITHM")])
-        print(f"Token decoded successfully: {payload}")  # Debug log
+        logger.debug("Token decoded for sub=%s", payload.get("sub"))
         return payload
     except JWTError as e:
-        print(f"JWT Error: {e}")  # Debug log
-
+        logger.debug("JWT Error: %s", e)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
@@ -0,0 +1,76 @@
+"""
+Koszt bcrypt dla różnych wartości BCRYPT_ROUNDS oraz wpływ haszowania na pętlę zdarzeń.
+
+Uruchomienie (z katalogu backend):
+    python -m benchmarks.bcrypt_rounds --rounds 10 11 12 13 --logins 20
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from passlib.context import CryptContext
+
+
+def time_rounds(rounds: int, repeat: int) -> float:
+    context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=rounds)
+    hashed = context.hash("benchmark-password")
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        context.verify("benchmark-password", hashed)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+async def loop_lag(logins: int, offload: bool) -> tuple[float, float]:
+    """Zwraca (czas trwania serii logowań, maksymalne opóźnienie pętli zdarzeń) w sekundach"""
+    from auth.security import get_password_hash, verify_password, verify_password_async
+
+    hashed = get_password_hash("benchmark-password")
+    worst = 0.0
+    done = asyncio.Event()
+
+    async def ticker():
+        nonlocal worst
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(0.005)
+            worst = max(worst, time.perf_counter() - start - 0.005)
+
+    async def login():
+        if offload:
+            await verify_password_async("benchmark-password", hashed)
+        else:
+            verify_password("benchmark-password", hashed)
+
+    tick = asyncio.create_task(ticker())
+    await asyncio.sleep(0.01)
+    start = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await tick
+    return elapsed, worst
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, nargs="+", default=[10, 11, 12, 13])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--logins", type=int, default=20)
+    args = parser.parse_args()
+
+    print("rounds  verify_ms")
+    for rounds in args.rounds:
+        print(f"{rounds:>6}  {time_rounds(rounds, args.repeat) * 1000:9.1f}")
+
+    print(f"\n{args.logins} concurrent logins (BCRYPT_ROUNDS from env)")
+    for offload in (False, True):
+        elapsed, worst = asyncio.run(loop_lag(args.logins, offload))
+        mode = "executor" if offload else "inline"
+        print(f"{mode:>8}: total {elapsed * 1000:8.1f} ms, worst event-loop stall {worst * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Sprawdza parsowanie CSV kawałkami, gdy typ kolumny zmienia się między kawałkami
+(np. liczby całkowite w pierwszym kawałku, a dalej tekst): ramka musi dać się zapisać
+do Parquet, a wartości mają zostać takie jak w pliku.
+
+Uruchomienie (z katalogu backend):
+    python -m benchmarks.dtype_checks [--chunk-rows 1000]
+"""
+import argparse
+import os
+import tempfile
+
+import pandas as pd
+
+from services import dtypes
+
+
+def write_csv(path: str, chunk_rows: int) -> None:
+    with open(path, "w") as f:
+        f.write("id,code,score,label\n")
+        for i in range(chunk_rows):
+            # code i score są liczbowe w całym pierwszym kawałku
+            f.write(f"{i},{i},{i / 2 if i % 7 else ''},a{i % 3}\n")
+        for i in range(chunk_rows):
+            f.write(f"{chunk_rows + i},x{i},{'n/d' if i % 2 else ''},a{i % 3}\n")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunk-rows", type=int, default=1_000)
+    args = parser.parse_args()
+
+    dtypes.PARSE_CHUNK_ROWS = args.chunk_rows
+    work_dir = tempfile.mkdtemp(prefix="dataviz-dtypes-")
+    csv_path = os.path.join(work_dir, "mixed.csv")
+    write_csv(csv_path, args.chunk_rows)
+
+    schema, _ = dtypes.infer_schema(csv_path, sample_rows=args.chunk_rows)
+    df = dtypes.compact(dtypes.read_csv_typed(csv_path, schema))
+    parquet_path = os.path.join(work_dir, "mixed.parquet")
+    df.to_parquet(parquet_path, index=False)
+    stored = pd.read_parquet(parquet_path)
+
+    expected = pd.read_csv(csv_path, dtype=str)
+    for col in ("code", "score"):
+        values = stored[col].astype(object)
+        assert values.isna().equals(expected[col].isna()), f"{col}: missing values changed"
+        assert (values.dropna() == expected[col].dropna()).all(), f"{col}: values changed"
+    assert pd.api.types.is_integer_dtype(stored["id"]), "id should stay numeric"
+    print(dtypes.schema_of(stored))
+    print("OK - columns changing type between chunks are stored as text")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Budżet czasu importu aplikacji - kończy się kodem 1, gdy start workera się pogorszy.
+
+Sprawdza, że `import main` mieści się w budżecie i nie ładuje ciężkich bibliotek
+(te są importowane leniwie albo w tle po starcie). Uruchomienie w CI (z katalogu backend):
+    python -m benchmarks.import_budget [--budget 1.0]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+HEAVY_MODULES = ("pandas", "numpy", "matplotlib", "seaborn", "pyarrow")
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import main
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "heavy": [m for m in %r if m in sys.modules]}))
+""" % (HEAVY_MODULES,)
+
+
+def measure(repeat: int) -> tuple[float, list[str]]:
+    """Najlepszy czas importu z kilku świeżych interpreterów"""
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = {**os.environ, "PREWARM_IMPORTS": "false"}
+    best, heavy = float("inf"), []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", _PROBE], cwd=backend_dir, env=env,
+                             capture_output=True, text=True, check=True).stdout
+        result = json.loads(out.strip().splitlines()[-1])
+        best = min(best, result["seconds"])
+        heavy = result["heavy"]
+    return best, heavy
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget", type=float, default=float(os.getenv("IMPORT_BUDGET_SECONDS", "1.0")))
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    seconds, heavy = measure(args.repeat)
+    print(f"import main: {seconds:.3f}s (budget {args.budget:.3f}s)")
+    failures = []
+    if seconds > args.budget:
+        failures.append(f"import time {seconds:.3f}s exceeds budget {args.budget:.3f}s")
+    if heavy:
+        failures.append(f"heavy modules imported at startup: {', '.join(heavy)}")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
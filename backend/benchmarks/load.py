@@ -0,0 +1,219 @@
+"""
+Test obciążeniowy: serwer uvicorn z kilkoma workerami i współbieżni klienci wysyłający
+mieszankę żądań (wykresy z cache i renderowane od nowa, tryb danych, /auth/me, galeria publiczna).
+
+Działa offline - baza SQLite i katalog uploadów w katalogu tymczasowym (albo --database-url).
+Uruchomienie (z katalogu backend):
+    python -m benchmarks.load --workers 4 --concurrency 32 --duration 30 --rows 1m
+        [--output wyniki.json] [--baseline benchmarks/load-baseline.json]
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+import httpx
+
+from benchmarks import results as bench
+from benchmarks.suite import configure, seed_projects
+from benchmarks.synthetic import DATA_DIR, ensure_csv, parse_sizes
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Wagi operacji w mieszance żądań
+MIX = {
+    "chart_cached": 30,
+    "chart_render": 10,
+    "chart_json": 15,
+    "auth_me": 20,
+    "public_gallery": 15,
+    "public_project": 10,
+}
+CHART_TYPES = ("line", "bar", "scatter", "area", "pie")
+CHART_COLUMNS = {
+    "bar": {"x_column": ["category"], "y_columns": ["value"]},
+    "pie": {"x_column": ["category"], "y_columns": ["value"]},
+}
+DEFAULT_COLUMNS = {"x_column": ["x"], "y_columns": ["y"]}
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port: int, workers: int, env: dict) -> subprocess.Popen:
+    subprocess.run([sys.executable, "-m", "database.migrate"], cwd=BACKEND_DIR, env=env, check=True,
+                   stdout=subprocess.DEVNULL)
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+        cwd=BACKEND_DIR, env=env,
+    )
+
+
+async def wait_ready(client: httpx.AsyncClient, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.25)
+    raise RuntimeError("server did not become ready")
+
+
+async def prepare(client: httpx.AsyncClient, csv_path: str) -> tuple[dict, str]:
+    """Rejestracja, logowanie i upload danych; zwraca (nagłówki z tokenem, dataset_id)"""
+    credentials = {"email": f"load-{os.getpid()}@example.com", "password": "benchmark"}
+    await client.post("/auth/register", json=credentials)
+    token = (await client.post("/auth/login", json=credentials)).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    with open(csv_path, "rb") as f:
+        response = await client.post("/upload/", files={"file": ("load.csv", f, "text/csv")}, headers=headers,
+                                     timeout=600)
+    response.raise_for_status()
+    dataset_id = response.json()["dataset_id"]
+    while (await client.get(f"/datasets/{dataset_id}", headers=headers)).json().get("status") == "parsing":
+        await asyncio.sleep(0.5)
+    return headers, dataset_id
+
+
+def _chart_body(rng: random.Random, dataset_id: str, **extra) -> dict:
+    chart_type = rng.choice(CHART_TYPES)
+    return {"chartType": chart_type, "columns": CHART_COLUMNS.get(chart_type, DEFAULT_COLUMNS),
+            "dataset_id": dataset_id, **extra}
+
+
+def make_request(op: str, rng: random.Random, headers: dict, dataset_id: str, project_ids: list[int]):
+    """Zwraca (metoda, ścieżka, argumenty httpx) dla operacji z mieszanki"""
+    if op == "chart_cached":
+        return "POST", "/chart/", {"json": _chart_body(rng, dataset_id), "headers": headers}
+    if op == "chart_render":
+        # Losowa szerokość - prawie zawsze nowy klucz cache, czyli pełne renderowanie
+        width = rng.randrange(640, 1920, 4)
+        return "POST", "/chart/", {"json": _chart_body(rng, dataset_id, width=width, height=width * 9 // 16),
+                                   "headers": headers}
+    if op == "chart_json":
+        return "POST", "/chart/", {"json": _chart_body(rng, dataset_id, output="json"), "headers": headers}
+    if op == "auth_me":
+        return "GET", "/auth/me", {"headers": headers}
+    if op == "public_gallery":
+        return "GET", "/public/projects", {"params": {"limit": 20}}
+    return "GET", f"/public/projects/{rng.choice(project_ids)}", {}
+
+
+async def run_load(client: httpx.AsyncClient, concurrency: int, duration: float, headers: dict,
+                   dataset_id: str, project_ids: list[int], seed: int) -> tuple[dict, dict, float]:
+    latencies: dict[str, list[float]] = defaultdict(list)
+    failures: dict[str, int] = defaultdict(int)
+    ops, weights = list(MIX), list(MIX.values())
+    deadline = time.monotonic() + duration
+
+    async def user(index: int) -> None:
+        rng = random.Random(seed + index)
+        while time.monotonic() < deadline:
+            op = rng.choices(ops, weights)[0]
+            method, path, kwargs = make_request(op, rng, headers, dataset_id, project_ids)
+            begin = time.perf_counter()
+            try:
+                response = await client.request(method, path, **kwargs)
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies[op].append((time.perf_counter() - begin) * 1000)
+            else:
+                failures[op] += 1
+
+    started = time.monotonic()
+    await asyncio.gather(*(user(i) for i in range(concurrency)))
+    return latencies, failures, time.monotonic() - started
+
+
+def summarize(latencies: dict, failures: dict, elapsed: float) -> list[dict]:
+    out = []
+    total = 0
+    for op in MIX:
+        samples = latencies.get(op, [])
+        total += len(samples)
+        stats = bench.summarize(samples)
+        extra = {"requests": len(samples), "errors": failures.get(op, 0)}
+        out.append(bench.result(f"load.{op}.p50", stats["median"], **extra))
+        out.append(bench.result(f"load.{op}.p95", stats["p95"]))
+        out.append(bench.result(f"load.{op}.p99", stats["p99"]))
+    out.append(bench.result("load.total.throughput", total / elapsed, "req/s", "higher",
+                            errors=sum(failures.values())))
+    return out
+
+
+async def scenario(args, env: dict, project_ids: list[int], csv_path: str) -> list[dict]:
+    port = _free_port()
+    server = start_server(port, args.workers, env)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=120) as client:
+            await wait_ready(client)
+            headers, dataset_id = await prepare(client, csv_path)
+            if args.warmup:
+                await run_load(client, args.concurrency, args.warmup, headers, dataset_id, project_ids, args.seed)
+            latencies, failures, elapsed = await run_load(client, args.concurrency, args.duration, headers,
+                                                          dataset_id, project_ids, args.seed + 10_000)
+    finally:
+        server.terminate()
+        try:
+            server.wait(30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+    return summarize(latencies, failures, elapsed)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4, help="workery uvicorna")
+    parser.add_argument("--render-workers", type=int, default=1, help="procesy renderujące na worker")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--warmup", type=float, default=5)
+    parser.add_argument("--rows", default="10k", help="rozmiar wgrywanego zbioru: 10k, 1m, 10m lub liczba")
+    parser.add_argument("--public-projects", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--database-url")
+    bench.add_output_arguments(parser)
+    args = parser.parse_args()
+
+    rows = next(iter(parse_sizes(args.rows).values()))
+    csv_path = ensure_csv(rows, args.data_dir)
+    work_dir = tempfile.mkdtemp(prefix="dataviz-load-")
+    configure(work_dir, args.database_url or f"sqlite:///{os.path.join(work_dir, 'load.db')}")
+    env = {**os.environ, "RENDER_WORKERS": str(args.render_workers), "LOG_LEVEL": "WARNING"}
+
+    from sqlmodel import SQLModel, select
+
+    from database.database import engine
+    from database.models.project import Project
+
+    SQLModel.metadata.create_all(engine)
+    user_id = seed_projects(engine, args.public_projects * 2, 5)
+    with engine.connect() as conn:
+        project_ids = conn.execute(
+            select(Project.id).where(Project.user_id == user_id, Project.is_public == True)
+        ).scalars().all()
+
+    results = asyncio.run(scenario(args, env, project_ids, csv_path))
+    bench.print_results(results)
+    meta = bench.run_metadata(suite="load", workers=args.workers, render_workers=args.render_workers,
+                              concurrency=args.concurrency, duration=args.duration, rows=rows, mix=MIX)
+    bench.finish(args, meta, results)
+
+
+if __name__ == "__main__":
+    main()
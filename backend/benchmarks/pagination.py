@@ -0,0 +1,96 @@
+"""
+Czas pobrania strony galerii publicznej: paginacja kursorem vs offset, na dużej tabeli projektów.
+
+Uruchomienie (z katalogu backend):
+    python -m benchmarks.pagination --rows 1000000 [--database-url postgresql://...]
+Domyślnie używa pliku SQLite w katalogu tymczasowym.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from crud.pagination import encode_cursor
+from crud.project import get_public_projects
+from database.models.chart import Chart  # noqa: F401
+from database.models.profile import Profile  # noqa: F401
+from database.models.project import Project
+from database.models.settings import Settings  # noqa: F401
+from database.models.user import User
+
+BATCH = 50_000
+
+
+def seed(engine, rows: int) -> None:
+    with Session(engine) as session:
+        user = User(email="pagination@example.com", hashed_password="x")
+        session.add(user)
+        session.commit()
+        user_id = user.id
+    start = datetime(2020, 1, 1)
+    with engine.begin() as conn:
+        for offset in range(0, rows, BATCH):
+            conn.execute(insert(Project), [
+                {
+                    "title": f"project {i}",
+                    "source_file_path": "bench.csv",
+                    "created_at": start + timedelta(seconds=i),
+                    "is_public": i % 2 == 0,
+                    "user_id": user_id,
+                }
+                for i in range(offset, min(offset + BATCH, rows))
+            ])
+
+
+def timed(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - begin)
+    return statistics.median(samples) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--database-url")
+    args = parser.parse_args()
+
+    url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'pagination.db')}"
+    engine = create_engine(url)
+    SQLModel.metadata.drop_all(engine)
+    SQLModel.metadata.create_all(engine)
+    print(f"seeding {args.rows} projects ...")
+    seed(engine, args.rows)
+
+    public_rows = (args.rows + 1) // 2
+    depths = [d for d in (0, 1_000, 10_000, 100_000, public_rows - args.page_size) if 0 <= d < public_rows]
+    print(f"{'depth':>10} {'keyset_ms':>10} {'offset_ms':>10}")
+    with Session(engine) as session:
+        for depth in depths:
+            cursor = None
+            if depth:
+                # Kursor elementu tuż przed szukaną stroną (tak jak zwróciłaby go poprzednia strona)
+                before = session.exec(
+                    select(Project).where(Project.is_public == True)
+                    .order_by(Project.created_at.desc(), Project.id.desc()).offset(depth - 1).limit(1)
+                ).one()
+                cursor = encode_cursor(before.created_at, before.id)
+            keyset_ms = timed(lambda: get_public_projects(session, cursor, args.page_size), args.repeat)
+            offset_ms = timed(lambda: session.exec(
+                select(Project).where(Project.is_public == True)
+                .order_by(Project.created_at.desc(), Project.id.desc()).offset(depth).limit(args.page_size)
+            ).all(), args.repeat)
+            print(f"{depth:>10} {keyset_ms:>10.2f} {offset_ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Sprawdza, że liczba zapytań SQL w funkcjach CRUD nie zależy od liczby projektów i wykresów.
+
+Uruchomienie (z katalogu backend, domyślnie na SQLite w pamięci):
+    python -m benchmarks.query_counts [--database-url postgresql://...]
+"""
+import argparse
+
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine
+
+from crud.chart_crud import count_charts_in_project, reorder_charts
+from crud.project import delete_project, get_projects_with_charts_count
+from database.models.chart import Chart
+from database.models.profile import Profile  # noqa: F401
+from database.models.project import Project
+from database.models.settings import Settings  # noqa: F401
+from database.models.user import User
+from database.query_counter import assert_num_queries
+
+SIZES = (1, 10, 200)
+
+# Oczekiwana liczba zapytań na wywołanie - stała niezależnie od rozmiaru projektu
+EXPECTED = {
+    "get_projects_with_charts_count": 1,
+    "count_charts_in_project": 1,
+    "reorder_charts": 2,
+    "delete_project": 3,
+}
+
+
+def seed(session: Session, charts_per_project: int) -> tuple[int, list[int]]:
+    user = User(email=f"bench-{charts_per_project}@example.com", hashed_password="x")
+    session.add(user)
+    session.commit()
+    project_ids = []
+    for i in range(charts_per_project):
+        project = Project(title=f"p{i}", source_file_path="bench.csv", user_id=user.id)
+        session.add(project)
+        session.flush()
+        project_ids.append(project.id)
+        session.add_all(
+            Chart(title=f"c{j}", chart_image_path="bench.png", chart_type="line", project_id=project.id, order_index=j)
+            for j in range(charts_per_project)
+        )
+    session.commit()
+    return user.id, project_ids
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default="sqlite://")
+    args = parser.parse_args()
+
+    options = {"poolclass": StaticPool, "connect_args": {"check_same_thread": False}} \
+        if args.database_url.startswith("sqlite") else {}
+    engine = create_engine(args.database_url, **options)
+    SQLModel.metadata.create_all(engine)
+
+    print(f"{'function':<32}" + "".join(f"{size:>8}" for size in SIZES))
+    counts = {name: [] for name in EXPECTED}
+    for size in SIZES:
+        with Session(engine) as session:
+            user_id, project_ids = seed(session, size)
+            session.expunge_all()
+            project_id = project_ids[0]
+            chart_ids = session.exec(Chart.__table__.select().where(Chart.project_id == project_id)).all()
+            orders = [{"chart_id": row.id, "order_index": size - row.order_index} for row in chart_ids]
+
+            calls = {
+                "get_projects_with_charts_count": lambda: get_projects_with_charts_count(session, user_id, limit=size),
+                "count_charts_in_project": lambda: count_charts_in_project(session, project_id),
+                "reorder_charts": lambda: reorder_charts(session, project_id, orders, user_id),
+                "delete_project": lambda: delete_project(session, project_id, user_id),
+            }
+            for name, call in calls.items():
+                with assert_num_queries(engine, EXPECTED[name]) as counter:
+                    call()
+                counts[name].append(counter.count)
+                session.expunge_all()
+
+    for name, row in counts.items():
+        print(f"{name:<32}" + "".join(f"{n:>8}" for n in row))
+    print("OK - query counts do not depend on project size")
+
+
+if __name__ == "__main__":
+    main()
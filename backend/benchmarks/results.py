@@ -0,0 +1,152 @@
+"""
+Wspólny format wyników benchmarków (JSON) i porównanie z zapisanym wynikiem bazowym.
+
+Plik wyników:
+    {"meta": {...}, "results": [{"name": ..., "unit": ..., "value": ..., "better": "lower"|"higher", ...}]}
+Porównanie z bazą (z katalogu backend):
+    python -m benchmarks.results nowe.json --baseline benchmarks/baseline.json [--tolerance 0.2]
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Callable, Optional
+
+DEFAULT_TOLERANCE = 0.2
+
+
+def measure(fn: Callable[[], object], repeat: int = 5, warmup: int = 1) -> dict:
+    """Czasy wywołań fn w milisekundach: mediana, p95, minimum"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - begin) * 1000)
+    return summarize(samples)
+
+
+def summarize(samples_ms: list[float]) -> dict:
+    ordered = sorted(samples_ms)
+    if not ordered:
+        return {"median": 0.0, "p95": 0.0, "p99": 0.0, "min": 0.0, "samples": 0}
+
+    def percentile(q: float) -> float:
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+    return {
+        "median": statistics.median(ordered),
+        "p95": percentile(0.95),
+        "p99": percentile(0.99),
+        "min": ordered[0],
+        "samples": len(ordered),
+    }
+
+
+def result(name: str, value: float, unit: str = "ms", better: str = "lower", **extra) -> dict:
+    return {"name": name, "value": round(float(value), 4), "unit": unit, "better": better, **extra}
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_metadata(**extra) -> dict:
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        **extra,
+    }
+
+
+def write(path: str, meta: dict, results: list[dict]) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"meta": meta, "results": results}, f, indent=2)
+        f.write("\n")
+
+
+def load(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare(current: list[dict], baseline: list[dict], tolerance: float = DEFAULT_TOLERANCE) -> list[dict]:
+    """
+    Zestawia wyniki o tych samych nazwach. Zmiana > 0 oznacza pogorszenie
+    (wolniej dla "lower", mniejsza przepustowość dla "higher").
+    """
+    previous = {r["name"]: r for r in baseline}
+    rows = []
+    for entry in current:
+        base = previous.get(entry["name"])
+        if base is None or not base["value"]:
+            continue
+        ratio = entry["value"] / base["value"]
+        if entry.get("better", "lower") == "lower":
+            change = ratio - 1
+        else:
+            change = 1 / ratio - 1 if ratio else float("inf")
+        rows.append({"name": entry["name"], "baseline": base["value"], "current": entry["value"],
+                     "unit": entry["unit"], "change": change, "regression": change > tolerance})
+    return rows
+
+
+def report(rows: list[dict]) -> bool:
+    """Drukuje tabelę porównania; zwraca True, gdy nie ma regresji"""
+    print(f"{'name':<48} {'baseline':>12} {'current':>12} {'change':>8}")
+    for row in rows:
+        flag = "  REGRESSION" if row["regression"] else ""
+        print(f"{row['name']:<48} {row['baseline']:>12.3f} {row['current']:>12.3f} {row['change']:>+7.1%}{flag}")
+    return not any(row["regression"] for row in rows)
+
+
+def print_results(results: list[dict]) -> None:
+    for entry in results:
+        print(f"{entry['name']:<48} {entry['value']:>12.3f} {entry['unit']}")
+
+
+def finish(args, meta: dict, results: list[dict]) -> None:
+    """Zapis wyników, opcjonalnie nowej bazy, i porównanie (kod wyjścia 1 przy regresji)"""
+    if args.output:
+        write(args.output, meta, results)
+    if args.save_baseline:
+        write(args.save_baseline, meta, results)
+    if args.baseline:
+        if not report(compare(results, load(args.baseline)["results"], args.tolerance)):
+            sys.exit(1)
+
+
+def add_output_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--output", help="plik JSON z wynikami")
+    parser.add_argument("--baseline", help="plik JSON z wynikami bazowymi do porównania")
+    parser.add_argument("--save-baseline", help="zapisz wyniki tego uruchomienia jako nową bazę")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="dopuszczalne pogorszenie względem bazy (ułamek)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("results")
+    parser.add_argument("--baseline", required=True)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+    ok = report(compare(load(args.results)["results"], load(args.baseline)["results"], args.tolerance))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,341 @@
+"""
+Mikrobenchmarki backendu: create_plot dla każdego typu wykresu, parsowanie uploadu,
+zależność uwierzytelniania i funkcje CRUD projektów/wykresów (synchroniczne i na AsyncSession).
+
+Działa offline na syntetycznych CSV (benchmarks/synthetic.py) i SQLite w katalogu
+tymczasowym (albo lokalnym Postgresie przez --database-url). Uruchomienie (z katalogu backend):
+    python -m benchmarks.suite --sizes 10k,1m [--only charts,upload,auth,crud,crud_async]
+        [--output wyniki.json] [--baseline benchmarks/baseline.json] [--save-baseline ...]
+Kod wyjścia 1, gdy któryś wynik jest gorszy od bazy o więcej niż --tolerance.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import uuid
+
+from benchmarks import results as bench
+from benchmarks.synthetic import DATA_DIR, ensure_csv, parse_sizes
+
+GROUPS = ("charts", "upload", "auth", "crud", "crud_async")
+# Kolumny syntetycznych danych dla poszczególnych typów wykresów
+CHART_CASES = {
+    "line": {"x_column": ["x"], "y_columns": ["y", "value"]},
+    "scatter": {"x_column": ["x"], "y_columns": ["y"]},
+    "area": {"x_column": ["x"], "y_columns": ["y"]},
+    "bar": {"x_column": ["category"], "y_columns": ["value"]},
+    "pie": {"x_column": ["category"], "y_columns": ["value"]},
+}
+LARGE_ROWS = 5_000_000
+
+
+def configure(work_dir: str, database_url: str) -> None:
+    """Zmienne środowiskowe muszą być ustawione przed importem modułów aplikacji"""
+    os.environ["UPLOAD_DIR"] = os.path.join(work_dir, "uploads")
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.setdefault("JWT_SECRET_KEY", "benchmark")
+    os.environ.setdefault("ALGORITHM", "HS256")
+    os.environ["PREWARM_IMPORTS"] = "false"
+    os.environ["MPLBACKEND"] = "Agg"
+    os.makedirs(os.environ["UPLOAD_DIR"], exist_ok=True)
+
+
+def _repeat_for(rows: int, repeat: int) -> int:
+    # Największe zbiory mierzymy rzadziej - pojedyncze wywołanie trwa sekundy
+    return min(repeat, 2) if rows >= LARGE_ROWS else repeat
+
+
+def _warmup_for(rows: int) -> int:
+    return 0 if rows >= LARGE_ROWS else 1
+
+
+def _stage_medians(samples: list[dict]) -> dict:
+    import statistics
+
+    stages = {stage for timings in samples for stage in timings}
+    return {f"{stage}_ms": round(statistics.median(t.get(stage, 0.0) for t in samples) * 1000, 3)
+            for stage in sorted(stages)}
+
+
+def bench_charts(sizes: dict, repeat: int, data_dir: str) -> list[dict]:
+    from crud.chart import create_plot
+    from schemas.chart import Columns
+    from services.ingest import parse_csv
+
+    out = []
+    for label, rows in sizes.items():
+        df, _ = parse_csv(ensure_csv(rows, data_dir))
+        for chart_type, columns in CHART_CASES.items():
+            timings = []
+
+            def render():
+                meta = {}
+                create_plot(df, chart_type, Columns(**columns), meta=meta)
+                timings.append(meta.get("timings", {}))
+
+            stats = bench.measure(render, _repeat_for(rows, repeat), _warmup_for(rows))
+            out.append(bench.result(f"charts.{chart_type}.{label}", stats["median"], p95=stats["p95"],
+                                    **_stage_medians(timings[_warmup_for(rows):])))
+    return out
+
+
+def bench_upload(sizes: dict, repeat: int, data_dir: str) -> list[dict]:
+    from starlette.datastructures import UploadFile
+
+    from services.dataset_store import dataset_store
+    from services.ingest import parse_csv, stream_to_disk
+
+    out = []
+    for label, rows in sizes.items():
+        path = ensure_csv(rows, data_dir)
+        size_mb = os.path.getsize(path) / 2**20
+        n, warmup = _repeat_for(rows, repeat), _warmup_for(rows)
+
+        target = os.path.join(tempfile.mkdtemp(), "upload.csv")
+
+        def stream():
+            with open(path, "rb") as f:
+                asyncio.run(stream_to_disk(UploadFile(f, filename="bench.csv"), target))
+
+        stats = bench.measure(stream, n, warmup)
+        out.append(bench.result(f"upload.stream.{label}", size_mb / (stats["median"] / 1000), "MiB/s", "higher"))
+
+        stats = bench.measure(lambda: parse_csv(path), n, warmup)
+        out.append(bench.result(f"upload.parse.{label}", stats["median"], p95=stats["p95"]))
+        out.append(bench.result(f"upload.parse_rows_per_s.{label}", rows / (stats["median"] / 1000), "rows/s", "higher"))
+
+        df, _ = parse_csv(path)
+        dataset_id = dataset_store.new_dataset_id()
+        stats = bench.measure(lambda: dataset_store.save(0, dataset_id, df, {"status": "ready"}), n, warmup)
+        out.append(bench.result(f"upload.save_parquet.{label}", stats["median"], p95=stats["p95"]))
+        dataset_store.delete(0, dataset_id)
+    return out
+
+
+def bench_auth(repeat: int) -> list[dict]:
+    from fastapi.security import HTTPAuthorizationCredentials
+    from sqlmodel import Session, SQLModel
+    from sqlmodel.ext.asyncio.session import AsyncSession
+
+    from auth.principal_cache import principal_cache
+    from auth.security import create_access_token, get_password_hash
+    from crud.user import authenticate_user_async
+    from database.database import dispose_async_engine, engine, get_async_engine
+    from database.models.user import User
+    from main import get_current_user
+
+    SQLModel.metadata.create_all(engine)
+    email = f"auth-{uuid.uuid4().hex[:12]}@example.com"  # Unikalny także przy ponownym użyciu bazy
+    with Session(engine) as session:
+        user = User(email=email, hashed_password=get_password_hash("benchmark"))
+        session.add(user)
+        session.commit()
+        user_id = user.id
+    token = create_access_token({"sub": str(user_id)})
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+    loop = asyncio.new_event_loop()
+    session = AsyncSession(get_async_engine(), expire_on_commit=False)
+
+    async def dependency(cached: bool):
+        if not cached:
+            principal_cache.clear()
+        await get_current_user(credentials, session)
+        session.expunge_all()
+
+    out = []
+    stats = bench.measure(lambda: loop.run_until_complete(
+        authenticate_user_async(session, email, "benchmark")), min(repeat, 3))
+    out.append(bench.result("auth.login", stats["median"], p95=stats["p95"]))
+    stats = bench.measure(lambda: loop.run_until_complete(dependency(cached=False)), repeat * 20)
+    out.append(bench.result("auth.dependency.cold", stats["median"], p95=stats["p95"]))
+    stats = bench.measure(lambda: loop.run_until_complete(dependency(cached=True)), repeat * 20)
+    out.append(bench.result("auth.dependency.cached", stats["median"], p95=stats["p95"]))
+
+    loop.run_until_complete(session.close())
+    loop.run_until_complete(dispose_async_engine())  # Wątek aiosqlite blokowałby zakończenie procesu
+    loop.close()
+    return out
+
+
+def seed_projects(engine, projects: int, charts_per_project: int) -> int:
+    from datetime import datetime, timedelta
+
+    from sqlalchemy import insert
+    from sqlmodel import Session, select
+
+    from database.models.chart import Chart
+    from database.models.project import Project
+    from database.models.user import User
+
+    with Session(engine) as session:
+        user = User(email=f"crud-{uuid.uuid4().hex[:12]}@example.com", hashed_password="x")
+        session.add(user)
+        session.commit()
+        user_id = user.id
+    start = datetime(2020, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(insert(Project), [
+            {"title": f"project {i}", "source_file_path": "bench.csv", "created_at": start + timedelta(seconds=i),
+             "is_public": i % 2 == 0, "user_id": user_id}
+            for i in range(projects)
+        ])
+        project_ids = conn.execute(select(Project.id).where(Project.user_id == user_id)).scalars().all()
+        conn.execute(insert(Chart), [
+            {"title": f"chart {j}", "chart_image_path": "bench.png", "chart_type": "bar",
+             "order_index": j, "project_id": project_id}
+            for project_id in project_ids for j in range(charts_per_project)
+        ])
+    return user_id
+
+
+def bench_crud(repeat: int, projects: int, charts_per_project: int) -> list[dict]:
+    from sqlmodel import Session, SQLModel, select
+
+    from crud.chart_crud import count_charts_in_project, create_chart, delete_chart, reorder_charts
+    from crud.project import (create_project, delete_project, get_project_with_charts,
+                              get_projects_with_charts_count, get_public_projects)
+    from database.database import engine
+    from database.models.chart import Chart
+    from schemas.chart import ChartCreate
+    from schemas.project import ProjectCreate
+
+    SQLModel.metadata.create_all(engine)
+    user_id = seed_projects(engine, projects, charts_per_project)
+    n = repeat * 10
+    out = []
+    with Session(engine) as session:
+        project_id = get_projects_with_charts_count(session, user_id, None, 1)[0][0]["id"]
+        chart_ids = session.exec(select(Chart.id).where(Chart.project_id == project_id)).all()
+
+        def reorder():
+            chart_ids.reverse()
+            reorder_charts(session, project_id, [{"id": cid, "order_index": i} for i, cid in enumerate(chart_ids)],
+                           user_id)
+
+        def create_delete_project():
+            project = create_project(session, ProjectCreate(title="bench", source_file_path="bench.csv"), user_id)
+            delete_project(session, project.id, user_id)
+
+        def create_delete_chart():
+            chart = create_chart(session, ChartCreate(title="bench", chart_type="bar", chart_image_path="bench.png",
+                                                      project_id=project_id), user_id)
+            delete_chart(session, chart.id, user_id)
+
+        cases = {
+            "get_projects_with_charts_count": lambda: get_projects_with_charts_count(session, user_id, None, 50),
+            "get_public_projects": lambda: get_public_projects(session, None, 50),
+            "get_project_with_charts": lambda: get_project_with_charts(session, project_id, user_id),
+            "count_charts_in_project": lambda: count_charts_in_project(session, project_id),
+            "reorder_charts": reorder,
+            "create_delete_project": create_delete_project,
+            "create_delete_chart": create_delete_chart,
+        }
+        for name, fn in cases.items():
+            stats = bench.measure(lambda: (fn(), session.expire_all()), n)
+            out.append(bench.result(f"crud.{name}", stats["median"], p95=stats["p95"]))
+    return out
+
+
+def bench_crud_async(repeat: int, projects: int, charts_per_project: int) -> list[dict]:
+    """Asynchroniczne warianty CRUD na silniku z database.database (dla SQLite - sqlite+aiosqlite)"""
+    from sqlmodel import SQLModel
+    from sqlmodel.ext.asyncio.session import AsyncSession
+
+    from crud.chart_crud import create_chart_async, delete_chart_async, reorder_charts_async, update_chart_async
+    from crud.project import (create_project_async, delete_project_async, get_project_with_charts_async,
+                              get_projects_with_charts_count_async, update_project_async)
+    from database.database import dispose_async_engine, engine, get_async_engine
+    from schemas.chart import ChartCreate, ChartUpdate
+    from schemas.project import ProjectCreate, ProjectUpdate
+
+    SQLModel.metadata.create_all(engine)
+    user_id = seed_projects(engine, projects, charts_per_project)
+    n = repeat * 10
+    loop = asyncio.new_event_loop()
+    session = AsyncSession(get_async_engine(), expire_on_commit=False)
+
+    async def first_project() -> tuple[int, list[int]]:
+        page, _ = await get_projects_with_charts_count_async(session, user_id, None, 1)
+        project = await get_project_with_charts_async(session, page[0]["id"], user_id)
+        return project.id, [chart.id for chart in project.charts]
+
+    project_id, chart_ids = loop.run_until_complete(first_project())
+
+    async def reorder():
+        chart_ids.reverse()
+        await reorder_charts_async(session, project_id,
+                                   [{"chart_id": cid, "order_index": i} for i, cid in enumerate(chart_ids)], user_id)
+
+    async def project_lifecycle():
+        project = await create_project_async(session, ProjectCreate(title="bench", source_file_path="bench.csv"),
+                                             user_id)
+        updated = await update_project_async(session, project.id, ProjectUpdate(title="bench 2"), user_id)
+        assert updated is not None and updated.title == "bench 2"
+        assert await delete_project_async(session, project.id, user_id)
+
+    async def chart_lifecycle():
+        chart = await create_chart_async(session, ChartCreate(title="bench", chart_type="bar",
+                                                              chart_image_path="bench.png", project_id=project_id),
+                                         user_id)
+        updated = await update_chart_async(session, chart.id, ChartUpdate(title="bench 2"), user_id)
+        assert updated is not None and updated.title == "bench 2"
+        assert await delete_chart_async(session, chart.id, user_id)
+        assert not await delete_chart_async(session, chart.id, user_id)
+
+    cases = {
+        "reorder_charts": reorder,
+        "create_update_delete_project": project_lifecycle,
+        "create_update_delete_chart": chart_lifecycle,
+    }
+    out = []
+    for name, fn in cases.items():
+        stats = bench.measure(lambda: (loop.run_until_complete(fn()), session.expunge_all()), n)
+        out.append(bench.result(f"crud_async.{name}", stats["median"], p95=stats["p95"]))
+
+    loop.run_until_complete(session.close())
+    loop.run_until_complete(dispose_async_engine())  # Wątek aiosqlite blokowałby zakończenie procesu
+    loop.close()
+    return out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10k,1m", help="rozmiary danych: 10k, 1m, 10m lub liczby wierszy")
+    parser.add_argument("--only", default=",".join(GROUPS), help="grupy: " + ", ".join(GROUPS))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--projects", type=int, default=2_000)
+    parser.add_argument("--charts-per-project", type=int, default=10)
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--database-url")
+    bench.add_output_arguments(parser)
+    args = parser.parse_args()
+
+    groups = [g.strip() for g in args.only.split(",") if g.strip()]
+    unknown = set(groups) - set(GROUPS)
+    if unknown:
+        parser.error(f"unknown groups: {', '.join(sorted(unknown))}")
+    sizes = parse_sizes(args.sizes)
+    work_dir = tempfile.mkdtemp(prefix="dataviz-suite-")
+    configure(work_dir, args.database_url or f"sqlite:///{os.path.join(work_dir, 'bench.db')}")
+
+    results = []
+    if "charts" in groups:
+        results += bench_charts(sizes, args.repeat, args.data_dir)
+    if "upload" in groups:
+        results += bench_upload(sizes, args.repeat, args.data_dir)
+    if "auth" in groups:
+        results += bench_auth(args.repeat)
+    if "crud" in groups:
+        results += bench_crud(args.repeat, args.projects, args.charts_per_project)
+    if "crud_async" in groups:
+        results += bench_crud_async(args.repeat, args.projects, args.charts_per_project)
+
+    bench.print_results(results)
+    meta = bench.run_metadata(suite="micro", sizes=sizes, groups=groups,
+                              database=args.database_url.split("://")[0] if args.database_url else "sqlite")
+    bench.finish(args, meta, results)
+
+
+if __name__ == "__main__":
+    main()
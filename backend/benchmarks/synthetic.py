@@ -0,0 +1,67 @@
+"""
+Deterministyczne syntetyczne pliki CSV do benchmarków (10k, 1M, 10M wierszy).
+
+Pliki są generowane raz i trzymane w katalogu danych benchmarków. Wcześniejsze
+przygotowanie (z katalogu backend):
+    python -m benchmarks.synthetic --sizes 10k,1m,10m [--data-dir /tmp/dataviz-bench]
+"""
+import argparse
+import os
+import tempfile
+
+DATA_DIR = os.getenv("BENCHMARK_DATA_DIR", os.path.join(tempfile.gettempdir(), "dataviz-bench"))
+SIZES = {"10k": 10_000, "1m": 1_000_000, "10m": 10_000_000}
+CATEGORIES = ("north", "south", "east", "west", "central", "online", "retail", "wholesale",
+              "export", "import", "partner", "other")
+CHUNK_ROWS = 1_000_000
+SEED = 42
+
+
+def parse_sizes(value: str) -> dict[str, int]:
+    """"10k,1m" -> {"10k": 10000, "1m": 1000000}; akceptuje też liczby wierszy"""
+    sizes = {}
+    for label in filter(None, (part.strip().lower() for part in value.split(","))):
+        sizes[label] = SIZES[label] if label in SIZES else int(label)
+    return sizes
+
+
+def _chunk(start: int, rows: int, seed: int):
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng([seed, start])
+    return pd.DataFrame({
+        "x": np.arange(start, start + rows, dtype=np.int64),
+        "y": np.round(rng.standard_normal(rows).cumsum() + 100, 4),
+        "z": rng.integers(0, 1000, rows),
+        "value": np.round(rng.gamma(2.0, 50.0, rows), 2),
+        "category": rng.choice(CATEGORIES, rows),
+    })
+
+
+def ensure_csv(rows: int, data_dir: str = DATA_DIR, seed: int = SEED) -> str:
+    """Ścieżka do pliku z danymi (generowanego kawałkami, jeśli go jeszcze nie ma)"""
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"synthetic-{rows}-{seed}.csv")
+    if os.path.exists(path):
+        return path
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+        for start in range(0, rows, CHUNK_ROWS):
+            _chunk(start, min(CHUNK_ROWS, rows - start), seed).to_csv(f, index=False, header=start == 0)
+    os.replace(tmp_path, path)
+    return path
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10k,1m,10m")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    args = parser.parse_args()
+    for label, rows in parse_sizes(args.sizes).items():
+        path = ensure_csv(rows, args.data_dir)
+        print(f"{label:>5} {rows:>10} rows  {os.path.getsize(path) / 2**20:>8.1f} MiB  {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,92 +1,131 @@
+# Moduł importowany tylko w procesach renderujących (services/render_pool.py) - nie przy starcie API
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
-import seaborn as sns
+import time
 from io import BytesIO
 
+from services.chart_data import prepare_chart_data
+from services.logger import get_logger
+from services.metrics import stage_started, timed
+
+logger = get_logger("chart")
+
+FIGSIZE = (16, 9)
+# Dodatkowe opcje zapisu dla formatów stratnych
+SAVE_OPTIONS = {
+    "jpeg": {"pil_kwargs": {"quality": 85, "optimize": True}},
+    "webp": {"pil_kwargs": {"quality": 85, "method": 4}},
+}
+
 
 def get_chart_data(data, chart_type):
     if chart_type == "csv":
         df = pd.read_csv(data)
-        print(df.columns)
+        logger.debug("CSV columns: %s", list(df.columns))
         return df.columns
 
 
-def create_plot(data, chart_type, columns):
+def create_plot(data, chart_type, columns, max_points=None, meta=None,
+                aggregation="sum", top_n=None, dataset_id=None, fingerprint=None,
+                fmt="png", width=None, height=None, dpi=None, profile=None, resample=None):
     df = pd.DataFrame(data)
-    print(df)
+    logger.debug("Rendering %s chart from %d rows", chart_type, len(df))
     if df.empty:
         return "Brak danych do wygenerowania wykresu."
+
+    # Rozmiar figury w calach wynika z rozmiaru w pikselach i dpi
+    dpi = dpi or plt.rcParams['figure.dpi']
+    figsize = (width / dpi, height / dpi) if width and height else FIGSIZE
+
+    # Dane do narysowania (po redukcji/agregacji) - te same, które trafiają do klienta w trybie JSON
+    width_px = int(figsize[0] * dpi)
+    # Czasy etapów wracają do workera API w metadanych (services/metrics.py)
+    timings = meta.setdefault("timings", {}) if meta is not None else None
+    with timed(timings, "prepare"):
+        chart = prepare_chart_data(df, chart_type, columns, width_px, max_points, aggregation, top_n,
+                                   dataset_id, fingerprint, profile, resample)
+    if isinstance(chart, str):
+        return chart
+    if meta is not None:
+        meta.update(chart["meta"])
+    series = chart["series"]
+    x_col = chart["x_column"]
     
-    plt.figure(figsize=(16, 9))  # Ustawienie rozmiaru figury (figsize) na początku
-
-    x_col = columns.x_column[0]  # Jest tylko jedna wartość dla osi X
-
-    if chart_type == 'line':
-        # Dla wykresu liniowego możliwe jest kilka kolumn Y (1-3)
-        for y in columns.y_columns:
-            plt.plot(df[x_col], df[y], label=y)
-        plt.xlabel(x_col)
-        plt.ylabel('Wartości')
-        plt.title(f'Wykres Liniowy: {", ".join(columns.y_columns)} vs {x_col}')
-        plt.legend()
-
-    elif chart_type == 'bar':
-        # Zachowujemy oryginalne sprawdzanie dla wykresu słupkowego (musi być 1 kolumna dla X i Y)
-        if len(columns.y_columns) != 1 or len(columns.x_column) != 1:
-            return "Dla wykresu słupkowego wybierz jedną kolumnę dla osi X (kategoryczną) i jedną dla osi Y (numeryczną)."
-        y_col = columns.y_columns[0]
-        plt.bar(df[x_col], df[y_col])
-        plt.xlabel(x_col)
-        plt.ylabel(y_col)
-        plt.title(f'Wykres Słupkowy: {y_col} względem {x_col}')
-
-    elif chart_type == 'pie':
-        if len(columns.value_column) != 1 or len(columns.category_column) != 1:
-            return "Dla wykresu kołowego wybierz jedną kolumnę dla kategorii i jedną kolumnę dla wartości."
-        category_col = columns.category_column[0]
-        value_col = columns.value_column[0]
-        plt.pie(df[value_col], labels=df[category_col], autopct='%1.1f%%', startangle=90)
-        plt.title(f'Wykres Kołowy: Rozkład {value_col} według {category_col}')
-        plt.ylabel(value_col)
-
-    elif chart_type == 'scatter':
-        # Jeśli jest więcej niż jedna kolumna Y, rysujemy wiele serii
-        for y in columns.y_columns:
-            plt.scatter(df[x_col], df[y], label=y)
-        plt.xlabel(x_col)
-        plt.ylabel('Wartości')
-        plt.title(f'Wykres Punktowy: {", ".join(columns.y_columns)} vs {x_col}')
-        plt.legend()
-
-    elif chart_type == 'area':
-        # Jeśli jedna kolumna Y, wykres warstwowy jak fill_between
-        if len(columns.y_columns) == 1:
-            y = columns.y_columns[0]
-            plt.fill_between(df[x_col], df[y])
-            plt.title(f'Wykres Warstwowy: {y} vs {x_col}')
-        else:
-            # Zbierz dane Y do listy
-            y_data = [df[y] for y in columns.y_columns]
-            plt.stackplot(df[x_col], *y_data, labels=columns.y_columns)
-            plt.title(f'Wykres Warstwowy (Stacked): {", ".join(columns.y_columns)} vs {x_col}')
+    stage_started(timings, "plot")
+    plot_start = time.perf_counter()
+    fig = plt.figure(figsize=figsize, dpi=dpi)  # Ustawienie rozmiaru figury (figsize) na początku
+    try:
+
+        if chart_type == 'line':
+            # Dla wykresu liniowego możliwe jest kilka kolumn Y (1-3)
+            for s in series:
+                plt.plot(s["x"], s["y"], label=s["name"])
+            plt.xlabel(x_col)
+            plt.ylabel('Wartości')
+            plt.title(f'Wykres Liniowy: {", ".join(columns.y_columns)} vs {x_col}')
+            plt.legend()
+
+        elif chart_type == 'bar':
+            y_col = series[0]["name"]
+            plt.bar(series[0]["x"], series[0]["y"])
+            plt.xlabel(x_col)
+            plt.ylabel(y_col)
+            plt.title(f'Wykres Słupkowy: {y_col} względem {x_col}')
+
+        elif chart_type == 'pie':
+            value_col = series[0]["name"]
+            plt.pie(series[0]["y"], labels=series[0]["x"], autopct='%1.1f%%', startangle=90)
+            plt.title(f'Wykres Kołowy: Rozkład {value_col} według {x_col}')
+            plt.ylabel(value_col)
+
+        elif chart_type == 'scatter':
+            # Jeśli jest więcej niż jedna kolumna Y, rysujemy wiele serii
+            for s in series:
+                if "count" in s:
+                    # Komórki gęstości zamiast pojedynczych punktów
+                    counts = s["count"]
+                    if len(series) == 1:
+                        points = plt.scatter(s["x"], s["y"], c=counts, s=6, marker='s', norm='log', label=s["name"])
+                        plt.colorbar(points, label='Liczba punktów')
+                    else:
+                        plt.scatter(s["x"], s["y"], s=4 + 12 * np.log1p(counts) / np.log1p(counts.max()), label=s["name"])
+                else:
+                    plt.scatter(s["x"], s["y"], label=s["name"])
+            plt.xlabel(x_col)
+            plt.ylabel('Wartości')
+            plt.title(f'Wykres Punktowy: {", ".join(columns.y_columns)} vs {x_col}')
             plt.legend()
-        plt.xlabel(x_col)
-        plt.ylabel('Wartości')
 
-    elif chart_type == 'radar':
-        return "Wykres Radar nie jest jeszcze zaimplementowany w tym przykładzie."
+        elif chart_type == 'area':
+            # Jeśli jedna kolumna Y, wykres warstwowy jak fill_between
+            if len(series) == 1:
+                y = series[0]["name"]
+                plt.fill_between(series[0]["x"], series[0]["y"])
+                plt.title(f'Wykres Warstwowy: {y} vs {x_col}')
+            else:
+                # Zbierz dane Y do listy
+                y_data = [s["y"] for s in series]
+                plt.stackplot(series[0]["x"], *y_data, labels=[s["name"] for s in series])
+                plt.title(f'Wykres Warstwowy (Stacked): {", ".join(columns.y_columns)} vs {x_col}')
+                plt.legend()
+            plt.xlabel(x_col)
+            plt.ylabel('Wartości')
 
-    else:
-        plt.text(0.5, 0.5, f'Nieznany typ wykresu: {chart_type}', ha='center', va='center')
+        else:
+            plt.text(0.5, 0.5, f'Nieznany typ wykresu: {chart_type}', ha='center', va='center')
 
-    plt.xlabel('Oś X')
-    plt.ylabel('Oś Y')
-    plt.grid(True)
+        plt.xlabel('Oś X')
+        plt.ylabel('Oś Y')
+        plt.grid(True)
+        if timings is not None:
+            timings["plot"] = time.perf_counter() - plot_start
 
-    buf = BytesIO()
-    plt.savefig(buf, format='png', bbox_inches='tight')
-    plt.savefig('uploads/chart.png', format='png', bbox_inches='tight')
+        buf = BytesIO()
+        # Przy backendzie Agg rasteryzacja odbywa się dopiero w savefig, więc liczy się do "encode"
+        with timed(timings, "encode"):
+            plt.savefig(buf, format=fmt, dpi=dpi, bbox_inches='tight', **SAVE_OPTIONS.get(fmt, {}))
+    finally:
+        plt.close(fig)  # Również po błędzie - figura zostałaby w procesie renderującym
     buf.seek(0)
-    plt.close()
     return buf
@@ -1,12 +1,20 @@
 from typing import List, Optional
-from sqlmodel import Session, select
+from sqlalchemy import case, delete, update
+from sqlmodel import Session, select, func
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.concurrency import run_in_threadpool
 from database.models.chart import Chart
 from database.models.project import Project
 from schemas.chart import ChartCreate, ChartUpdate
+from services import chart_store
+from services.public_cache import public_cache
 
 
 def create_chart(session: Session, chart: ChartCreate, user_id: int) -> Optional[Chart]:
-    """Tworzy nowy wykres dla projektu (sprawdza czy użytkownik jest właścicielem projektu)"""
+    """
+    Tworzy nowy wykres dla projektu (sprawdza czy użytkownik jest właścicielem projektu).
+    None - projekt nie należy do użytkownika; ValueError - nieznany obraz wykresu.
+    """
     # Sprawdź czy projekt należy do użytkownika
     project_statement = select(Project).where(Project.id == chart.project_id, Project.user_id == user_id)
     project = session.exec(project_statement).first()
@@ -14,10 +22,24 @@ def create_chart(session: Session, chart: ChartCreate, user_id: int) -> Optional
     if not project:
         return None
     
-    db_chart = Chart(
+    # Obraz zapisany już przy renderowaniu - bez ponownego rysowania wykresu
+    chart_image_path = chart.chart_image_path or chart_store.resolve(chart.chart_image)
+    if not chart_image_path:
+        raise ValueError("Nieznany obraz wykresu")
+    
+    db_chart = _new_chart(chart, chart_image_path)
+    session.add(db_chart)
+    session.commit()
+    session.refresh(db_chart)
+    public_cache.invalidate_project(db_chart.project_id)
+    return db_chart
+
+
+def _new_chart(chart: ChartCreate, chart_image_path: str) -> Chart:
+    return Chart(
         title=chart.title,
         description=chart.description,
-        chart_image_path=chart.chart_image_path,
+        chart_image_path=chart_image_path,
         chart_type=chart.chart_type,
         chart_config=chart.chart_config,
         x_columns=chart.x_columns,
@@ -25,10 +47,6 @@ def create_chart(session: Session, chart: ChartCreate, user_id: int) -> Optional
         order_index=chart.order_index,
         project_id=chart.project_id
     )
-    session.add(db_chart)
-    session.commit()
-    session.refresh(db_chart)
-    return db_chart
 
 
 def get_chart_by_id(session: Session, chart_id: int) -> Optional[Chart]:
@@ -82,6 +100,7 @@ def update_chart(session: Session, chart_id: int, chart_update: ChartUpdate, use
     session.add(db_chart)
     session.commit()
     session.refresh(db_chart)
+    public_cache.invalidate_project(db_chart.project_id)
     return db_chart
 
 
@@ -96,8 +115,10 @@ def delete_chart(session: Session, chart_id: int, user_id: int) -> bool:
     if not db_chart:
         return False
     
+    project_id = db_chart.project_id
     session.delete(db_chart)
     session.commit()
+    public_cache.invalidate_project(project_id)
     return True
 
 
@@ -110,23 +131,122 @@ def reorder_charts(session: Session, project_id: int, chart_orders: List[dict],
     if not project:
         return False
     
-    # Aktualizuj kolejność dla każdego wykresu
-    for order_data in chart_orders:
-        chart_id = order_data.get('chart_id')
-        new_order = order_data.get('order_index')
-        
-        statement = select(Chart).where(Chart.id == chart_id, Chart.project_id == project_id)
-        chart = session.exec(statement).first()
-        
-        if chart:
-            chart.order_index = new_order
-            session.add(chart)
-    
-    session.commit()
+    statement = _reorder_statement(project_id, chart_orders)
+    if statement is not None:
+        session.execute(statement)
+        session.commit()
+        public_cache.invalidate_project(project_id)
     return True
 
 
+def _reorder_statement(project_id: int, chart_orders: List[dict]):
+    new_orders = {order_data['chart_id']: order_data['order_index'] for order_data in chart_orders
+                  if order_data.get('chart_id') is not None and order_data.get('order_index') is not None}
+    if not new_orders:
+        return None
+    
+    # Jedno UPDATE z CASE dla wszystkich wykresów; wykresy spoza projektu są pomijane
+    return (
+        update(Chart)
+        .where(Chart.id.in_(new_orders), Chart.project_id == project_id)
+        .values(order_index=case(new_orders, value=Chart.id, else_=Chart.order_index))
+        .execution_options(synchronize_session=False)
+    )
+
+
 def count_charts_in_project(session: Session, project_id: int) -> int:
     """Zlicza ilość wykresów w projekcie"""
-    statement = select(Chart).where(Chart.project_id == project_id)
-    return len(session.exec(statement).all())
+    statement = select(func.count(Chart.id)).where(Chart.project_id == project_id)
+    return session.exec(statement).one()
+
+
+
+# --- Warianty asynchroniczne (AsyncSession) ---
+
+async def _owns_project_async(session: AsyncSession, project_id: int, user_id: int) -> bool:
+    result = await session.exec(select(Project.id).where(Project.id == project_id, Project.user_id == user_id))
+    return result.first() is not None
+
+
+async def create_chart_async(session: AsyncSession, chart: ChartCreate, user_id: int) -> Optional[Chart]:
+    """
+    Tworzy nowy wykres dla projektu (sprawdza czy użytkownik jest właścicielem projektu).
+    None - projekt nie należy do użytkownika; ValueError - nieznany obraz wykresu.
+    """
+    if not await _owns_project_async(session, chart.project_id, user_id):
+        return None
+
+    chart_image_path = chart.chart_image_path or await run_in_threadpool(chart_store.resolve, chart.chart_image)
+    if not chart_image_path:
+        raise ValueError("Nieznany obraz wykresu")
+
+    db_chart = _new_chart(chart, chart_image_path)
+    session.add(db_chart)
+    await session.commit()
+    await session.refresh(db_chart)
+    await run_in_threadpool(public_cache.invalidate_project, db_chart.project_id)
+    return db_chart
+
+
+async def update_chart_async(session: AsyncSession, chart_id: int, chart_update: ChartUpdate,
+                             user_id: int) -> Optional[Chart]:
+    """Aktualizuje wykres (sprawdza czy użytkownik jest właścicielem projektu)"""
+    result = await session.exec(select(Chart).join(Project).where(Chart.id == chart_id, Project.user_id == user_id))
+    db_chart = result.first()
+
+    if not db_chart:
+        return None
+
+    for key, value in chart_update.model_dump(exclude_unset=True).items():
+        setattr(db_chart, key, value)
+
+    session.add(db_chart)
+    await session.commit()
+    await session.refresh(db_chart)
+    await run_in_threadpool(public_cache.invalidate_project, db_chart.project_id)
+    return db_chart
+
+
+async def delete_chart_async(session: AsyncSession, chart_id: int, user_id: int) -> bool:
+    """Usuwa wykres (sprawdza czy użytkownik jest właścicielem projektu)"""
+    result = await session.exec(
+        select(Chart.project_id).join(Project).where(Chart.id == chart_id, Project.user_id == user_id)
+    )
+    project_id = result.first()
+
+    if project_id is None:
+        return False
+
+    # DELETE bez wczytywania obiektu (session.delete ładowałby go razem z relacjami)
+    await session.execute(delete(Chart).where(Chart.id == chart_id).execution_options(synchronize_session=False))
+    await session.commit()
+    await run_in_threadpool(public_cache.invalidate_project, project_id)
+    return True
+
+
+async def get_charts_by_project_async(session: AsyncSession, project_id: int, user_id: int) -> List[Chart]:
+    """Pobiera wszystkie wykresy projektu (sprawdza czy użytkownik jest właścicielem)"""
+    if not await _owns_project_async(session, project_id, user_id):
+        return []
+    
+    statement = select(Chart).where(Chart.project_id == project_id).order_by(Chart.order_index, Chart.created_at)
+    return (await session.exec(statement)).all()
+
+
+async def reorder_charts_async(session: AsyncSession, project_id: int, chart_orders: List[dict], user_id: int) -> bool:
+    """Zmienia kolejność wykresów w projekcie"""
+    if not await _owns_project_async(session, project_id, user_id):
+        return False
+    
+    statement = _reorder_statement(project_id, chart_orders)
+    if statement is not None:
+        await session.execute(statement)
+        await session.commit()
+        await run_in_threadpool(public_cache.invalidate_project, project_id)
+    return True
+
+
+async def count_charts_in_project_async(session: AsyncSession, project_id: int) -> int:
+    """Zlicza ilość wykresów w projekcie"""
+    statement = select(func.count(Chart.id)).where(Chart.project_id == project_id)
+    return (await session.exec(statement)).one()
@@ -0,0 +1,50 @@
+import base64
+import json
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import tuple_
+
+# Maksymalny rozmiar strony przy paginacji kursorem
+MAX_PAGE_SIZE = 500
+
+
+class InvalidCursor(ValueError):
+    """Kursor paginacji jest uszkodzony"""
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Nieprzezroczysty kursor (created_at, id) ostatniego elementu strony"""
+    raw = json.dumps([created_at.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(str(e))
+
+
+def keyset_page(statement, model, cursor: Optional[str], limit: int):
+    """
+    Dokłada do zapytania sortowanie (created_at, id) malejąco i warunek kursora.
+    Pobiera limit + 1 wierszy, żeby wiedzieć, czy istnieje następna strona.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        # Porównanie krotek korzysta bezpośrednio z indeksu (..., created_at, id)
+        statement = statement.where(tuple_(model.created_at, model.id) < tuple_(created_at, row_id))
+    return statement.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1), limit
+
+
+def split_page(rows: list, limit: int, key=lambda row: row) -> tuple[list, Optional[str]]:
+    """Zwraca (elementy strony, kursor następnej strony albo None)"""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = key(rows[-1])
+    return rows, encode_cursor(last.created_at, last.id)
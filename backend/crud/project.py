@@ -1,22 +1,33 @@
 from typing import List, Optional
-from sqlmodel import Session, select
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlmodel import Session, select, func, delete
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from crud.pagination import keyset_page, split_page
 from database.models.project import Project
 from database.models.chart import Chart
 from schemas.project import ProjectCreate, ProjectUpdate
+from services.public_cache import public_cache
 
 
-def create_project(session: Session, project: ProjectCreate, user_id: int) -> Project:
-    """Tworzy nowy projekt dla użytkownika"""
-    db_project = Project(
+def _new_project(project: ProjectCreate, user_id: int) -> Project:
+    return Project(
         title=project.title,
         description=project.description,
         source_file_path=project.source_file_path,
         is_public=project.is_public,
         user_id=user_id
     )
+
+
+def create_project(session: Session, project: ProjectCreate, user_id: int) -> Project:
+    """Tworzy nowy projekt dla użytkownika"""
+    db_project = _new_project(project, user_id)
     session.add(db_project)
     session.commit()
     session.refresh(db_project)
+    if db_project.is_public:
+        public_cache.invalidate_project(db_project.id)
     return db_project
 
 
@@ -59,16 +70,18 @@ def get_public_project_with_charts(session: Session, project_id: int) -> Optiona
     return project
 
 
-def get_projects_by_user(session: Session, user_id: int, skip: int = 0, limit: int = 100) -> List[Project]:
-    """Pobiera wszystkie projekty użytkownika"""
-    statement = select(Project).where(Project.user_id == user_id).offset(skip).limit(limit)
-    return session.exec(statement).all()
+def get_projects_by_user(session: Session, user_id: int, cursor: Optional[str] = None,
+                         limit: int = 100) -> tuple[List[Project], Optional[str]]:
+    """Pobiera stronę projektów użytkownika (od najnowszych); zwraca (projekty, następny kursor)"""
+    statement, limit = keyset_page(select(Project).where(Project.user_id == user_id), Project, cursor, limit)
+    return split_page(session.exec(statement).all(), limit)
 
 
-def get_public_projects(session: Session, skip: int = 0, limit: int = 100) -> List[Project]:
-    """Pobiera wszystkie publiczne projekty"""
-    statement = select(Project).where(Project.is_public == True).offset(skip).limit(limit)
-    return session.exec(statement).all()
+def get_public_projects(session: Session, cursor: Optional[str] = None,
+                        limit: int = 100) -> tuple[List[Project], Optional[str]]:
+    """Pobiera stronę publicznych projektów (od najnowszych); zwraca (projekty, następny kursor)"""
+    statement, limit = keyset_page(select(Project).where(Project.is_public == True), Project, cursor, limit)
+    return split_page(session.exec(statement).all(), limit)
 
 
 def update_project(session: Session, project_id: int, project_update: ProjectUpdate, user_id: int) -> Optional[Project]:
@@ -86,6 +99,7 @@ def update_project(session: Session, project_id: int, project_update: ProjectUpd
     session.add(db_project)
     session.commit()
     session.refresh(db_project)
+    public_cache.invalidate_project(project_id)
     return db_project
 
 
@@ -97,15 +111,18 @@ def delete_project(session: Session, project_id: int, user_id: int) -> bool:
     if not db_project:
         return False
     
-    # Usuń najpierw wszystkie wykresy (cascade_delete powinno to zrobić automatycznie)
-    charts_statement = select(Chart).where(Chart.project_id == project_id)
-    charts = session.exec(charts_statement).all()
-    for chart in charts:
-        session.delete(chart)
+    # Jedno DELETE dla wszystkich wykresów zamiast ładowania i usuwania ich po kolei
+    session.execute(
+        delete(Chart).where(Chart.project_id == project_id).execution_options(synchronize_session=False)
+    )
     
-    # Usuń projekt
-    session.delete(db_project)
+    # Usuń projekt (bez session.delete, które ładowałoby relację charts)
+    session.execute(
+        delete(Project).where(Project.id == project_id).execution_options(synchronize_session=False)
+    )
+    session.expunge(db_project)
     session.commit()
+    public_cache.invalidate_project(project_id)
     return True
 
 
@@ -116,16 +133,143 @@ def check_project_ownership(session: Session, project_id: int, user_id: int) ->
     return project is not None
 
 
-def get_projects_with_charts_count(session: Session, user_id: int, skip: int = 0, limit: int = 100) -> List[dict]:
-    """Pobiera projekty użytkownika z liczbą wykresów"""
-    statement = select(Project).where(Project.user_id == user_id).offset(skip).limit(limit)
-    projects = session.exec(statement).all()
+def get_projects_with_charts_count(session: Session, user_id: int, cursor: Optional[str] = None,
+                                   limit: int = 100) -> tuple[List[dict], Optional[str]]:
+    """Pobiera stronę projektów użytkownika z liczbą wykresów; zwraca (projekty, następny kursor)"""
+    statement, limit = _projects_with_charts_count_statement(Project.user_id == user_id, cursor, limit)
+    return _with_charts_count(session.exec(statement).all(), limit)
+
+
+def _projects_with_charts_count_statement(condition, cursor: Optional[str], limit: int):
+    # Jedno zapytanie z GROUP BY zamiast osobnego zapytania o wykresy dla każdego projektu
+    statement = (
+        select(Project, func.count(Chart.id))
+        .outerjoin(Chart, Chart.project_id == Project.id)
+        .where(condition)
+        .group_by(Project.id)
+    )
+    return keyset_page(statement, Project, cursor, limit)
+
+
+def _with_charts_count(rows: list, limit: int) -> tuple[List[dict], Optional[str]]:
+    rows, next_cursor = split_page(rows, limit, key=lambda row: row[0])
     
     result = []
-    for project in projects:
-        charts_count = len(session.exec(select(Chart).where(Chart.project_id == project.id)).all())
+    for project, charts_count in rows:
         project_dict = project.model_dump()
         project_dict['charts_count'] = charts_count
         result.append(project_dict)
     
-    return result
+    return result, next_cursor
+
+
+# --- Warianty asynchroniczne (AsyncSession) ---
+
+async def get_project_by_id_async(session: AsyncSession, project_id: int) -> Optional[Project]:
+    """Pobiera projekt po ID"""
+    result = await session.exec(select(Project).where(Project.id == project_id))
+    return result.first()
+
+
+async def get_project_with_charts_async(session: AsyncSession, project_id: int, user_id: int) -> Optional[Project]:
+    """Pobiera projekt z wykresami (tylko dla właściciela)"""
+    result = await session.exec(select(Project).where(Project.id == project_id, Project.user_id == user_id))
+    project = result.first()
+
+    if not project:
+        return None
+
+    charts_statement = select(Chart).where(Chart.project_id == project_id).order_by(Chart.order_index, Chart.created_at)
+    charts = (await session.exec(charts_statement)).all()
+    set_committed_value(project, "charts", list(charts))
+    return project
+
+
+async def get_public_project_with_charts_async(session: AsyncSession, project_id: int) -> Optional[Project]:
+    """Pobiera publiczny projekt z wykresami"""
+    result = await session.exec(select(Project).where(Project.id == project_id, Project.is_public == True))
+    project = result.first()
+    
+    if not project:
+        return None
+    
+    charts_statement = select(Chart).where(Chart.project_id == project_id).order_by(Chart.order_index, Chart.created_at)
+    charts = (await session.exec(charts_statement)).all()
+    # Bez leniwego ładowania poprzedniej zawartości relacji (niedostępnego w AsyncSession)
+    set_committed_value(project, "charts", list(charts))
+    return project
+
+
+async def get_projects_by_user_async(session: AsyncSession, user_id: int, cursor: Optional[str] = None,
+                                     limit: int = 100) -> tuple[List[Project], Optional[str]]:
+    """Pobiera stronę projektów użytkownika (od najnowszych); zwraca (projekty, następny kursor)"""
+    statement, limit = keyset_page(select(Project).where(Project.user_id == user_id), Project, cursor, limit)
+    return split_page((await session.exec(statement)).all(), limit)
+
+
+async def get_public_projects_async(session: AsyncSession, cursor: Optional[str] = None,
+                                    limit: int = 100) -> tuple[List[Project], Optional[str]]:
+    """Pobiera stronę publicznych projektów (od najnowszych); zwraca (projekty, następny kursor)"""
+    statement, limit = keyset_page(select(Project).where(Project.is_public == True), Project, cursor, limit)
+    return split_page((await session.exec(statement)).all(), limit)
+
+
+async def get_projects_with_charts_count_async(session: AsyncSession, user_id: int, cursor: Optional[str] = None,
+                                               limit: int = 100) -> tuple[List[dict], Optional[str]]:
+    """Pobiera stronę projektów użytkownika z liczbą wykresów; zwraca (projekty, następny kursor)"""
+    statement, limit = _projects_with_charts_count_statement(Project.user_id == user_id, cursor, limit)
+    return _with_charts_count((await session.exec(statement)).all(), limit)
+
+
+async def get_public_projects_with_charts_count_async(session: AsyncSession, cursor: Optional[str] = None,
+                                                      limit: int = 100) -> tuple[List[dict], Optional[str]]:
+    """Pobiera stronę publicznej galerii z liczbą wykresów; zwraca (projekty, następny kursor)"""
+    statement, limit = _projects_with_charts_count_statement(Project.is_public == True, cursor, limit)
+    return _with_charts_count((await session.exec(statement)).all(), limit)
+
+
+async def create_project_async(session: AsyncSession, project: ProjectCreate, user_id: int) -> Project:
+    """Tworzy nowy projekt dla użytkownika"""
+    db_project = _new_project(project, user_id)
+    session.add(db_project)
+    await session.commit()
+    await session.refresh(db_project)
+    if db_project.is_public:
+        await run_in_threadpool(public_cache.invalidate_project, db_project.id)
+    return db_project
+
+
+async def update_project_async(session: AsyncSession, project_id: int, project_update: ProjectUpdate,
+                               user_id: int) -> Optional[Project]:
+    """Aktualizuje projekt (tylko właściciel)"""
+    result = await session.exec(select(Project).where(Project.id == project_id, Project.user_id == user_id))
+    db_project = result.first()
+
+    if not db_project:
+        return None
+
+    for key, value in project_update.model_dump(exclude_unset=True).items():
+        setattr(db_project, key, value)
+
+    session.add(db_project)
+    await session.commit()
+    await session.refresh(db_project)
+    await run_in_threadpool(public_cache.invalidate_project, project_id)
+    return db_project
+
+
+async def delete_project_async(session: AsyncSession, project_id: int, user_id: int) -> bool:
+    """Usuwa projekt z wszystkimi wykresami (tylko właściciel)"""
+    result = await session.exec(select(Project.id).where(Project.id == project_id, Project.user_id == user_id))
+    if result.first() is None:
+        return False
+    
+    await session.execute(
+        delete(Chart).where(Chart.project_id == project_id).execution_options(synchronize_session=False)
+    )
+    await session.execute(
+        delete(Project).where(Project.id == project_id).execution_options(synchronize_session=False)
+    )
+    await session.commit()
+    await run_in_threadpool(public_cache.invalidate_project, project_id)
+    return True
@@ -1,10 +1,12 @@
 # backend/crud/user.py
 from typing import Optional, List, TYPE_CHECKING
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from database.models.user import User
 from database.models.profile import Profile
 from database.models.settings import Settings
-from auth.security import get_password_hash, verify_password
+from auth.security import get_password_hash, verify_password, verify_and_update_password_async
+from auth.principal_cache import principal_cache
 
 if TYPE_CHECKING:
     from schemas.user import UserCreate
@@ -38,6 +40,13 @@ def get_user_by_id(session: Session, user_id: int) -> Optional[User]:
     user = session.get(User, user_id)
     return user
 
+async def get_user_by_email_async(session: AsyncSession, email: str) -> Optional[User]:
+    result = await session.exec(select(User).where(User.email == email))
+    return result.first()
+
+async def get_user_by_id_async(session: AsyncSession, user_id: int) -> Optional[User]:
+    return await session.get(User, user_id)
+
 def authenticate_user(session: Session, email: str, password: str) -> Optional[User]: 
     user = get_user_by_email(session, email)
     if not user:
@@ -46,11 +55,31 @@ def authenticate_user(session: Session, email: str, password: str) -> Optional[U
         return None
     return user
 
-def create_user_with_profile_and_settings(session: Session, user_data: "UserCreate") -> User:
+async def authenticate_user_async(session: AsyncSession, email: str, password: str) -> Optional[User]:
+    """
+    Like authenticate_user, but uses an async session and bcrypt runs in the password executor.
+    Re-hashes the password when BCRYPT_ROUNDS has changed since it was stored.
+    """
+    user = await get_user_by_email_async(session, email)
+    if not user:
+        return None
+    valid, new_hash = await verify_and_update_password_async(password, user.hashed_password)
+    if not valid:
+        return None
+    if new_hash:
+        user.hashed_password = new_hash
+        session.add(user)
+        await session.commit()
+        await session.refresh(user)
+    return user
+
+def create_user_with_profile_and_settings(session: Session, user_data: "UserCreate",
+                                          hashed_password: Optional[str] = None) -> User:
     """
     Creates a user with associated profile and settings.
+    Pass hashed_password when it has already been computed off the event loop.
     """
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = hashed_password or get_password_hash(user_data.password)
     user = User(email=user_data.email, hashed_password=hashed_password)
 
     session.add(user)
@@ -68,6 +97,21 @@ def create_user_with_profile_and_settings(session: Session, user_data: "UserCrea
 
     return user
 
+async def create_user_with_profile_and_settings_async(session: AsyncSession, user_data: "UserCreate",
+                                                     hashed_password: str) -> User:
+    """
+    Async variant of create_user_with_profile_and_settings (the hash is computed by the caller).
+    """
+    user = User(email=user_data.email, hashed_password=hashed_password)
+    session.add(user)
+    await session.flush()
+
+    session.add(Profile(user_id=user.id, first_name=user_data.first_name))
+    session.add(Settings(user_id=user.id))
+    await session.commit()
+    await session.refresh(user)
+    return user
+
 def get_user_data_with_relations(session: Session, user_id: int) -> Optional[User]:
     user = session.exec(
         select(User)
@@ -141,10 +185,22 @@ def update_settings(
     session.refresh(settings)
     return settings
 
+def set_user_active(session: Session, user_id: int, is_active: bool) -> Optional[User]:
+    user = get_user_by_id(session, user_id)
+    if not user:
+        return None
+    user.is_active = is_active
+    session.add(user)
+    session.commit()
+    session.refresh(user)
+    principal_cache.revoke_user(user_id)
+    return user
+
 def delete_user(session: Session, user_id: int) -> bool:
     user = get_user_by_id(session, user_id)
     if not user:
         return False
     session.delete(user)
     session.commit()
-    return True
\ No newline at end of file
+    principal_cache.revoke_user(user_id)
+    return True
@@ -0,0 +1,32 @@
+"""
+Jednorazowe tworzenie schematu bazy danych - uruchamiane przed startem workerów:
+
+    python -m database.migrate
+"""
+from sqlalchemy import inspect
+
+from database.database import engine, create_db_and_tables
+from sqlmodel import SQLModel
+
+
+def create_missing_indexes() -> list[str]:
+    """create_all nie dodaje nowych indeksów do istniejących tabel - tworzymy brakujące"""
+    inspector = inspect(engine)
+    created = []
+    for table in SQLModel.metadata.sorted_tables:
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(engine)
+                created.append(index.name)
+    return created
+
+
+def migrate() -> None:
+    create_db_and_tables()
+    for name in create_missing_indexes():
+        print(f"Utworzono indeks {name}")
+
+
+if __name__ == "__main__":
+    migrate()
@@ -1,11 +1,17 @@
 from typing import TYPE_CHECKING, Optional, List
 from sqlmodel import Field, SQLModel, Relationship
+from sqlalchemy import Index
 from datetime import datetime
 
 if TYPE_CHECKING:
     from database.models.project import Project
 
 class Chart(SQLModel, table=True):
+    # Wykresy projektu pobierane są zawsze w kolejności (order_index, created_at)
+    __table_args__ = (
+        Index("ix_chart_project_id_order_index_created_at", "project_id", "order_index", "created_at"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     title: str = Field(max_length=200)  # Tytuł wykresu
     description: Optional[str] = Field(default=None, max_length=500)  # Opis wykresu
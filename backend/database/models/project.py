@@ -1,6 +1,6 @@
 from typing import TYPE_CHECKING, Optional, List
 from sqlmodel import Field, SQLModel, Relationship
-from sqlalchemy import Column, Integer, ForeignKey
+from sqlalchemy import Column, Integer, ForeignKey, Index
 from datetime import datetime
 
 if TYPE_CHECKING:
@@ -8,6 +8,12 @@ if TYPE_CHECKING:
     from database.models.chart import Chart
 
 class Project(SQLModel, table=True):
+    # Indeksy pod paginację kursorem (created_at, id) - listy użytkownika i galeria publiczna
+    __table_args__ = (
+        Index("ix_project_user_id_created_at_id", "user_id", "created_at", "id"),
+        Index("ix_project_is_public_created_at_id", "is_public", "created_at", "id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     title: str = Field(max_length=200)  # Tytuł projektu
     description: Optional[str] = Field(default=None, max_length=1000)  # Opis projektu
@@ -1,21 +1,11 @@
 from typing import Optional, TYPE_CHECKING, List
 from sqlmodel import Field, SQLModel, Relationship
-from passlib.context import CryptContext
 
 if TYPE_CHECKING:
     from database.models.profile import Profile
     from database.models.settings import Settings
     from database.models.project import Project
 
-# Password hashing utilities
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
-
 
 class User(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -0,0 +1,46 @@
+from contextlib import contextmanager
+from typing import Iterator
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class QueryCounter:
+    """Zbiera instrukcje SQL wysłane przez silnik w obrębie bloku 'with'"""
+
+    def __init__(self):
+        self.statements: list[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+
+@contextmanager
+def count_queries(engine: Engine) -> Iterator[QueryCounter]:
+    """
+    Liczy zapytania wykonane na danym silniku, np.:
+
+        with count_queries(engine) as counter:
+            get_projects_with_charts_count(session, user_id)
+        assert counter.count == 1
+    """
+    counter = QueryCounter()
+    event.listen(engine, "before_cursor_execute", counter._on_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", counter._on_execute)
+
+
+@contextmanager
+def assert_num_queries(engine: Engine, expected: int) -> Iterator[QueryCounter]:
+    """Zgłasza AssertionError, gdy liczba zapytań w bloku różni się od oczekiwanej"""
+    with count_queries(engine) as counter:
+        yield counter
+    if counter.count != expected:
+        listing = "\n".join(counter.statements)
+        raise AssertionError(f"Expected {expected} queries, got {counter.count}:\n{listing}")
@@ -1,28 +1,61 @@
-from fastapi import FastAPI, File, Response, UploadFile, Depends, HTTPException, status
+import asyncio
+import json
+from typing import Optional
+from fastapi import FastAPI, File, Request, Response, UploadFile, Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
-import pandas as pd
-from io import BytesIO
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from datetime import timedelta
 
-from crud.chart import create_plot 
-from schemas.chart import ChartRequest, Columns
+from schemas.chart import ChartRequest, Columns, ProjectRenderRequest, ARROW_MEDIA_TYPE
+from schemas.pipeline import Pipeline, PipelineRead
+from schemas.job import JobRead
+from services.dataset_store import dataset_store, DatasetNotFound # Per-user dataset storage
+from services.ingest import ingest_upload, wait_until_ready, dataset_profile, IngestError # Streaming CSV ingestion
+from services.render_cache import render_cache # Chart render cache
+from services.render_pool import render_pool, RenderPoolBusy, RenderTimeout # Process pool for matplotlib
+from services.chart_render import render_options, cache_key as chart_cache_key, render as render_chart, render_project, NDJSON_MEDIA_TYPE # Cached chart rendering, single and batch
+from services import chart_store # Content-addressed chart images
+from services.pipeline import PipelineError, validate as validate_pipeline # Lazy per-dataset transformations
+from services.public_cache import public_cache, PUBLIC_CACHE_MAX_AGE # Read-through cache for public projects
+from services.jobs import job_queue # Persistent render job queue (SQLite)
+from services.job_runner import run_jobs, job_events, job_request, job_view # Background execution of queued renders
+from services.prewarm import start_background_prewarm # Background import of pandas/numpy/pyarrow
+from services import metrics # Prometheus-style metrics
+from services.metrics import MetricsMiddleware, monitor_loop_lag
 
-from database.database import get_session, create_db_and_tables # Database setup
+from database.database import get_async_session, create_db_and_tables, dispose_async_engine, pool_stats, check_database, DB_CREATE_ON_STARTUP # Database setup
 from database.models.user import User # User model
-from auth.security import verify_password, create_access_token, decode_access_token # JWT functions
+from auth.security import create_access_token, decode_access_token, get_password_hash_async, logger # JWT functions
+from auth.principal_cache import principal_cache # Per-worker cache of verified tokens
 from schemas.user import UserLogin, Token, UserRead, UserCreate # Pydantic schemas
-from crud.user import create_user_with_profile_and_settings, authenticate_user, get_user_by_email, get_user_by_id # CRUD functions
+from schemas.project import ProjectWithCharts, ProjectPublicPage
+from crud.project import get_project_with_charts_async, get_public_project_with_charts_async, get_public_projects_with_charts_count_async
+from crud.pagination import InvalidCursor
+from crud.user import create_user_with_profile_and_settings_async, authenticate_user_async, get_user_by_email_async, get_user_by_id_async # CRUD functions
 
 # Initialize security
 security = HTTPBearer()
 
 app = FastAPI()
 
-# Create database tables on startup
+# Schema is created once by `python -m database.migrate`; workers only warm up in the background
 @app.on_event("startup")
-def on_startup():
-    create_db_and_tables()
+async def on_startup():
+    if DB_CREATE_ON_STARTUP:
+        create_db_and_tables()
+    render_pool.start()
+    start_background_prewarm()
+    app.state.loop_lag_task = asyncio.create_task(monitor_loop_lag())
+    app.state.job_runner = asyncio.create_task(run_jobs())
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    app.state.loop_lag_task.cancel()
+    app.state.job_runner.cancel()
+    render_pool.shutdown()
+    await dispose_async_engine()
 
 # Allow CORS for frontend requests
 app.add_middleware(
@@ -31,37 +64,42 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Rows-Original", "X-Points-Rendered", "X-Downsample-Method", "X-Chart-Image"],
 )
-
-# Global data storage (consider using Redis for production)
-data = pd.DataFrame()
+# Request latency per route template (outermost, so CORS preflights are measured too)
+app.add_middleware(MetricsMiddleware)
 
 # Authentication dependency
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db = Depends(get_session)):
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db = Depends(get_async_session)):
+    token = credentials.credentials
+    # Repeat requests with the same token skip JWT decoding and the user lookup
+    cached = principal_cache.get(token)
+    if cached is not None:
+        return await db.merge(cached, load=False)
     try:
-        token = credentials.credentials
-        print(f"Received token: {token[:20]}...") # Debug log (pokazuje tylko pierwsze 20 znaków)
+        logger.debug("Received token: %s...", token[:20])
         payload = decode_access_token(token)
         user_id = payload.get("sub")
-        print(f"User ID from token: {user_id}")  # Debug log
+        logger.debug("User ID from token: %s", user_id)
         if user_id is None:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Could not validate credentials",
                 headers={"WWW-Authenticate": "Bearer"},
             )
-        user = get_user_by_id(db, int(user_id))
-        if user is None:
-            print(f"User not found for ID: {user_id}")  # Debug log
+        user = await get_user_by_id_async(db, int(user_id))
+        if user is None or not user.is_active:
+            logger.debug("User not found or inactive for ID: %s", user_id)
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="User not found",
                 headers={"WWW-Authenticate": "Bearer"},
             )
-        print(f"User authenticated: {user.email}")  # Debug log
+        logger.debug("User authenticated: %s", user.email)
+        principal_cache.put(token, user, payload.get("exp"))
         return user
     except Exception as e:
-        print(f"Authentication error: {e}")  # Debug log
+        logger.debug("Authentication error: %s", e)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Authentication failed",
@@ -70,23 +108,24 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
 
 # Authentication routes
 @app.post("/auth/register", response_model=UserRead)
-async def register(user: UserCreate, db = Depends(get_session)):
+async def register(user: UserCreate, db = Depends(get_async_session)):
     # Check if user already exists
-    existing_user = get_user_by_email(db, user.email)
+    existing_user = await get_user_by_email_async(db, user.email)
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
     
-    # Create new user
-    new_user = create_user_with_profile_and_settings(db, user)
+    # Create new user (bcrypt runs in the password executor, not on the event loop)
+    hashed_password = await get_password_hash_async(user.password)
+    new_user = await create_user_with_profile_and_settings_async(db, user, hashed_password)
     return new_user
 
 @app.post("/auth/login", response_model=Token)
-async def login(user_credentials: UserLogin, db = Depends(get_session)):
+async def login(user_credentials: UserLogin, db = Depends(get_async_session)):
     # Authenticate user
-    user = authenticate_user(db, user_credentials.email, user_credentials.password)
+    user = await authenticate_user_async(db, user_credentials.email, user_credentials.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -107,6 +146,45 @@ async def login(user_credentials: UserLogin, db = Depends(get_session)):
 async def get_me(current_user: User = Depends(get_current_user)):
     return current_user
 
+# Connection pool usage for this worker (sizing DB_POOL_SIZE / DB_MAX_OVERFLOW)
+@app.get("/health/db")
+async def db_pool_stats():
+    return pool_stats()
+
+# Readiness probe used by the container HEALTHCHECK: database reachable and render pool running
+@app.get("/health")
+async def health():
+    checks = {
+        "database": await check_database(),
+        "render_pool": render_pool.stats()["running"],
+    }
+    ready = all(checks.values())
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"status": "ok" if ready else "unavailable", "checks": checks},
+    )
+
+# Gauges read from the caches and pools of this worker at scrape time
+@metrics.registry.on_collect
+def _collect_runtime_metrics():
+    metrics.observe_cache("render", render_cache.stats())
+    metrics.observe_cache("public", public_cache.stats())
+    metrics.observe_cache("principal", principal_cache.stats())
+    for engine_name, stats in pool_stats().items():
+        for state in ("size", "checkedin", "checkedout", "overflow"):
+            if state in stats:
+                metrics.DB_POOL.set(stats[state], engine=engine_name, state=state)
+    render_stats = render_pool.stats()
+    metrics.RENDER_POOL.set(render_stats["in_flight"], state="in_flight")
+    metrics.RENDER_POOL.set(render_stats["queue_size"], state="capacity")
+    for job_status, count in job_queue.counts().items():
+        metrics.RENDER_JOBS.set(count, status=job_status)
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    # Collectors read the SQLite job queue, so rendering must not block the event loop
+    return Response(content=await run_in_threadpool(metrics.registry.render), media_type=metrics.CONTENT_TYPE)
+
 # Test endpoint without authentication
 @app.get("/test/")
 async def test_endpoint():
@@ -120,25 +198,243 @@ async def test_auth_endpoint(current_user: User = Depends(get_current_user)):
 # Protected file upload route
 @app.post("/upload/")
 async def upload_file(file: UploadFile = File(...), current_user: User = Depends(get_current_user)):
-    file_location = f"uploads/{file.filename}"  # Save in 'uploads' directory (development only)
-    with open(file_location, "wb") as buffer:
-        buffer.write(await file.read())
-    columns = pd.read_csv(file_location).columns.tolist()
-    global data
-    data = pd.read_csv(file_location)
-    print(columns)
-    return {"columns": columns, "message": "File uploaded successfully"}
+    # Stream to disk and return as soon as the header is known; parsing continues in the background
+    try:
+        meta = await ingest_upload(file, current_user.id)
+    except IngestError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid CSV file: {e}"
+        )
+    columns = meta["columns"]
+    logger.debug("Uploaded dataset %s with columns %s", meta["dataset_id"], columns)
+    return {"columns": columns, "dataset_id": meta["dataset_id"], "message": "File uploaded successfully"}
+
+# Dataset metadata: parsing status, row count, stored schema and memory footprint
+@app.get("/datasets/{dataset_id}")
+async def get_dataset(dataset_id: str, current_user: User = Depends(get_current_user)):
+    try:
+        meta = dataset_store.metadata(current_user.id, dataset_id)
+    except DatasetNotFound:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Dataset not found")
+    return meta
+
+# Column profile computed at ingestion (nulls, distinct counts, min/max/mean, quantiles)
+@app.get("/datasets/{dataset_id}/profile")
+async def get_dataset_profile(dataset_id: str, request: Request, current_user: User = Depends(get_current_user)):
+    try:
+        await wait_until_ready(current_user.id, dataset_id)
+        etag = f'"profile-{dataset_store.base_fingerprint(current_user.id, dataset_id)}"'
+    except DatasetNotFound:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Dataset not found")
+    except IngestError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid CSV file: {e}")
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if request.headers.get("if-none-match") in (etag, f"W/{etag}"):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    profile = await run_in_threadpool(dataset_profile, current_user.id, dataset_id)
+    return JSONResponse(content=profile, headers=headers)
+
+# Transformation pipeline applied lazily to the raw dataset before every chart
+@app.get("/datasets/{dataset_id}/pipeline", response_model=PipelineRead)
+async def get_dataset_pipeline(dataset_id: str, current_user: User = Depends(get_current_user)):
+    try:
+        await wait_until_ready(current_user.id, dataset_id)
+        meta = dataset_store.metadata(current_user.id, dataset_id)
+        steps = dataset_store.pipeline(current_user.id, dataset_id)
+        columns = validate_pipeline(steps, meta["columns"])
+    except DatasetNotFound:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Dataset not found")
+    except IngestError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid CSV file: {e}")
+    except PipelineError:
+        columns = meta["columns"]  # Stored steps no longer match the data; the client can replace them
+    return {"steps": steps, "columns": columns}
+
+@app.put("/datasets/{dataset_id}/pipeline", response_model=PipelineRead)
+async def put_dataset_pipeline(dataset_id: str, pipeline: Pipeline, current_user: User = Depends(get_current_user)):
+    steps = [step.model_dump(exclude_none=True) for step in pipeline.steps]
+    try:
+        await wait_until_ready(current_user.id, dataset_id)
+        meta = dataset_store.metadata(current_user.id, dataset_id)
+        columns = validate_pipeline(steps, meta["columns"])
+        dataset_store.write_pipeline(current_user.id, dataset_id, steps)
+    except DatasetNotFound:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Dataset not found")
+    except IngestError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid CSV file: {e}")
+    except PipelineError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid pipeline: {e}")
+    return {"steps": steps, "columns": columns}
+
+def _render_headers(render_meta: dict) -> dict:
+    # Reports how much the data was reduced before drawing
+    return {
+        "X-Rows-Original": str(render_meta.get("rows", "")),
+        "X-Points-Rendered": str(render_meta.get("points", "")),
+        "X-Downsample-Method": render_meta.get("method") or "none",
+    }
+
+async def _persist(content: bytes, render_meta: dict) -> str:
+    # The already-encoded bytes are written before responding, so create_chart can resolve the name right away
+    if render_meta.get("media_type") not in chart_store.EXTENSIONS:
+        return ""
+    name = chart_store.image_name(content, render_meta["media_type"])
+    await run_in_threadpool(chart_store.persist, content, name)
+    return name
 
 # Protected chart creation route
 @app.post("/chart/")
-async def create_chart_endpoint(chart_request: ChartRequest, current_user: User = Depends(get_current_user)):
-    chart_type = chart_request.chartType 
-    columns = chart_request.columns    
-    global data
-    plot_result = create_plot(data, chart_type, columns) 
-    if isinstance(plot_result, str):
+async def create_chart_endpoint(chart_request: ChartRequest, request: Request,
+                                current_user: User = Depends(get_current_user)):
+    try:
+        dataset_id = dataset_store.resolve(current_user.id, chart_request.dataset_id)
+        await wait_until_ready(current_user.id, dataset_id)
+        fingerprint = dataset_store.fingerprint(current_user.id, dataset_id)
+    except DatasetNotFound:
+        return {"message": "Brak danych do wygenerowania wykresu."}
+    except IngestError as e:
+        return {"message": f"Nie udało się wczytać danych: {e}"}
+
+    # The key is derived from the request and dataset content, so it doubles as the ETag
+    # Data mode (json/arrow): the client draws the reduced series itself
+    options = render_options(chart_request, prefer_arrow=ARROW_MEDIA_TYPE in request.headers.get("accept", ""))
+    cache_key = chart_cache_key(fingerprint, chart_request, options)
+    headers = {"ETag": f'"{cache_key}"', "Cache-Control": "private, no-cache"}
+    if request.headers.get("if-none-match") in (f'"{cache_key}"', f'W/"{cache_key}"'):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    # Cached bytes are served as-is; otherwise the render pool loads the dataset by reference
+    try:
+        kind, plot_result, render_meta = await render_chart(current_user.id, dataset_id, chart_request, options,
+                                                            cache_key)
+    except RenderPoolBusy:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many chart renders in progress, try again shortly",
+            headers={"Retry-After": "1"},
+        )
+    except RenderTimeout:
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="Chart rendering timed out"
+        )
+    except DatasetNotFound:
+        return {"message": "Brak danych do wygenerowania wykresu."}
+    if kind == "message":
         return {"message": plot_result}
-    elif isinstance(plot_result, BytesIO):
-        return Response(content=plot_result.read(), media_type="image/png")
+    elif kind in ("cached", "image", "data"):
+        if chart_request.persist:
+            headers["X-Chart-Image"] = await _persist(plot_result, render_meta)
+        return Response(content=plot_result, media_type=render_meta.get("media_type", "image/png"),
+                        headers={**headers, **_render_headers(render_meta)})
     else:
-        return {"message": "Nie udało się wygenerować wykresu - nieznany błąd"}
\ No newline at end of file
+        return {"message": "Nie udało się wygenerować wykresu - nieznany błąd"}
+
+# Dashboard: every chart of a project in one request, streamed as NDJSON in completion order
+@app.post("/projects/{project_id}/render")
+async def render_project_endpoint(project_id: int, render_request: Optional[ProjectRenderRequest] = None,
+                                  current_user: User = Depends(get_current_user), db = Depends(get_async_session)):
+    render_request = render_request or ProjectRenderRequest()
+    project = await get_project_with_charts_async(db, project_id, current_user.id)
+    if project is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Project not found")
+    return StreamingResponse(
+        render_project(current_user.id, project, render_request.chart_ids, render_request.overrides()),
+        media_type=NDJSON_MEDIA_TYPE,
+        # Each line is flushed as soon as its chart is ready (nginx would otherwise buffer the stream)
+        headers={"Cache-Control": "no-store", "X-Accel-Buffering": "no"},
+    )
+
+# Background render jobs: persistent queue, deduplicated, cancellable, progress over SSE
+@app.post("/jobs", response_model=JobRead, status_code=status.HTTP_202_ACCEPTED)
+async def submit_render_job(chart_request: ChartRequest, request: Request, current_user: User = Depends(get_current_user)):
+    try:
+        dataset_id = dataset_store.resolve(current_user.id, chart_request.dataset_id)
+        fingerprint = dataset_store.fingerprint(current_user.id, dataset_id)
+    except DatasetNotFound:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Dataset not found")
+    chart_request = chart_request.model_copy(update={"dataset_id": dataset_id, "persist": False})
+    prefer_arrow = ARROW_MEDIA_TYPE in request.headers.get("accept", "")
+    # Identical requests (same data, chart and options) share one job while it is in flight
+    dedupe_key = chart_cache_key(fingerprint, chart_request, render_options(chart_request, prefer_arrow))
+    job, deduplicated = await run_in_threadpool(
+        job_queue.submit, current_user.id, dedupe_key, job_request(chart_request, prefer_arrow)
+    )
+    return job_view(job, deduplicated)
+
+@app.get("/jobs/{job_id}", response_model=JobRead)
+async def get_render_job(job_id: str, current_user: User = Depends(get_current_user)):
+    job = await run_in_threadpool(job_queue.get, job_id, current_user.id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return job_view(job)
+
+@app.get("/jobs/{job_id}/events")
+async def render_job_events(job_id: str, current_user: User = Depends(get_current_user)):
+    if await run_in_threadpool(job_queue.get, job_id, current_user.id) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return StreamingResponse(job_events(job_id, current_user.id), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-store", "X-Accel-Buffering": "no"})
+
+@app.get("/jobs/{job_id}/result")
+async def get_render_job_result(job_id: str, current_user: User = Depends(get_current_user)):
+    job = await run_in_threadpool(job_queue.get, job_id, current_user.id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    if job["status"] != "done":
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Job is {job['status']}")
+    try:
+        content = await run_in_threadpool(_read_bytes, job_queue.result_path(job_id))
+    except FileNotFoundError:
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail="Job result has expired")
+    render_meta = json.loads(job["meta"] or "{}")
+    return Response(content=content, media_type=job["media_type"],
+                    headers={"Cache-Control": "private, max-age=3600", **_render_headers(render_meta)})
+
+@app.delete("/jobs/{job_id}", response_model=JobRead)
+async def cancel_render_job(job_id: str, current_user: User = Depends(get_current_user)):
+    job = await run_in_threadpool(job_queue.cancel, job_id, current_user.id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return job_view(job)
+
+def _read_bytes(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+def _public_response(request: Request, payload: bytes) -> Response:
+    # Shared caches (nginx) may keep public payloads for a short time; ETag lets them revalidate cheaply
+    etag = public_cache.etag(payload)
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={PUBLIC_CACHE_MAX_AGE}, stale-while-revalidate={PUBLIC_CACHE_MAX_AGE}"}
+    if request.headers.get("if-none-match") in (etag, f"W/{etag}"):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=payload, media_type="application/json", headers=headers)
+
+# Public gallery (no authentication)
+@app.get("/public/projects", response_model=ProjectPublicPage)
+async def list_public_projects(request: Request, cursor: Optional[str] = None, limit: int = 20,
+                               db = Depends(get_async_session)):
+    async def load():
+        try:
+            items, next_cursor = await get_public_projects_with_charts_count_async(db, cursor, limit)
+        except InvalidCursor:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+        return ProjectPublicPage(items=items, next_cursor=next_cursor).model_dump_json().encode()
+
+    key = await run_in_threadpool(public_cache.gallery_key, cursor, limit)
+    payload = await public_cache.get_or_load(key, load)
+    return _public_response(request, payload)
+
+@app.get("/public/projects/{project_id}", response_model=ProjectWithCharts)
+async def get_public_project(project_id: int, request: Request, db = Depends(get_async_session)):
+    async def load():
+        project = await get_public_project_with_charts_async(db, project_id)
+        if project is None:
+            return None
+        return ProjectWithCharts.model_validate(project).model_dump_json().encode()
+
+    payload = await public_cache.get_or_load(public_cache.project_key(project_id), load)
+    if payload is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Project not found")
+    return _public_response(request, payload)
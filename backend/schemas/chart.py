@@ -1,16 +1,166 @@
-from typing import Optional, List
-from pydantic import BaseModel, Field
+import json
+from typing import Optional, List, Literal, Union
+from pydantic import BaseModel, Field, model_validator
 from datetime import datetime
 
 
 class Columns(BaseModel):
     x_column: list[str] = Field(..., min_items=1)
     y_columns: list[str] = Field(..., min_items=1)
+    # Wykres kołowy: domyślnie kategoria = x_column, wartość = y_columns
+    category_column: Optional[list[str]] = None
+    value_column: Optional[list[str]] = None
+
+
+FilterValue = Union[bool, float, str]
+
+
+class Filter(BaseModel):
+    """Warunek na kolumnę, np. {"column": "region", "op": "==", "value": "EU"}"""
+    column: str
+    op: Literal["==", "!=", "<", "<=", ">", ">=", "in", "not_in", "between", "is_null", "not_null"]
+    value: Optional[Union[FilterValue, list[FilterValue]]] = None  # Lista dla in/not_in, [od, do] dla between
+
+    @model_validator(mode="after")
+    def _check_value(self):
+        listed = isinstance(self.value, list)
+        if self.op in ("is_null", "not_null"):
+            if self.value is not None:
+                raise ValueError(f"'{self.op}' takes no value")
+        elif self.op in ("in", "not_in"):
+            if not listed or not self.value:
+                raise ValueError(f"'{self.op}' requires a non-empty list")
+        elif self.op == "between":
+            if not listed or len(self.value) != 2:
+                raise ValueError("'between' requires [low, high]")
+        elif self.value is None or listed:
+            raise ValueError(f"'{self.op}' requires a single value")
+        return self
+
+
+class RowRange(BaseModel):
+    """Zakres wierszy zbioru [start, stop) - przed filtrami"""
+    start: int = Field(default=0, ge=0)
+    stop: Optional[int] = Field(default=None, ge=0)
+
+    @model_validator(mode="after")
+    def _check_order(self):
+        if self.stop is not None and self.stop < self.start:
+            raise ValueError("stop must not be smaller than start")
+        return self
+
+
+class TimeRange(BaseModel):
+    """Okno czasu na osi X z datami [start, end] (daty bez strefy - w strefie kolumny)"""
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+
+    @model_validator(mode="after")
+    def _check_order(self):
+        if self.start is not None and self.end is not None and self.end < self.start:
+            raise ValueError("end must not be earlier than start")
+        return self
+
+
+# Kubełek czasu: "auto" (z zakresu i szerokości wykresu), "none" albo np. "30s", "1min", "1h", "1d", "1w"
+RESAMPLE_PATTERN = r"^(auto|none|[1-9][0-9]{0,3}(s|min|h|d|w))$"
+
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+IMAGE_MEDIA_TYPES = {
+    "png": "image/png",
+    "webp": "image/webp",
+    "jpeg": "image/jpeg",
+    "svg": "image/svg+xml",
+}
+
+# Presety rozmiaru (szerokość px, wysokość px, dpi)
+FIGURE_PRESETS = {
+    "default": (1600, 900, 100),
+    "thumbnail": (480, 270, 72),
+}
 
 
 class ChartRequest(BaseModel):
     chartType: str
     columns: Columns
+    dataset_id: Optional[str] = None  # Domyślnie ostatnio wgrany zbiór użytkownika
+    max_points: Optional[int] = Field(default=None, ge=10, le=1_000_000)  # Limit punktów na serię (line/scatter/area)
+    aggregation: Literal["sum", "mean", "count", "median"] = "sum"  # Grupowanie dla bar/pie
+    top_n: Optional[int] = Field(default=None, ge=1, le=1000)  # Liczba kategorii przed kubełkiem "Inne"
+    output: Literal["png", "webp", "jpeg", "svg", "json", "arrow"] = "png"  # json/arrow - dane serii do rysowania po stronie klienta
+    width: Optional[int] = Field(default=None, ge=64, le=4096)  # Szerokość w pikselach
+    height: Optional[int] = Field(default=None, ge=64, le=4096)  # Wysokość w pikselach
+    dpi: Optional[int] = Field(default=None, ge=36, le=300)
+    preset: Optional[Literal["default", "thumbnail"]] = None  # Np. miniatury w listach projektów
+    filters: list[Filter] = Field(default_factory=list, max_length=20)  # Łączone przez AND
+    rows: Optional[RowRange] = None
+    resample: str = Field(default="auto", pattern=RESAMPLE_PATTERN)  # Oś X z datami (line/area)
+    resample_agg: Literal["mean", "sum", "min", "max", "count", "first", "last"] = "mean"
+    time_range: Optional[TimeRange] = None
+    persist: bool = False  # Zapisz obraz (nazwa w nagłówku X-Chart-Image) do późniejszego create_chart
+
+    def figure(self) -> dict:
+        """Rozmiar figury po uwzględnieniu presetu (jawne width/height/dpi mają pierwszeństwo)"""
+        width, height, dpi = FIGURE_PRESETS[self.preset or "default"]
+        return {"width": self.width or width, "height": self.height or height, "dpi": self.dpi or dpi}
+
+    def query(self) -> Optional[dict]:
+        """Filtry i zakres wierszy jako słownik dla procesu renderującego (None - cały zbiór)"""
+        if not self.filters and self.rows is None:
+            return None
+        return {
+            "filters": [f.model_dump() for f in self.filters],
+            "rows": self.rows.model_dump() if self.rows else None,
+        }
+
+    def resampling(self) -> Optional[dict]:
+        """Kubełek, agregacja i okno czasu dla procesu renderującego (None - ustawienia domyślne)"""
+        window = self.time_range or TimeRange()
+        if self.resample == "auto" and self.resample_agg == "mean" and window.start is None and window.end is None:
+            return None
+        return {"bucket": self.resample, "agg": self.resample_agg, **window.model_dump(mode="json")}
+
+
+def _column_list(raw: Optional[str]) -> list[str]:
+    """Kolumny zapisane w wykresie: lista JSON, pojedyncza nazwa albo nazwy po przecinku"""
+    if not raw:
+        return []
+    try:
+        value = json.loads(raw)
+    except ValueError:
+        return [c.strip() for c in raw.split(",") if c.strip()]
+    return [str(c) for c in value] if isinstance(value, list) else [str(value)]
+
+
+def saved_chart_request(chart, dataset_id: Optional[str] = None, **overrides) -> ChartRequest:
+    """
+    ChartRequest odtworzony z zapisanego wykresu: chart_config (JSON z polami ChartRequest)
+    uzupełniony o chart_type i kolumny x_columns/y_columns. overrides - np. rozmiar miniatur.
+    """
+    config = json.loads(chart.chart_config) if chart.chart_config else {}
+    if not isinstance(config, dict):
+        config = {}
+    if "preset" in overrides:
+        # Preset z żądania wygrywa z rozmiarem zapisanym w wykresie
+        config = {k: v for k, v in config.items() if k not in ("width", "height", "dpi")}
+    columns = config.get("columns") or {"x_column": _column_list(chart.x_columns),
+                                        "y_columns": _column_list(chart.y_columns)}
+    return ChartRequest(**{**config, **overrides, "chartType": chart.chart_type, "columns": columns,
+                           "dataset_id": config.get("dataset_id") or dataset_id, "persist": False})
+
+
+class ProjectRenderRequest(BaseModel):
+    """Renderowanie wszystkich (albo wybranych) wykresów projektu jednym żądaniem"""
+    chart_ids: Optional[list[int]] = Field(default=None, max_length=500)
+    output: Optional[Literal["png", "webp", "jpeg", "svg", "json", "arrow"]] = None
+    width: Optional[int] = Field(default=None, ge=64, le=4096)
+    height: Optional[int] = Field(default=None, ge=64, le=4096)
+    dpi: Optional[int] = Field(default=None, ge=36, le=300)
+    preset: Optional[Literal["default", "thumbnail"]] = None
+
+    def overrides(self) -> dict:
+        """Ustawienia nadpisujące chart_config każdego wykresu"""
+        return self.model_dump(exclude_none=True, exclude={"chart_ids"})
 
 
 class ChartBase(BaseModel):
@@ -24,7 +174,8 @@ class ChartBase(BaseModel):
 
 
 class ChartCreate(ChartBase):
-    chart_image_path: str
+    chart_image_path: Optional[str] = None
+    chart_image: Optional[str] = None  # Nazwa obrazu z nagłówka X-Chart-Image (zamiast ścieżki)
     project_id: int
 
 
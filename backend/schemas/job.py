@@ -0,0 +1,30 @@
+from datetime import datetime
+from typing import Literal, Optional
+from pydantic import BaseModel
+
+
+def _utc(timestamp: Optional[float]) -> Optional[datetime]:
+    return datetime.utcfromtimestamp(timestamp) if timestamp is not None else None
+
+
+class JobRead(BaseModel):
+    """Stan zadania renderowania z trwałej kolejki"""
+    id: str
+    status: Literal["queued", "running", "done", "failed", "cancelled"]
+    stage: Optional[Literal["loading", "plotting", "encoding"]] = None  # Etap wykonywanego zadania
+    progress: float  # Przybliżony postęp 0..1 wynikający z etapu
+    attempts: int
+    error: Optional[str] = None
+    media_type: Optional[str] = None  # Typ wyniku (GET /jobs/{id}/result), gdy status = done
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    deduplicated: bool = False  # Zgłoszenie dołączyło do identycznego zadania w toku
+
+    @classmethod
+    def from_row(cls, job: dict, progress: float, deduplicated: bool = False) -> "JobRead":
+        return cls(
+            id=job["id"], status=job["status"], stage=job["stage"], progress=progress, attempts=job["attempts"],
+            error=job["error"], media_type=job["media_type"], created_at=_utc(job["created_at"]),
+            started_at=_utc(job["started_at"]), finished_at=_utc(job["finished_at"]), deduplicated=deduplicated,
+        )
@@ -0,0 +1,60 @@
+from typing import Annotated, Literal, Optional, Union
+from pydantic import BaseModel, Field, model_validator
+
+
+class FillNa(BaseModel):
+    op: Literal["fillna"]
+    columns: list[str] = Field(..., min_length=1)
+    strategy: Literal["value", "zero", "mean", "median", "ffill", "bfill"] = "value"
+    value: Optional[Union[float, str]] = None  # Tylko dla strategy="value"
+
+    @model_validator(mode="after")
+    def _value_required(self):
+        if self.strategy == "value" and self.value is None:
+            raise ValueError("fillna with strategy 'value' requires a value")
+        return self
+
+
+class DropNa(BaseModel):
+    op: Literal["dropna"]
+    columns: list[str] = Field(..., min_length=1)  # Usuwa wiersze z brakami w tych kolumnach
+
+
+class Scale(BaseModel):
+    op: Literal["scale"]
+    columns: list[str] = Field(..., min_length=1)
+    method: Literal["minmax", "zscore"] = "minmax"
+
+
+class Cast(BaseModel):
+    op: Literal["cast"]
+    columns: list[str] = Field(..., min_length=1)
+    to: Literal["int", "float", "str", "category", "datetime"]
+
+
+class Derive(BaseModel):
+    """Nowa kolumna: left <operator> (right_column albo right_value)"""
+    op: Literal["derive"]
+    name: str = Field(..., min_length=1, max_length=100)
+    left: str
+    operator: Literal["+", "-", "*", "/"]
+    right_column: Optional[str] = None
+    right_value: Optional[float] = None
+
+    @model_validator(mode="after")
+    def _one_right_operand(self):
+        if (self.right_column is None) == (self.right_value is None):
+            raise ValueError("derive requires exactly one of right_column or right_value")
+        return self
+
+
+PipelineStep = Annotated[Union[FillNa, DropNa, Scale, Cast, Derive], Field(discriminator="op")]
+
+
+class Pipeline(BaseModel):
+    """Kroki przekształceń zbioru - wykonywane w kolejności przy każdym wykresie"""
+    steps: list[PipelineStep] = Field(default_factory=list, max_length=50)
+
+
+class PipelineRead(Pipeline):
+    columns: list[str]  # Kolumny dostępne po wykonaniu wszystkich kroków
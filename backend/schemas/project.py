@@ -51,3 +51,15 @@ class ProjectPublic(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class ProjectPage(BaseModel):
+    """Strona projektów - next_cursor przekazujemy w kolejnym żądaniu (None = koniec listy)"""
+    items: List[Project] = []
+    next_cursor: Optional[str] = None
+
+
+class ProjectPublicPage(BaseModel):
+    """Strona publicznej galerii projektów"""
+    items: List[ProjectPublic] = []
+    next_cursor: Optional[str] = None
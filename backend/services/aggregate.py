@@ -0,0 +1,192 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Optional
+
+from dotenv import load_dotenv
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+load_dotenv()
+
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+GROUP_CACHE_DIR = os.path.join(UPLOAD_DIR, "cache", "groups")
+GROUP_CACHE_ENTRIES = int(os.getenv("GROUP_CACHE_ENTRIES", "256"))
+GROUP_CACHE_DISK_BYTES = int(os.getenv("GROUP_CACHE_DISK_MB", "256")) * 1024 * 1024
+# Sprzątanie dysku schodzi do tego ułamka limitu, żeby kolejne zapisy nie przeglądały katalogu od razu
+_DISK_LOW_WATER = 0.9
+
+AGGREGATIONS = ("sum", "mean", "count", "median")
+OTHER_LABEL = "Inne"
+# Domyślna liczba kategorii pokazywanych osobno (reszta trafia do "Inne")
+DEFAULT_TOP_N = {"bar": 30, "pie": 10}
+
+
+def _values(df: "pd.DataFrame", value_col: str) -> "pd.Series":
+    # Kolumny zmniejszone przy wczytywaniu (float32) agregujemy w pełnej precyzji
+    values = df[value_col]
+    return values.astype("float64") if values.dtype == "float32" else values
+
+
+def _compute(df: "pd.DataFrame", category_col: str, value_col: str, agg: str) -> "pd.Series":
+    grouped = _values(df, value_col).groupby(df[category_col], observed=True, sort=True).agg(agg)
+    # Etykiety zawsze jako tekst - wynik jest identyczny z pamięci i z dysku
+    grouped.index = grouped.index.astype(str).rename(None)
+    grouped.name = value_col
+    return grouped
+
+
+def _top_n(grouped: "pd.Series", df: "pd.DataFrame", category_col: str, value_col: str,
+           agg: str, top_n: Optional[int]) -> "pd.Series":
+    """
+    Grupy od największej wartości (remisy alfabetycznie); przy więcej niż top_n
+    grupach resztę łączy w kubełek 'Inne' na końcu.
+    """
+    if top_n is None or len(grouped) <= top_n:
+        # Ta sama kolejność co przy obcinaniu - liczba kategorii nie zmienia układu słupków
+        return grouped.sort_values(ascending=False, kind="stable")
+    import pandas as pd
+
+    top = grouped.nlargest(top_n)
+    if agg in ("sum", "count"):
+        rest = grouped.drop(top.index).sum()
+    else:
+        # Średniej i mediany nie da się złożyć z wyników grup - liczymy z wierszy
+        rest_rows = ~df[category_col].astype(str).isin(top.index)
+        rest = _values(df, value_col)[rest_rows].agg(agg)
+    return pd.concat([top, pd.Series([rest], index=[OTHER_LABEL], name=grouped.name)])
+
+
+class GroupCache:
+    """
+    Cache pełnych wyników grupowania per (odcisk zbioru, kolumny, agregacja).
+
+    Klucz nie zawiera typu wykresu ani top-N, więc przełączanie bar <-> pie
+    na tych samych kolumnach korzysta z tego samego wyniku. Wyniki są małe, więc
+    oprócz LRU w pamięci trafiają też na dysk i są współdzielone między procesami.
+    Każdy zestaw filtrów to osobny wpis, więc dysk ma własny limit (LRU po czasie modyfikacji).
+    """
+
+    def __init__(self, root: str = GROUP_CACHE_DIR, max_entries: int = GROUP_CACHE_ENTRIES,
+                 disk_bytes: int = GROUP_CACHE_DISK_BYTES):
+        self.root = root
+        self.max_entries = max_entries
+        self.disk_bytes = disk_bytes
+        self._entries: "OrderedDict[str, tuple[pd.Series, str]]" = OrderedDict()
+        self._disk_used: Optional[int] = None  # Liczone raz przeglądem katalogu, potem przy zapisie
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(fingerprint: str, category_col: str, value_col: str, agg: str) -> str:
+        payload = json.dumps([fingerprint, category_col, value_col, agg], default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _path(self, dataset_id: str, key: str) -> str:
+        return os.path.join(self.root, dataset_id, f"{key}.parquet")
+
+    def get(self, dataset_id: str, key: str) -> Optional["pd.Series"]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry[0]
+        import pandas as pd
+
+        path = self._path(dataset_id, key)
+        try:
+            series = pd.read_parquet(path).iloc[:, 0]
+            os.utime(path)  # LRU na dysku po czasie modyfikacji
+        except (FileNotFoundError, OSError, ValueError):
+            return None
+        self._remember(dataset_id, key, series)
+        return series
+
+    def put(self, dataset_id: str, key: str, series: "pd.Series") -> None:
+        self._remember(dataset_id, key, series)
+        path = self._path(dataset_id, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            replaced = os.path.getsize(path)
+        except FileNotFoundError:
+            replaced = 0
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        series.to_frame().to_parquet(tmp_path)
+        size = os.path.getsize(tmp_path)
+        os.replace(tmp_path, path)
+        self._account_disk(size - replaced)
+
+    def _account_disk(self, delta: int) -> None:
+        with self._lock:
+            if self._disk_used is not None:
+                self._disk_used += delta
+            used = self._disk_used
+        if used is None or used > self.disk_bytes:
+            self._enforce_disk_limit()
+
+    def _enforce_disk_limit(self) -> None:
+        entries, total = [], 0
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if not name.endswith(".parquet"):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+        if total > self.disk_bytes:
+            target = self.disk_bytes * _DISK_LOW_WATER
+            for _, size, path in sorted(entries):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                if total <= target:
+                    break
+        with self._lock:
+            self._disk_used = total
+
+    def _remember(self, dataset_id: str, key: str, series: "pd.Series") -> None:
+        with self._lock:
+            self._entries[key] = (series, dataset_id)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_dataset(self, dataset_id: str) -> None:
+        with self._lock:
+            for key in [k for k, v in self._entries.items() if v[1] == dataset_id]:
+                del self._entries[key]
+            self._disk_used = None  # Przeliczenie przy następnym zapisie
+        shutil.rmtree(os.path.join(self.root, dataset_id), ignore_errors=True)
+
+
+group_cache = GroupCache()
+
+
+def group_values(df: "pd.DataFrame", category_col: str, value_col: str, agg: str = "sum",
+                 top_n: Optional[int] = None, dataset_id: Optional[str] = None,
+                 fingerprint: Optional[str] = None) -> "pd.Series":
+    """
+    Wektorowe grupowanie przed rysowaniem wykresu słupkowego/kołowego.
+    Zwraca serię: kategoria -> zagregowana wartość (z kubełkiem "Inne" dla top-N).
+    """
+    if agg not in AGGREGATIONS:
+        raise ValueError(f"Nieobsługiwana agregacja: {agg}")
+
+    if dataset_id is None or fingerprint is None:
+        grouped = _compute(df, category_col, value_col, agg)
+    else:
+        key = group_cache.make_key(fingerprint, category_col, value_col, agg)
+        grouped = group_cache.get(dataset_id, key)
+        if grouped is None:
+            grouped = _compute(df, category_col, value_col, agg)
+            group_cache.put(dataset_id, key, grouped)
+    return _top_n(grouped, df, category_col, value_col, agg, top_n)
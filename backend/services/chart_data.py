@@ -0,0 +1,218 @@
+import io
+import json
+import os
+from typing import Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from schemas.chart import ARROW_MEDIA_TYPE
+from services import aggregate, downsample, timeseries
+from services.profile import all_finite
+
+# Domyślna szerokość wykresu w pikselach (16 cali x 100 dpi)
+DEFAULT_WIDTH_PX = 1600
+CHART_TYPES = ("line", "bar", "pie", "scatter", "area")
+# Od tylu punktów klient akceptujący Arrow dostaje Arrow IPC zamiast JSON
+ARROW_MIN_POINTS = int(os.getenv("CHART_DATA_ARROW_MIN_POINTS", "20000"))
+
+
+def _reduce(df, x_col, y_col, method, width_px, max_points, finite=False):
+    """Zwraca indeksy wierszy (pozycyjne) po redukcji serii y_col"""
+    xs = downsample.as_numeric(df[x_col])
+    ys = downsample.as_numeric(df[y_col])
+    if finite:
+        # Profil zbioru gwarantuje brak NaN/inf - bez maski i kopiowania kolumn
+        return downsample.reduce_series(method, xs, ys, width_px, max_points)
+    positions = np.flatnonzero(downsample.valid_mask(xs, ys))
+    return positions[downsample.reduce_series(method, xs[positions], ys[positions], width_px, max_points)]
+
+
+def prepare_chart_data(df: pd.DataFrame, chart_type: str, columns, width_px: int = DEFAULT_WIDTH_PX,
+                       max_points: Optional[int] = None, aggregation: str = "sum", top_n: Optional[int] = None,
+                       dataset_id: Optional[str] = None, fingerprint: Optional[str] = None,
+                       profile: Optional[dict] = None, resample: Optional[dict] = None) -> Union[dict, str]:
+    """
+    Przygotowuje serie do narysowania (po redukcji lub agregacji).
+    Zwraca słownik {chart_type, x_column, series, meta} albo komunikat błędu.
+    Profil zbioru (services/profile.py) pozwala pominąć sprawdzanie braków w kolumnach.
+    resample - kubełek, agregacja i okno czasu dla osi X z datami (ChartRequest.resampling).
+    """
+    x_col = columns.x_column[0]  # Jest tylko jedna wartość dla osi X
+    meta = {"rows": len(df), "points": len(df), "method": None}
+    chart = {"chart_type": chart_type, "x_column": x_col, "series": [], "meta": meta}
+
+    if chart_type in ("line", "area") and timeseries.is_time_axis(df[x_col]):
+        # Oś czasu: wiersze okna w kolejności czasu z posortowanego indeksu zbioru
+        options = resample or {}
+        index = timeseries.time_index(df[x_col], fingerprint, x_col)
+        lo, hi = index.window(options.get("start"), options.get("end"))
+        df = index.take(df, lo, hi)
+        if df.empty:
+            return "Brak danych w wybranym zakresie czasu."
+        meta.update(rows=len(df), points=len(df))
+        crowded = downsample.plan(chart_type, len(df), width_px, max_points) is not None
+        try:
+            bucket = timeseries.plan(index, lo, hi, options.get("bucket", "auto"), width_px, crowded)
+        except ValueError as e:
+            return str(e)
+        if bucket:
+            # Duża seria: agregacja w kubełkach czasu zamiast wybierania pojedynczych punktów
+            agg = options.get("agg", "mean")
+            x, values = timeseries.resample(df, x_col, columns.y_columns, bucket, agg)
+            meta.update(points=len(x), method=f"resample:{bucket}:{agg}")
+            chart["series"] = [{"name": y, "x": x, "y": values[y]} for y in columns.y_columns]
+            return chart
+
+    if chart_type in ("line", "scatter", "area"):
+        # Redukcja liczby punktów dla dużych serii (docelowo ~ szerokość wykresu w pikselach)
+        method = downsample.plan(chart_type, len(df), width_px, max_points)
+        if method == "density" and not pd.api.types.is_numeric_dtype(df[x_col]):
+            method = "minmax"
+        meta["method"] = method
+
+        if chart_type == "area" and method:
+            # Suma indeksów min/max wszystkich serii, żeby warstwy pozostały wyrównane
+            positions = np.unique(np.concatenate([
+                _reduce(df, x_col, y, method, width_px, max_points, all_finite(profile, x_col, y))
+                for y in columns.y_columns
+            ]))
+            rows = df.iloc[positions]
+            chart["series"] = [{"name": y, "x": rows[x_col], "y": rows[y]} for y in columns.y_columns]
+        elif method == "density":
+            # Zbyt wiele punktów - zamiast pojedynczych punktów zwracamy komórki gęstości
+            for y in columns.y_columns:
+                xs = downsample.as_numeric(df[x_col])
+                ys = downsample.as_numeric(df[y])
+                if not all_finite(profile, x_col, y):
+                    mask = downsample.valid_mask(xs, ys)
+                    xs, ys = xs[mask], ys[mask]
+                cx, cy, counts = downsample.density_bins(xs, ys, width_px // 8)
+                chart["series"].append({"name": y, "x": cx, "y": cy, "count": counts})
+        else:
+            for y in columns.y_columns:
+                if method:
+                    rows = df.iloc[_reduce(df, x_col, y, method, width_px, max_points, all_finite(profile, x_col, y))]
+                else:
+                    rows = df
+                chart["series"].append({"name": y, "x": rows[x_col], "y": rows[y]})
+        meta["points"] = max(len(s["x"]) for s in chart["series"])
+
+    elif chart_type == "bar":
+        # Zachowujemy oryginalne sprawdzanie dla wykresu słupkowego (musi być 1 kolumna dla X i Y)
+        if len(columns.y_columns) != 1 or len(columns.x_column) != 1:
+            return "Dla wykresu słupkowego wybierz jedną kolumnę dla osi X (kategoryczną) i jedną dla osi Y (numeryczną)."
+        y_col = columns.y_columns[0]
+        # Jeden słupek na kategorię zamiast jednego na wiersz
+        grouped = aggregate.group_values(df, x_col, y_col, aggregation, top_n or aggregate.DEFAULT_TOP_N["bar"],
+                                         dataset_id, fingerprint)
+        meta.update({"points": len(grouped), "method": f"groupby:{aggregation}"})
+        chart["series"] = [{"name": y_col, "x": grouped.index, "y": grouped.values}]
+
+    elif chart_type == "pie":
+        category_columns = columns.category_column or columns.x_column
+        value_columns = columns.value_column or columns.y_columns
+        if len(value_columns) != 1 or len(category_columns) != 1:
+            return "Dla wykresu kołowego wybierz jedną kolumnę dla kategorii i jedną kolumnę dla wartości."
+        category_col = category_columns[0]
+        value_col = value_columns[0]
+        grouped = aggregate.group_values(df, category_col, value_col, aggregation, top_n or aggregate.DEFAULT_TOP_N["pie"],
+                                         dataset_id, fingerprint)
+        meta.update({"points": len(grouped), "method": f"groupby:{aggregation}"})
+        chart["x_column"] = category_col
+        chart["series"] = [{"name": value_col, "x": grouped.index, "y": grouped.values}]
+
+    elif chart_type == "radar":
+        return "Wykres Radar nie jest jeszcze zaimplementowany w tym przykładzie."
+
+    return chart
+
+
+# --- Serializacja dla klienta ---
+
+def _values(values) -> tuple[str, np.ndarray]:
+    """Zwraca (typ, tablica) - daty jako milisekundy od epoki"""
+    if isinstance(values, (pd.Series, pd.Index)):
+        if pd.api.types.is_datetime64_any_dtype(values):
+            return "datetime", values.to_numpy(dtype="datetime64[ms]").astype("int64")
+        if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            return "number", values.to_numpy(dtype="float64", na_value=np.nan)
+        return "category", values.astype(str).to_numpy(dtype=object)
+    values = np.asarray(values)
+    if values.dtype.kind in "iuf":
+        return "number", values.astype("float64")
+    return "category", values.astype(str).astype(object)
+
+
+def _json_list(values: np.ndarray) -> list:
+    if values.dtype.kind == "f":
+        return np.where(np.isfinite(values), values, None).tolist()
+    return values.tolist()
+
+
+def to_json_bytes(chart: dict) -> bytes:
+    """Kompaktowy JSON kolumnowy: jedna lista wartości na oś i serię"""
+    series = []
+    x_type = None
+    for s in chart["series"]:
+        x_type, xs = _values(s["x"])
+        _, ys = _values(s["y"])
+        item = {"name": s["name"], "x": _json_list(xs), "y": _json_list(ys)}
+        if "count" in s:
+            item["count"] = np.asarray(s["count"]).astype("int64").tolist()
+        series.append(item)
+    payload = {
+        "chart_type": chart["chart_type"],
+        "x_column": chart["x_column"],
+        "x_type": x_type,
+        "series": series,
+        "meta": chart["meta"],
+    }
+    return json.dumps(payload, separators=(",", ":"), allow_nan=False, default=str).encode()
+
+
+def to_arrow_bytes(chart: dict) -> bytes:
+    """Arrow IPC (stream) w formacie długim: series, x, y[, count]"""
+    import pyarrow as pa
+
+    names, xs, ys, counts = [], [], [], []
+    for s in chart["series"]:
+        _, x = _values(s["x"])
+        _, y = _values(s["y"])
+        names.append(np.full(len(x), s["name"], dtype=object))
+        xs.append(x)
+        ys.append(y)
+        counts.append(np.asarray(s["count"], dtype="int64") if "count" in s else np.zeros(len(x), dtype="int64"))
+
+    x_type = _values(chart["series"][0]["x"])[0] if chart["series"] else "number"
+    x_all = np.concatenate(xs) if xs else np.array([], dtype="float64")
+    if x_type == "datetime":
+        x_array = pa.array(x_all.astype("int64"), type=pa.timestamp("ms"))
+    elif x_type == "category":
+        x_array = pa.array(x_all.astype(str) if len(x_all) else [], type=pa.string())
+    else:
+        x_array = pa.array(x_all.astype("float64"), from_pandas=True)
+
+    table = pa.table({
+        "series": pa.array(np.concatenate(names) if names else [], type=pa.string()).dictionary_encode(),
+        "x": x_array,
+        "y": pa.array(np.concatenate(ys).astype("float64") if ys else [], type=pa.float64(), from_pandas=True),
+        "count": pa.array(np.concatenate(counts) if counts else [], type=pa.int64()),
+    })
+    table = table.replace_schema_metadata({
+        "chart_type": chart["chart_type"],
+        "x_column": str(chart["x_column"]),
+        "meta": json.dumps(chart["meta"], default=str),
+    })
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+def serialize(chart: dict, output: str = "json", prefer_arrow: bool = False) -> tuple[bytes, str]:
+    """Zwraca (treść, media type) dla trybu danych wykresu"""
+    points = sum(len(s["x"]) for s in chart["series"])
+    if output == "arrow" or (prefer_arrow and points >= ARROW_MIN_POINTS):
+        return to_arrow_bytes(chart), ARROW_MEDIA_TYPE
+    return to_json_bytes(chart), "application/json"
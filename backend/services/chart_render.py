@@ -0,0 +1,210 @@
+import asyncio
+import base64
+import json
+import os
+import time
+from typing import AsyncIterator, Iterable, Optional
+
+from dotenv import load_dotenv
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
+
+from schemas.chart import ChartRequest, saved_chart_request
+from services import metrics
+from services.dataset_store import DatasetNotFound, dataset_store
+from services.ingest import IngestError, wait_until_ready
+from services.logger import get_logger
+from services.render_cache import make_key, render_cache
+from services.render_pool import RenderPoolBusy, RenderTimeout, chart_data_job, render_job, render_pool
+
+load_dotenv()
+
+# Renderowania jednego żądania zbiorczego w toku (0 - dwa na proces renderujący, w granicach kolejki puli)
+BATCH_RENDER_CONCURRENCY = int(os.getenv("BATCH_RENDER_CONCURRENCY", "0"))
+DATA_OUTPUTS = ("json", "arrow")
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+logger = get_logger("chart_render")
+
+
+def render_options(chart_request: ChartRequest, prefer_arrow: bool = False) -> dict:
+    """Opcje wpływające na wynik renderowania - część klucza cache"""
+    options = {
+        "max_points": chart_request.max_points,
+        "aggregation": chart_request.aggregation,
+        "top_n": chart_request.top_n,
+        "output": chart_request.output,
+        **chart_request.figure(),
+    }
+    query = chart_request.query()
+    if query:
+        # Filtry i zakres wierszy liczone są w procesie renderującym, przy danych
+        options["query"] = query
+    resample = chart_request.resampling()
+    if resample:
+        options["resample"] = resample
+    if chart_request.output in DATA_OUTPUTS:
+        options["prefer_arrow"] = prefer_arrow
+    return options
+
+
+def cache_key(fingerprint: str, chart_request: ChartRequest, options: dict) -> str:
+    return make_key(fingerprint, chart_request.chartType, chart_request.columns.model_dump(), options)
+
+
+async def render(user_id: int, dataset_id: str, chart_request: ChartRequest, options: dict,
+                 key: str, job_id: Optional[str] = None, timeout: Optional[float] = None) -> tuple[str, object, dict]:
+    """
+    Wykres z cache albo z puli renderującej.
+    Zwraca (rodzaj, treść, metadane): "cached"/"image"/"data" z bajtami albo "message" z komunikatem.
+    job_id i timeout - dla zadań z trwałej kolejki (services/job_runner.py).
+    """
+    cached = render_cache.get(dataset_id, key)
+    if cached is not None:
+        content, render_meta = cached
+        return "cached", content, render_meta
+
+    # Proces renderujący wczytuje zbiór z magazynu po referencji (user_id, dataset_id)
+    job_args = (user_id, dataset_id, chart_request.chartType, chart_request.columns.model_dump(),
+                chart_request.max_points, chart_request.aggregation, chart_request.top_n)
+    if chart_request.output in DATA_OUTPUTS:
+        kind, result, render_meta = await render_pool.submit(
+            chart_data_job, *job_args, chart_request.output, options["prefer_arrow"], chart_request.figure(),
+            options.get("query"), options.get("resample"), job_id, timeout=timeout, key=key
+        )
+    else:
+        kind, result, render_meta = await render_pool.submit(
+            render_job, *job_args, chart_request.output, chart_request.figure(), options.get("query"),
+            options.get("resample"), job_id, timeout=timeout, key=key
+        )
+    metrics.observe_stages(kind, render_meta.pop("timings", None))
+    if kind in ("image", "data"):
+        await run_in_threadpool(render_cache.put, dataset_id, key, result, render_meta)
+    return kind, result, render_meta
+
+
+# --- Renderowanie zbiorcze (wszystkie wykresy projektu) ---
+
+def _line(payload: dict, data: Optional[bytes] = None) -> bytes:
+    """Jedna linia NDJSON; gotowy JSON trybu danych wklejany jest bez ponownego parsowania"""
+    body = json.dumps(payload, ensure_ascii=False, default=str).encode()
+    if data is None:
+        return body + b"\n"
+    return body[:-1] + b',"data":' + data + b"}\n"
+
+
+def _result_line(chart_id: int, index: int, kind: str, content: object, render_meta: dict, key: str) -> bytes:
+    if kind == "message":
+        return _error_line(chart_id, index, content)
+    media_type = render_meta.get("media_type", "image/png")
+    payload = {
+        "chart_id": chart_id,
+        "index": index,
+        "status": "ok",
+        "cached": kind == "cached",
+        "etag": f'"{key}"',
+        "media_type": media_type,
+        "rows": render_meta.get("rows"),
+        "points": render_meta.get("points"),
+        "method": render_meta.get("method"),
+    }
+    if media_type == "application/json":
+        return _line({**payload, "encoding": "json"}, content)
+    return _line({**payload, "encoding": "base64", "data": base64.b64encode(content).decode("ascii")})
+
+
+def _error_line(chart_id: int, index: int, message: str) -> bytes:
+    return _line({"chart_id": chart_id, "index": index, "status": "error", "message": message})
+
+
+def _concurrency() -> int:
+    if BATCH_RENDER_CONCURRENCY > 0:
+        return BATCH_RENDER_CONCURRENCY
+    return max(1, min(render_pool.workers * 2, render_pool.queue_size))
+
+
+async def _render_retrying(user_id: int, dataset_id: str, chart_request: ChartRequest, options: dict,
+                           key: str) -> tuple[str, object, dict]:
+    """Przy pełnej kolejce puli (inne żądania) czeka na wolne miejsce zamiast zwracać błąd"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + render_pool.timeout
+    delay = 0.05
+    while True:
+        try:
+            return await render(user_id, dataset_id, chart_request, options, key)
+        except RenderPoolBusy:
+            if loop.time() >= deadline:
+                raise
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 1.0)
+
+
+async def _prepare_datasets(user_id: int, dataset_ids: Iterable[Optional[str]]) -> dict:
+    """Odcisk każdego zbioru liczony raz na żądanie: dataset_id -> (rozwiązany id, odcisk) albo komunikat"""
+    prepared = {}
+    for requested in dataset_ids:
+        try:
+            dataset_id = dataset_store.resolve(user_id, requested)
+            await wait_until_ready(user_id, dataset_id)
+            prepared[requested] = (dataset_id, dataset_store.fingerprint(user_id, dataset_id))
+        except DatasetNotFound:
+            prepared[requested] = "Brak danych do wygenerowania wykresu."
+        except IngestError as e:
+            prepared[requested] = f"Nie udało się wczytać danych: {e}"
+    return prepared
+
+
+async def render_project(user_id: int, project, chart_ids: Optional[list[int]] = None,
+                         overrides: Optional[dict] = None) -> AsyncIterator[bytes]:
+    """
+    Renderuje wykresy projektu równolegle w puli i oddaje linie NDJSON w kolejności ukończenia
+    (wykresy z cache od razu). Ostatnia linia to podsumowanie {"done": true, ...}.
+    """
+    started = time.perf_counter()
+    default_dataset = project.source_file_path if dataset_store.is_dataset_id(project.source_file_path) else None
+    charts = [c for c in project.charts if chart_ids is None or c.id in chart_ids]
+
+    requests, errors = [], 0
+    for index, chart in enumerate(charts):
+        try:
+            requests.append((index, chart.id, saved_chart_request(chart, default_dataset, **(overrides or {}))))
+        except (ValidationError, ValueError) as e:
+            errors += 1
+            yield _error_line(chart.id, index, f"Nieprawidłowa konfiguracja wykresu: {e}")
+
+    datasets = await _prepare_datasets(user_id, dict.fromkeys(r.dataset_id for _, _, r in requests))
+    semaphore = asyncio.Semaphore(_concurrency())
+
+    async def render_one(index: int, chart_id: int, chart_request: ChartRequest) -> tuple[bool, bytes]:
+        dataset = datasets[chart_request.dataset_id]
+        if isinstance(dataset, str):
+            return False, _error_line(chart_id, index, dataset)
+        dataset_id, fingerprint = dataset
+        options = render_options(chart_request)
+        key = cache_key(fingerprint, chart_request, options)
+        try:
+            async with semaphore:
+                kind, content, render_meta = await _render_retrying(user_id, dataset_id, chart_request, options, key)
+        except RenderPoolBusy:
+            return False, _error_line(chart_id, index, "Zbyt wiele renderowań w toku, spróbuj ponownie.")
+        except RenderTimeout:
+            return False, _error_line(chart_id, index, "Przekroczono czas renderowania wykresu.")
+        except DatasetNotFound:
+            return False, _error_line(chart_id, index, "Brak danych do wygenerowania wykresu.")
+        except Exception:
+            logger.exception("Batch render failed for chart %s", chart_id)
+            return False, _error_line(chart_id, index, "Nie udało się wygenerować wykresu - nieznany błąd")
+        return kind != "message", _result_line(chart_id, index, kind, content, render_meta, key)
+
+    tasks = [asyncio.create_task(render_one(*r)) for r in requests]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            ok, line = await finished
+            errors += not ok
+            yield line
+    finally:
+        # Klient się rozłączył - nie renderujemy wykresów, których nikt nie odbierze
+        for task in tasks:
+            task.cancel()
+    yield _line({"done": True, "charts": len(charts), "errors": errors,
+                 "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)})
@@ -0,0 +1,54 @@
+import hashlib
+import os
+import re
+import threading
+from typing import Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+CHART_DIR = os.path.join(UPLOAD_DIR, "charts")
+
+EXTENSIONS = {
+    "image/png": "png",
+    "image/webp": "webp",
+    "image/jpeg": "jpg",
+    "image/svg+xml": "svg",
+}
+_NAME_RE = re.compile(r"^([0-9a-f]{64})\.(png|webp|jpg|svg)$")
+
+
+def image_name(content: bytes, media_type: str) -> str:
+    """Nazwa pliku adresowana treścią: <sha256>.<rozszerzenie>"""
+    return f"{hashlib.sha256(content).hexdigest()}.{EXTENSIONS[media_type]}"
+
+
+def image_path(name: str) -> str:
+    match = _NAME_RE.match(name or "")
+    if not match:
+        raise ValueError(f"Nieprawidłowa nazwa obrazu wykresu: {name}")
+    return os.path.join(CHART_DIR, match.group(1)[:2], name)
+
+
+def persist(content: bytes, name: str) -> str:
+    """Zapisuje już zakodowany obraz (raz - ta sama treść ma tę samą ścieżkę)"""
+    path = image_path(name)
+    if os.path.exists(path):
+        return path
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+    return path
+
+
+def resolve(name: str) -> Optional[str]:
+    """Ścieżka zapisanego obrazu albo None, jeśli go nie ma"""
+    try:
+        path = image_path(name)
+    except ValueError:
+        return None
+    return path if os.path.exists(path) else None
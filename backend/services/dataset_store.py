@@ -0,0 +1,289 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import uuid
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Optional
+
+from dotenv import load_dotenv
+
+from services.aggregate import group_cache
+from services.render_cache import render_cache
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+load_dotenv()
+
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+DATASET_DIR = os.path.join(UPLOAD_DIR, "datasets")
+# Budżet pamięci na "gorące" ramki danych w pojedynczym workerze
+DATASET_CACHE_BYTES = int(os.getenv("DATASET_CACHE_MB", "256")) * 1024 * 1024
+# Rozmiar grupy wierszy w Parquet - mniejsze grupy to dokładniejsze pomijanie po statystykach min/max przy filtrach
+DATASET_ROW_GROUP_ROWS = int(os.getenv("DATASET_ROW_GROUP_ROWS", "100000"))
+
+_DATASET_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+class DatasetNotFound(LookupError):
+    """Brak zbioru danych dla danego użytkownika"""
+
+
+class DatasetStore:
+    """
+    Magazyn zbiorów danych kluczowany (user_id, dataset_id).
+
+    Dane trzymane są na dysku jako Parquet, więc każdy worker uvicorna może
+    obsłużyć wykres dla dowolnego uploadu bez ponownego parsowania CSV.
+    Najczęściej używane ramki są dodatkowo trzymane w LRU w pamięci procesu.
+    """
+
+    def __init__(self, root: str = DATASET_DIR, max_bytes: int = DATASET_CACHE_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._frames: "OrderedDict[tuple[int, str], tuple[pd.DataFrame, int, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    # --- Ścieżki ---
+
+    @staticmethod
+    def new_dataset_id() -> str:
+        return uuid.uuid4().hex
+
+    @staticmethod
+    def is_dataset_id(value: Optional[str]) -> bool:
+        return bool(_DATASET_ID_RE.match(value or ""))
+
+    @staticmethod
+    def _check_id(dataset_id: str) -> str:
+        if not _DATASET_ID_RE.match(dataset_id or ""):
+            raise DatasetNotFound(dataset_id)
+        return dataset_id
+
+    def user_dir(self, user_id: int) -> str:
+        path = os.path.join(self.root, str(int(user_id)))
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def path(self, user_id: int, dataset_id: str, suffix: str = ".parquet") -> str:
+        return os.path.join(self.user_dir(user_id), self._check_id(dataset_id) + suffix)
+
+    # --- Zapis ---
+
+    def save(self, user_id: int, dataset_id: str, df: "pd.DataFrame", meta: Optional[dict] = None) -> None:
+        """Zapisuje ramkę jako Parquet (atomowo) i ustawia ją jako ostatni zbiór użytkownika"""
+        path = self.path(user_id, dataset_id)
+        replaced = os.path.exists(path)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            df.to_parquet(tmp_path, index=False, row_group_size=DATASET_ROW_GROUP_ROWS)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        os.replace(tmp_path, path)
+        if replaced:
+            render_cache.invalidate_dataset(dataset_id)
+            group_cache.invalidate_dataset(dataset_id)
+
+        meta = dict(meta or {})
+        meta.setdefault("dataset_id", dataset_id)
+        meta.setdefault("columns", [str(c) for c in df.columns])
+        meta.setdefault("rows", int(len(df)))
+        self.write_metadata(user_id, dataset_id, meta)
+        self.set_latest(user_id, dataset_id)
+        self._remember((int(user_id), dataset_id), df, os.stat(path).st_mtime_ns)
+
+    def write_metadata(self, user_id: int, dataset_id: str, meta: dict) -> None:
+        path = self.path(user_id, dataset_id, ".json")
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def write_profile(self, user_id: int, dataset_id: str, profile: dict) -> None:
+        """Profil kolumn (services/profile.py) w osobnym pliku - metadane czytane przy każdym żądaniu pozostają małe"""
+        path = self.path(user_id, dataset_id, ".profile.json")
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(profile, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def write_pipeline(self, user_id: int, dataset_id: str, steps: list[dict]) -> None:
+        """Kroki przekształceń (services/pipeline.py); surowy Parquet pozostaje bez zmian"""
+        path = self.path(user_id, dataset_id, ".pipeline.json")
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(steps, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        # Nowe kroki zmieniają odcisk, więc stare wpisy tylko zajmowałyby pamięć
+        render_cache.invalidate_dataset(dataset_id)
+        group_cache.invalidate_dataset(dataset_id)
+
+    def set_latest(self, user_id: int, dataset_id: str) -> None:
+        path = os.path.join(self.user_dir(user_id), "latest")
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self._check_id(dataset_id))
+        os.replace(tmp_path, path)
+
+    # --- Odczyt ---
+
+    def latest_dataset_id(self, user_id: int) -> Optional[str]:
+        try:
+            with open(os.path.join(self.user_dir(user_id), "latest")) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def resolve(self, user_id: int, dataset_id: Optional[str] = None) -> str:
+        """Zwraca dataset_id (domyślnie ostatnio wgrany zbiór użytkownika)"""
+        dataset_id = dataset_id or self.latest_dataset_id(user_id)
+        if dataset_id is None:
+            raise DatasetNotFound(f"user {user_id}")
+        return self._check_id(dataset_id)
+
+    def metadata(self, user_id: int, dataset_id: Optional[str] = None) -> dict:
+        dataset_id = self.resolve(user_id, dataset_id)
+        try:
+            with open(self.path(user_id, dataset_id, ".json"), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise DatasetNotFound(dataset_id)
+
+    def profile(self, user_id: int, dataset_id: str) -> Optional[dict]:
+        """Zapisany profil kolumn albo None (zbiory sprzed profilowania)"""
+        try:
+            with open(self.path(user_id, dataset_id, ".profile.json"), encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def pipeline(self, user_id: int, dataset_id: str) -> list[dict]:
+        """Zapisane kroki przekształceń (pusta lista - dane bez zmian)"""
+        try:
+            with open(self.path(user_id, dataset_id, ".pipeline.json"), encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return []
+
+    def fingerprint(self, user_id: int, dataset_id: str) -> str:
+        """Odcisk danych widzianych przez wykresy: surowy zbiór i kroki przekształceń"""
+        base = self.base_fingerprint(user_id, dataset_id)
+        steps = self.pipeline(user_id, dataset_id)
+        if not steps:
+            return base
+        payload = json.dumps([base, steps], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def base_fingerprint(self, user_id: int, dataset_id: str) -> str:
+        """Odcisk treści zbioru (sha256 wgranego pliku lub czas modyfikacji Parquet)"""
+        meta = self.metadata(user_id, dataset_id)
+        if meta.get("sha256"):
+            return meta["sha256"]
+        try:
+            return f"{dataset_id}:{os.stat(self.path(user_id, dataset_id)).st_mtime_ns}"
+        except FileNotFoundError:
+            raise DatasetNotFound(dataset_id)
+
+    def load(self, user_id: int, dataset_id: Optional[str] = None) -> "pd.DataFrame":
+        """Zwraca ramkę danych z LRU, a przy braku - wczytuje ją z pliku Parquet"""
+        dataset_id = self.resolve(user_id, dataset_id)
+        path = self.path(user_id, dataset_id)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            self.forget(user_id, dataset_id)
+            self._rebuild(user_id, dataset_id)
+            mtime = os.stat(path).st_mtime_ns
+
+        key = (int(user_id), dataset_id)
+        with self._lock:
+            cached = self._frames.get(key)
+            if cached is not None and cached[2] == mtime:
+                self._frames.move_to_end(key)
+                return cached[0]
+
+        import pandas as pd  # Importowane dopiero przy pierwszym odczycie (szybszy start workera)
+
+        df = pd.read_parquet(path)
+        self._remember(key, df, mtime)
+        return df
+
+    def peek(self, user_id: int, dataset_id: str) -> Optional["pd.DataFrame"]:
+        """Ramka z LRU, jeśli jest aktualna - bez wczytywania pliku (None przy braku)"""
+        try:
+            mtime = os.stat(self.path(user_id, dataset_id)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        key = (int(user_id), dataset_id)
+        with self._lock:
+            cached = self._frames.get(key)
+            if cached is None or cached[2] != mtime:
+                return None
+            self._frames.move_to_end(key)
+            return cached[0]
+
+    def _rebuild(self, user_id: int, dataset_id: str) -> None:
+        """Odtwarza brakujący plik Parquet z surowego CSV według zapisanego schematu"""
+        csv_path = self.path(user_id, dataset_id, ".csv")
+        try:
+            meta = self.metadata(user_id, dataset_id)
+        except DatasetNotFound:
+            raise DatasetNotFound(dataset_id)
+        if not meta.get("schema") or not os.path.exists(csv_path):
+            raise DatasetNotFound(dataset_id)
+        from services import dtypes
+
+        df = dtypes.read_csv_typed(csv_path, meta["schema"])
+        path = self.path(user_id, dataset_id)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            df.to_parquet(tmp_path, index=False, row_group_size=DATASET_ROW_GROUP_ROWS)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        os.replace(tmp_path, path)
+
+    # --- LRU ---
+
+    def _remember(self, key: tuple, df: "pd.DataFrame", mtime: int) -> None:
+        size = int(df.memory_usage(deep=True).sum())
+        with self._lock:
+            old = self._frames.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            if size > self.max_bytes:
+                return
+            self._frames[key] = (df, size, mtime)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._frames:
+                _, (_, evicted_size, _) = self._frames.popitem(last=False)
+                self._bytes -= evicted_size
+
+    def forget(self, user_id: int, dataset_id: str) -> None:
+        with self._lock:
+            old = self._frames.pop((int(user_id), dataset_id), None)
+            if old is not None:
+                self._bytes -= old[1]
+
+    def delete(self, user_id: int, dataset_id: str) -> None:
+        self.forget(user_id, dataset_id)
+        render_cache.invalidate_dataset(dataset_id)
+        group_cache.invalidate_dataset(dataset_id)
+        for suffix in (".parquet", ".json", ".profile.json", ".pipeline.json", ".csv"):
+            try:
+                os.remove(self.path(user_id, dataset_id, suffix))
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"frames": len(self._frames), "bytes": self._bytes, "max_bytes": self.max_bytes}
+
+
+dataset_store = DatasetStore()
@@ -0,0 +1,108 @@
+import os
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+# Powyżej tylu punktów na serię wykres punktowy przechodzi na binowanie gęstości
+SCATTER_MAX_POINTS = int(os.getenv("SCATTER_MAX_POINTS", "50000"))
+
+
+def as_numeric(values: pd.Series) -> np.ndarray:
+    """Wartości osi jako float64; dla kolumn nienumerycznych - pozycja wiersza"""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.to_numpy(dtype="datetime64[ns]").view("int64").astype("float64")
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        return values.to_numpy(dtype="float64", na_value=np.nan)
+    return np.arange(len(values), dtype="float64")
+
+
+def valid_mask(*arrays: np.ndarray) -> np.ndarray:
+    mask = np.ones(len(arrays[0]), dtype=bool)
+    for a in arrays:
+        mask &= np.isfinite(a)
+    return mask
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets - zwraca indeksy punktów zachowujących kształt linii.
+    Pole trójkątów liczone jest wektorowo w obrębie każdego kubełka.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    every = (n - 2) / (n_out - 2)
+    edges = (np.arange(n_out - 1) * every).astype(np.int64) + 1
+    out = np.empty(n_out, dtype=np.int64)
+    out[0] = 0
+    out[-1] = n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, stop = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_start, next_stop = edges[i + 1], edges[i + 2]
+        else:
+            next_start, next_stop = n - 1, n
+        avg_x = x[next_start:next_stop].mean()
+        avg_y = y[next_start:next_stop].mean()
+
+        bx = x[start:stop]
+        by = y[start:stop]
+        area = np.abs((x[a] - avg_x) * (by - y[a]) - (x[a] - bx) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+
+def minmax_buckets(y: np.ndarray, n_buckets: int) -> np.ndarray:
+    """Indeksy minimum i maksimum w każdym z n_buckets kubełków (w kolejności wierszy)"""
+    n = len(y)
+    if 2 * n_buckets >= n:
+        return np.arange(n)
+
+    starts = -(-np.arange(n_buckets, dtype=np.int64) * n // n_buckets)
+    counts = np.diff(np.r_[starts, n])
+    bucket = np.repeat(np.arange(n_buckets), counts)
+
+    idx = [np.array([0, n - 1])]
+    for reduce in (np.minimum, np.maximum):
+        extreme = reduce.reduceat(y, starts)
+        hits = np.flatnonzero(y == np.repeat(extreme, counts))
+        _, first = np.unique(bucket[hits], return_index=True)
+        idx.append(hits[first])
+    return np.unique(np.concatenate(idx))
+
+
+def density_bins(x: np.ndarray, y: np.ndarray, bins: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Histogram 2D - zwraca środki niepustych komórek i liczności"""
+    counts, x_edges, y_edges = np.histogram2d(x, y, bins=bins)
+    ix, iy = np.nonzero(counts)
+    x_centers = (x_edges[:-1] + x_edges[1:]) / 2
+    y_centers = (y_edges[:-1] + y_edges[1:]) / 2
+    return x_centers[ix], y_centers[iy], counts[ix, iy]
+
+
+def plan(chart_type: str, n_rows: int, width_px: int, max_points: Optional[int] = None) -> Optional[str]:
+    """Wybiera metodę redukcji na podstawie typu wykresu i szerokości w pikselach"""
+    if chart_type == "line":
+        limit = max_points or width_px
+        return "lttb" if n_rows > limit else None
+    if chart_type == "area":
+        limit = max_points or 2 * width_px
+        return "minmax" if n_rows > limit else None
+    if chart_type == "scatter":
+        limit = max_points or SCATTER_MAX_POINTS
+        return "density" if n_rows > limit else None
+    return None
+
+
+def reduce_series(method: str, x: np.ndarray, y: np.ndarray, width_px: int,
+                  max_points: Optional[int] = None) -> np.ndarray:
+    """Zwraca indeksy (względem x/y) punktów do narysowania"""
+    if method == "lttb":
+        return lttb(x, y, max_points or width_px)
+    if method == "minmax":
+        return minmax_buckets(y, (max_points or 2 * width_px) // 2)
+    return np.arange(len(x))
@@ -0,0 +1,153 @@
+import os
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from pandas.api.types import union_categoricals
+
+load_dotenv()
+
+# Liczba wierszy próbki, na podstawie której zgadujemy typy kolumn
+DTYPE_SAMPLE_ROWS = int(os.getenv("DTYPE_SAMPLE_ROWS", "10000"))
+# Kolumna tekstowa staje się "category", gdy unikalnych wartości jest co najwyżej tyle (ułamek wierszy)
+CATEGORY_MAX_RATIO = float(os.getenv("CATEGORY_MAX_RATIO", "0.5"))
+# Kolumna tekstowa staje się datą, gdy co najmniej taki ułamek wartości próbki parsuje się jednym formatem
+DATETIME_MIN_RATIO = float(os.getenv("DATETIME_MIN_RATIO", "0.95"))
+# Silnik read_csv ("c" albo "pyarrow") i opcjonalny dtype_backend ("pyarrow", "numpy_nullable")
+CSV_ENGINE = os.getenv("DATASET_CSV_ENGINE", "c")
+DTYPE_BACKEND = os.getenv("DATASET_DTYPE_BACKEND") or None
+PARSE_CHUNK_ROWS = int(os.getenv("PARSE_CHUNK_ROWS", "200000"))
+
+
+def _is_low_cardinality(values: pd.Series) -> bool:
+    non_null = values.count()
+    return non_null > 0 and values.nunique(dropna=True) <= CATEGORY_MAX_RATIO * non_null
+
+
+def _is_datetime(values: pd.Series) -> bool:
+    """Tekst z datami w jednym formacie (z rokiem - nazwy miesięcy czy godziny zostają tekstem)"""
+    from pandas.tseries.api import guess_datetime_format
+
+    non_null = values.dropna()
+    if non_null.empty:
+        return False
+    fmt = guess_datetime_format(str(non_null.iloc[0]))
+    if fmt is None or ("%Y" not in fmt and "%y" not in fmt):
+        return False
+    parsed = pd.to_datetime(non_null.astype(str), format=fmt, errors="coerce")
+    return parsed.notna().mean() >= DATETIME_MIN_RATIO
+
+
+def _to_datetime(values: pd.Series) -> pd.Series:
+    """Daty z tekstu; pojedyncze nieparsowalne wartości stają się NaT zamiast psuć całą kolumnę"""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    return pd.to_datetime(values, errors="coerce")
+
+
+def infer_schema(path: str, sample_rows: int = DTYPE_SAMPLE_ROWS) -> tuple[dict, float]:
+    """
+    Zgaduje typy kolumn na podstawie próbki pliku.
+    Zwraca (schemat dla read_csv, bajty na wiersz przy domyślnych typach pandas).
+    """
+    sample = pd.read_csv(path, nrows=sample_rows)
+    schema = {}
+    for col in sample.columns:
+        if sample[col].dtype != object:
+            continue
+        if _is_datetime(sample[col]):
+            schema[str(col)] = "datetime64[ns]"
+        elif _is_low_cardinality(sample[col]):
+            schema[str(col)] = "category"
+    bytes_per_row = sample.memory_usage(deep=True, index=False).sum() / max(len(sample), 1)
+    return schema, float(bytes_per_row)
+
+
+def _read_options(schema: Optional[dict]) -> tuple[dict, list[str]]:
+    """
+    Zamienia zapisany schemat na argumenty read_csv i listę kolumn z datami.
+    Daty parsujemy po wczytaniu (parse_dates zostawia całą kolumnę jako tekst przy jednej złej wartości).
+    """
+    if not schema:
+        return {}, []
+    dtype, dates = {}, []
+    for col, kind in schema.items():
+        if kind.startswith("datetime64"):
+            dates.append(col)
+        elif kind != "object":
+            dtype[col] = kind
+    return {"dtype": dtype}, dates
+
+
+def _parse_dates(df: pd.DataFrame, dates: list[str]) -> pd.DataFrame:
+    for col in dates:
+        if col in df.columns:
+            df[col] = _to_datetime(df[col])
+    return df
+
+
+def _concat(chunks: list[pd.DataFrame]) -> pd.DataFrame:
+    """Łączy kawałki, scalając słowniki kolumn kategorycznych (zwykły concat zrobiłby z nich object)"""
+    if len(chunks) == 1:
+        return chunks[0]
+    df = pd.concat(chunks, ignore_index=True, copy=False)
+    for col in chunks[0].columns:
+        if isinstance(chunks[0][col].dtype, pd.CategoricalDtype) and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = pd.Series(union_categoricals([c[col] for c in chunks]), index=df.index)
+    return df
+
+
+def _mixed_columns(df: pd.DataFrame, chunks: list[pd.DataFrame]) -> list[str]:
+    """Kolumny, które po złączeniu są object, choć w części kawałków miały inny typ"""
+    return [col for col in df.columns
+            if df[col].dtype == object and any(chunk[col].dtype != object for chunk in chunks)]
+
+
+def read_csv_typed(path: str, schema: Optional[dict] = None) -> pd.DataFrame:
+    """Parsuje CSV od razu w docelowych typach (kawałkami przy silniku "c")"""
+    options, dates = _read_options(schema)
+    if DTYPE_BACKEND:
+        options["dtype_backend"] = DTYPE_BACKEND
+    if CSV_ENGINE == "pyarrow":
+        # Silnik pyarrow nie obsługuje chunksize - czyta wielowątkowo cały plik
+        return _parse_dates(pd.read_csv(path, engine="pyarrow", **options), dates)
+    chunks = [_parse_dates(chunk, dates) for chunk in pd.read_csv(path, chunksize=PARSE_CHUNK_ROWS, **options)]
+    if not chunks:
+        return pd.DataFrame()
+    df = _concat(chunks)
+    mixed = _mixed_columns(df, chunks)
+    if mixed:
+        # Typ zmienił się między kawałkami (np. liczby, a dalej tekst) - liczby i tekst w jednej kolumnie
+        # nie zapiszą się do Parquet, więc takie kolumny czytamy ponownie w całości jako tekst
+        text = pd.read_csv(path, usecols=mixed, dtype={col: str for col in mixed})
+        for col in mixed:
+            df[col] = text[col].to_numpy()
+    return df
+
+
+def _downcast(values: pd.Series) -> pd.Series:
+    if not isinstance(values.dtype, np.dtype):
+        return values  # Typy rozszerzone (Arrow, nullable) zostawiamy bez zmian
+    if values.dtype.kind in "iu":
+        return pd.to_numeric(values, downcast="integer" if values.dtype.kind == "i" else "unsigned")
+    if values.dtype == np.float64:
+        # float32 tylko wtedy, gdy nie tracimy precyzji (np. liczby całkowite z brakami)
+        narrow = values.astype(np.float32)
+        if np.array_equal(narrow.to_numpy(dtype=np.float64), values.to_numpy(), equal_nan=True):
+            return narrow
+    if values.dtype == object and _is_low_cardinality(values):
+        return values.astype("category")
+    return values
+
+
+def compact(df: pd.DataFrame) -> pd.DataFrame:
+    """Zmniejsza typy kolumn (downcast liczb, category dla powtarzalnych tekstów)"""
+    out = df.copy(deep=False)
+    for i in range(len(df.columns)):
+        out.isetitem(i, _downcast(df.iloc[:, i]))
+    return out
+
+
+def schema_of(df: pd.DataFrame) -> dict:
+    return {str(col): str(dtype) for col, dtype in df.dtypes.items()}
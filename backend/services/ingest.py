@@ -0,0 +1,193 @@
+import asyncio
+import hashlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
+
+from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
+
+from services import metrics
+from services.dataset_store import dataset_store
+from services.logger import get_logger
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = get_logger("ingest")
+
+# Rozmiar kawałka przy strumieniowaniu uploadu na dysk
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_KB", "1024")) * 1024
+# Ile maksymalnie czekamy na zakończenie parsowania przy żądaniu wykresu
+INGEST_WAIT_SECONDS = float(os.getenv("INGEST_WAIT_SECONDS", "120"))
+
+STATUS_PARSING = "parsing"
+STATUS_READY = "ready"
+STATUS_FAILED = "failed"
+
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv("INGEST_WORKERS", "2")), thread_name_prefix="ingest")
+_pending: "dict[tuple[int, str], asyncio.Future]" = {}
+
+
+class IngestError(RuntimeError):
+    """Parsowanie wgranego pliku nie powiodło się"""
+
+
+async def stream_to_disk(upload: UploadFile, path: str) -> tuple[int, str]:
+    """Zapisuje upload na dysk kawałkami; zwraca (liczba bajtów, sha256)"""
+    hasher = hashlib.sha256()
+    size = 0
+    buffer = await run_in_threadpool(open, path, "wb")
+    try:
+        while True:
+            chunk = await upload.read(UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                break
+            hasher.update(chunk)
+            size += len(chunk)
+            await run_in_threadpool(buffer.write, chunk)
+    finally:
+        await run_in_threadpool(buffer.close)
+    return size, hasher.hexdigest()
+
+
+def sniff_columns(path: str) -> list[str]:
+    """Czyta tylko nagłówek CSV"""
+    import pandas as pd
+
+    return pd.read_csv(path, nrows=0).columns.tolist()
+
+
+def parse_csv(path: str) -> tuple["pd.DataFrame", dict]:
+    """
+    Jednokrotne parsowanie CSV w zwartych typach.
+    Zwraca (ramka, informacja o pamięci względem domyślnych typów pandas).
+    """
+    from services import dtypes
+
+    schema, bytes_per_row = dtypes.infer_schema(path)
+    df = dtypes.compact(dtypes.read_csv_typed(path, schema))
+    typed_bytes = int(df.memory_usage(deep=True, index=False).sum())
+    default_bytes = int(bytes_per_row * len(df))
+    memory = {
+        "bytes": typed_bytes,
+        "default_bytes_estimate": default_bytes,
+        "saved_bytes": max(default_bytes - typed_bytes, 0),
+    }
+    return df, memory
+
+
+def _ingest(user_id: int, dataset_id: str, path: str, meta: dict) -> None:
+    from services import dtypes
+    from services.profile import profile_frame
+
+    start = time.perf_counter()
+    try:
+        df, memory = parse_csv(path)
+    except Exception as e:
+        metrics.PARSE_SECONDS.observe(time.perf_counter() - start, result="failed")
+        dataset_store.write_metadata(user_id, dataset_id, {**meta, "status": STATUS_FAILED, "error": str(e)})
+        raise
+    metrics.PARSE_SECONDS.observe(time.perf_counter() - start, result="ready")
+    metrics.PARSE_ROWS.inc(len(df))
+    try:
+        # Profil przed zapisem zbioru - gdy status jest "ready", profil już istnieje
+        start = time.perf_counter()
+        try:
+            dataset_store.write_profile(user_id, dataset_id, profile_frame(df))
+        except Exception as e:
+            # Brak profilu nie blokuje wykresów - endpoint profilu policzy go ponownie
+            logger.warning("Profiling dataset %s failed: %s", dataset_id, e)
+        metrics.PROFILE_SECONDS.observe(time.perf_counter() - start)
+        # Schemat zapisany przy zbiorze - ponowne wczytanie nie zgaduje typów od nowa
+        dataset_store.save(user_id, dataset_id, df, {**meta, "status": STATUS_READY,
+                                                     "schema": dtypes.schema_of(df), "memory": memory})
+    except Exception as e:
+        # Bez tego metadane zostałyby na "parsing", a wait_until_ready czekałby do limitu
+        try:
+            os.remove(dataset_store.path(user_id, dataset_id, ".profile.json"))
+        except FileNotFoundError:
+            pass
+        dataset_store.write_metadata(user_id, dataset_id, {**meta, "status": STATUS_FAILED, "error": str(e)})
+        raise
+
+
+def dataset_profile(user_id: int, dataset_id: str) -> dict:
+    """Zapisany profil zbioru; dla zbiorów sprzed profilowania liczony i zapisywany przy pierwszym odczycie"""
+    profile = dataset_store.profile(user_id, dataset_id)
+    if profile is None:
+        from services.profile import profile_frame
+
+        profile = profile_frame(dataset_store.load(user_id, dataset_id))
+        dataset_store.write_profile(user_id, dataset_id, profile)
+    return profile
+
+
+async def ingest_upload(upload: UploadFile, user_id: int) -> dict:
+    """
+    Strumieniuje plik na dysk, czyta nagłówek i uruchamia parsowanie w tle.
+    Zwraca metadane zbioru zaraz po odczytaniu kolumn.
+    """
+    dataset_id = dataset_store.new_dataset_id()
+    path = dataset_store.path(user_id, dataset_id, ".csv")
+    start = time.perf_counter()
+    size, sha256 = await stream_to_disk(upload, path)
+    metrics.observe_upload(size, time.perf_counter() - start)
+    import pandas as pd
+
+    try:
+        columns = await run_in_threadpool(sniff_columns, path)
+    except (pd.errors.EmptyDataError, pd.errors.ParserError, UnicodeDecodeError) as e:
+        dataset_store.delete(user_id, dataset_id)
+        raise IngestError(str(e))
+
+    meta = {
+        "dataset_id": dataset_id,
+        "filename": upload.filename,
+        "columns": columns,
+        "size_bytes": size,
+        "sha256": sha256,
+    }
+    dataset_store.write_metadata(user_id, dataset_id, {**meta, "status": STATUS_PARSING})
+    dataset_store.set_latest(user_id, dataset_id)
+
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(_executor, _ingest, user_id, dataset_id, path, meta)
+    key = (int(user_id), dataset_id)
+    _pending[key] = future
+
+    def _done(f: asyncio.Future) -> None:
+        _pending.pop(key, None)
+        if not f.cancelled():
+            f.exception()  # Błąd jest już zapisany w metadanych zbioru
+
+    future.add_done_callback(_done)
+    return meta
+
+
+async def wait_until_ready(user_id: int, dataset_id: str, timeout: float = INGEST_WAIT_SECONDS) -> None:
+    """Czeka na zakończenie parsowania zbioru (również rozpoczętego w innym workerze)"""
+    future = _pending.get((int(user_id), dataset_id))
+    if future is not None:
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            raise IngestError("Przekroczono czas oczekiwania na przetworzenie pliku.")
+        except Exception as e:
+            raise IngestError(str(e))
+        return
+
+    deadline = asyncio.get_running_loop().time() + timeout
+    delay = 0.05
+    while True:
+        meta = dataset_store.metadata(user_id, dataset_id)
+        status = meta.get("status", STATUS_READY)
+        if status == STATUS_READY:
+            return
+        if status == STATUS_FAILED:
+            raise IngestError(meta.get("error") or "Nie udało się przetworzyć pliku.")
+        if asyncio.get_running_loop().time() >= deadline:
+            raise IngestError("Przekroczono czas oczekiwania na przetworzenie pliku.")
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 1.0)
@@ -0,0 +1,152 @@
+import asyncio
+import json
+import os
+import socket
+import time
+from typing import AsyncIterator, Optional
+
+from dotenv import load_dotenv
+from starlette.concurrency import run_in_threadpool
+
+from schemas.chart import ChartRequest
+from schemas.job import JobRead
+from services.chart_render import cache_key, render, render_options
+from services.dataset_store import DatasetNotFound, dataset_store
+from services.ingest import IngestError, wait_until_ready
+from services.jobs import FINISHED, JOB_STALE_SECONDS, JobCancelled, job_queue, progress_of
+from services.logger import get_logger
+from services.render_pool import RenderPoolBusy, RenderTimeout
+
+load_dotenv()
+
+# Zadania z kolejki wykonywane równocześnie przez jeden worker uvicorna (reszta puli zostaje dla /chart/)
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", "1"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "0.5"))
+# Limit czasu renderowania w tle - znacznie dłuższy niż dla żądań synchronicznych
+JOB_TIMEOUT_SECONDS = float(os.getenv("JOB_TIMEOUT_SECONDS", "600"))
+SSE_KEEPALIVE_SECONDS = 15.0
+MAINTENANCE_SECONDS = 60.0
+
+logger = get_logger("jobs")
+
+
+def job_view(job: dict, deduplicated: bool = False) -> JobRead:
+    return JobRead.from_row(job, progress_of(job), deduplicated)
+
+
+def job_request(chart_request: ChartRequest, prefer_arrow: bool) -> dict:
+    """Zapisywana treść zadania - wystarcza do odtworzenia renderowania po restarcie"""
+    return {"chart": chart_request.model_dump(mode="json"), "prefer_arrow": prefer_arrow}
+
+
+async def _heartbeat(job_id: str) -> None:
+    while True:
+        await asyncio.sleep(JOB_STALE_SECONDS / 3)
+        await run_in_threadpool(job_queue.heartbeat, job_id)
+
+
+async def execute(job: dict) -> None:
+    """Renderuje zadanie przez wspólną ścieżkę cache/puli i zapisuje wynik albo błąd w kolejce"""
+    job_id, user_id = job["id"], job["user_id"]
+    heartbeat = asyncio.create_task(_heartbeat(job_id))
+    try:
+        payload = json.loads(job["request"])
+        chart_request = ChartRequest(**payload["chart"])
+        dataset_id = dataset_store.resolve(user_id, chart_request.dataset_id)
+        await wait_until_ready(user_id, dataset_id)
+        options = render_options(chart_request, payload.get("prefer_arrow", False))
+        key = cache_key(dataset_store.fingerprint(user_id, dataset_id), chart_request, options)
+        kind, content, render_meta = await render(user_id, dataset_id, chart_request, options, key,
+                                                  job_id=job_id, timeout=JOB_TIMEOUT_SECONDS)
+        if kind == "message":
+            await run_in_threadpool(job_queue.fail, job_id, content)
+        else:
+            media_type = render_meta.get("media_type", "image/png")
+            await run_in_threadpool(job_queue.finish, job_id, content, media_type, render_meta)
+    except RenderPoolBusy:
+        # Pula zajęta przez żądania synchroniczne - zadanie poczeka w kolejce
+        await run_in_threadpool(job_queue.requeue, job_id)
+        await asyncio.sleep(JOB_POLL_SECONDS)
+    except JobCancelled:
+        pass
+    except RenderTimeout:
+        await run_in_threadpool(job_queue.fail, job_id, "Przekroczono czas renderowania wykresu.")
+    except DatasetNotFound:
+        await run_in_threadpool(job_queue.fail, job_id, "Brak danych do wygenerowania wykresu.")
+    except IngestError as e:
+        await run_in_threadpool(job_queue.fail, job_id, f"Nie udało się wczytać danych: {e}")
+    except asyncio.CancelledError:
+        # Zamykanie workera - zadanie wraca do kolejki dla innego workera albo następnego startu
+        await asyncio.shield(run_in_threadpool(job_queue.requeue, job_id))
+        raise
+    except Exception:
+        logger.exception("Render job %s failed", job_id)
+        await run_in_threadpool(job_queue.fail, job_id, "Nie udało się wygenerować wykresu - nieznany błąd")
+    finally:
+        heartbeat.cancel()
+
+
+async def _slot(worker: str) -> None:
+    while True:
+        try:
+            job = await run_in_threadpool(job_queue.claim, worker)
+        except Exception:
+            logger.exception("Could not claim a render job")
+            job = None
+        if job is None:
+            await asyncio.sleep(JOB_POLL_SECONDS)
+            continue
+        await execute(job)
+
+
+async def _maintenance() -> None:
+    while True:
+        try:
+            recovered = await run_in_threadpool(job_queue.recover)
+            if recovered:
+                logger.warning("Requeued %d render jobs abandoned by stopped workers", recovered)
+            await run_in_threadpool(job_queue.purge)
+        except Exception:
+            logger.exception("Render job maintenance failed")
+        await asyncio.sleep(MAINTENANCE_SECONDS)
+
+
+async def run_jobs() -> None:
+    """Pętla workera: odzyskiwanie porzuconych zadań i JOB_CONCURRENCY równoległych slotów"""
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    tasks = [asyncio.create_task(_maintenance())]
+    tasks += [asyncio.create_task(_slot(worker)) for _ in range(max(JOB_CONCURRENCY, 0))]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def _event(name: str, data: str) -> bytes:
+    return f"event: {name}\ndata: {data}\n\n".encode()
+
+
+async def job_events(job_id: str, user_id: int, poll_seconds: Optional[float] = None) -> AsyncIterator[bytes]:
+    """
+    Server-Sent Events z postępem zadania: "progress" przy każdej zmianie statusu lub etapu,
+    strumień kończy się po statusie końcowym. Stan czytany jest z kolejki, więc zadanie
+    może wykonywać dowolny worker.
+    """
+    poll_seconds = poll_seconds or min(JOB_POLL_SECONDS, 0.25)
+    last, last_sent = None, time.monotonic()
+    while True:
+        job = await run_in_threadpool(job_queue.get, job_id, user_id)
+        if job is None:
+            yield _event("error", json.dumps({"detail": "Job not found"}))
+            return
+        state = (job["status"], job["stage"])
+        if state != last:
+            last, last_sent = state, time.monotonic()
+            yield _event("progress", job_view(job).model_dump_json())
+        elif time.monotonic() - last_sent >= SSE_KEEPALIVE_SECONDS:
+            last_sent = time.monotonic()
+            yield b": keep-alive\n\n"
+        if job["status"] in FINISHED:
+            return
+        await asyncio.sleep(poll_seconds)
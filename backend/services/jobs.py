@@ -0,0 +1,239 @@
+import json
+import os
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+JOB_DIR = os.path.join(UPLOAD_DIR, "jobs")
+# Kolejka w lokalnym pliku SQLite - wspólna dla workerów na jednym hoście i trwała między restartami
+JOB_DB_PATH = os.getenv("JOB_DB_PATH") or os.path.join(JOB_DIR, "jobs.db")
+# Zadanie bez sygnału życia przez tyle sekund wraca do kolejki (worker padł lub został zrestartowany)
+JOB_STALE_SECONDS = float(os.getenv("JOB_STALE_SECONDS", "30"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# Zakończone zadania i ich wyniki są usuwane po tym czasie
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_HOURS", "24")) * 3600
+
+ACTIVE = ("queued", "running")
+FINISHED = ("done", "failed", "cancelled")
+# Etapy z services/metrics.timed -> etap widoczny dla klienta
+STAGES = {
+    "load": "loading",
+    "transform": "loading",
+    "filter": "loading",
+    "prepare": "plotting",
+    "plot": "plotting",
+    "encode": "encoding",
+}
+PROGRESS = {"queued": 0.0, "loading": 0.1, "plotting": 0.5, "encoding": 0.9, "done": 1.0}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS job (
+    id TEXT PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    dedupe_key TEXT NOT NULL,
+    request TEXT NOT NULL,
+    status TEXT NOT NULL,
+    stage TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    media_type TEXT,
+    meta TEXT,
+    worker TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    heartbeat_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS ix_job_status_created_at ON job (status, created_at);
+CREATE INDEX IF NOT EXISTS ix_job_user_id_dedupe_key ON job (user_id, dedupe_key);
+"""
+
+
+class JobCancelled(Exception):
+    """Zadanie anulowane w trakcie renderowania (sprawdzane na granicach etapów)"""
+
+
+class JobQueue:
+    """
+    Trwała kolejka zadań renderowania w SQLite (tryb WAL).
+
+    Każda operacja otwiera własne połączenie, więc z kolejki mogą korzystać
+    wątki workera API i procesy renderujące (zgłaszanie etapów, anulowanie).
+    """
+
+    def __init__(self, path: str = JOB_DB_PATH):
+        self.path = path
+        self.result_dir = os.path.join(os.path.dirname(path), "results")
+        self._ready = False
+
+    @contextmanager
+    def _connect(self, immediate: bool = False):
+        if not self._ready:
+            os.makedirs(self.result_dir, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            if not self._ready:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(_SCHEMA)
+                self._ready = True
+            # BEGIN IMMEDIATE: pobranie zadania przez dwa workery naraz jest niemożliwe
+            conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    # --- Zgłaszanie ---
+
+    def submit(self, user_id: int, dedupe_key: str, request: dict) -> tuple[dict, bool]:
+        """Nowe zadanie albo identyczne zadanie w toku; zwraca (zadanie, czy zdeduplikowane)"""
+        with self._connect(immediate=True) as conn:
+            existing = conn.execute(
+                "SELECT * FROM job WHERE user_id = ? AND dedupe_key = ? AND status IN ('queued', 'running') "
+                "ORDER BY created_at LIMIT 1",
+                (int(user_id), dedupe_key),
+            ).fetchone()
+            if existing is not None:
+                return dict(existing), True
+            job_id = uuid.uuid4().hex
+            conn.execute(
+                "INSERT INTO job (id, user_id, dedupe_key, request, status, created_at) VALUES (?, ?, ?, ?, 'queued', ?)",
+                (job_id, int(user_id), dedupe_key, json.dumps(request), time.time()),
+            )
+            return dict(conn.execute("SELECT * FROM job WHERE id = ?", (job_id,)).fetchone()), False
+
+    def get(self, job_id: str, user_id: Optional[int] = None) -> Optional[dict]:
+        with self._connect() as conn:
+            if user_id is None:
+                row = conn.execute("SELECT * FROM job WHERE id = ?", (job_id,)).fetchone()
+            else:
+                row = conn.execute("SELECT * FROM job WHERE id = ? AND user_id = ?", (job_id, int(user_id))).fetchone()
+        return dict(row) if row is not None else None
+
+    def cancel(self, job_id: str, user_id: int) -> Optional[dict]:
+        """Anuluje zadanie w kolejce od razu; renderowane przerywa proces przy następnym etapie"""
+        with self._connect(immediate=True) as conn:
+            conn.execute(
+                "UPDATE job SET status = 'cancelled', finished_at = ? "
+                "WHERE id = ? AND user_id = ? AND status IN ('queued', 'running')",
+                (time.time(), job_id, int(user_id)),
+            )
+            row = conn.execute("SELECT * FROM job WHERE id = ? AND user_id = ?", (job_id, int(user_id))).fetchone()
+        return dict(row) if row is not None else None
+
+    # --- Wykonanie ---
+
+    def claim(self, worker: str) -> Optional[dict]:
+        """Najstarsze zadanie z kolejki oznaczone jako wykonywane przez workera"""
+        now = time.time()
+        with self._connect(immediate=True) as conn:
+            row = conn.execute(
+                "UPDATE job SET status = 'running', stage = NULL, worker = ?, attempts = attempts + 1, "
+                "started_at = ?, heartbeat_at = ? "
+                "WHERE id = (SELECT id FROM job WHERE status = 'queued' ORDER BY created_at LIMIT 1) RETURNING *",
+                (worker, now, now),
+            ).fetchone()
+        return dict(row) if row is not None else None
+
+    def heartbeat(self, job_id: str) -> None:
+        with self._connect() as conn:
+            conn.execute("UPDATE job SET heartbeat_at = ? WHERE id = ? AND status = 'running'", (time.time(), job_id))
+
+    def progress(self, job_id: str, stage: str) -> None:
+        """Etap renderowania (wołane z procesu renderującego); JobCancelled, gdy zadanie anulowano"""
+        stage = STAGES.get(stage, stage)
+        with self._connect() as conn:
+            row = conn.execute("SELECT status, stage FROM job WHERE id = ?", (job_id,)).fetchone()
+            if row is None or row["status"] == "cancelled":
+                raise JobCancelled(job_id)
+            if row["stage"] != stage:
+                conn.execute("UPDATE job SET stage = ?, heartbeat_at = ? WHERE id = ?", (stage, time.time(), job_id))
+
+    def requeue(self, job_id: str) -> None:
+        """Zwraca zadanie do kolejki bez liczenia próby (np. pełna pula renderująca)"""
+        with self._connect() as conn:
+            conn.execute("UPDATE job SET status = 'queued', stage = NULL, worker = NULL, attempts = attempts - 1 "
+                         "WHERE id = ? AND status = 'running'", (job_id,))
+
+    def finish(self, job_id: str, content: bytes, media_type: str, meta: dict) -> None:
+        path = self.result_path(job_id)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+        with self._connect() as conn:
+            updated = conn.execute(
+                "UPDATE job SET status = 'done', stage = NULL, media_type = ?, meta = ?, finished_at = ? "
+                "WHERE id = ? AND status = 'running'",
+                (media_type, json.dumps(meta, default=str), time.time(), job_id),
+            ).rowcount
+        if not updated:  # Anulowane w międzyczasie
+            self._remove_result(job_id)
+
+    def fail(self, job_id: str, error: str) -> None:
+        with self._connect() as conn:
+            conn.execute("UPDATE job SET status = 'failed', stage = NULL, error = ?, finished_at = ? "
+                         "WHERE id = ? AND status = 'running'", (error, time.time(), job_id))
+
+    def recover(self, stale_seconds: float = JOB_STALE_SECONDS) -> int:
+        """Zadania porzucone przez martwe workery wracają do kolejki (po JOB_MAX_ATTEMPTS - błąd)"""
+        now = time.time()
+        with self._connect(immediate=True) as conn:
+            conn.execute(
+                "UPDATE job SET status = 'failed', error = 'Worker stopped while rendering', finished_at = ? "
+                "WHERE status = 'running' AND heartbeat_at < ? AND attempts >= ?",
+                (now, now - stale_seconds, JOB_MAX_ATTEMPTS),
+            )
+            return conn.execute(
+                "UPDATE job SET status = 'queued', stage = NULL, worker = NULL "
+                "WHERE status = 'running' AND heartbeat_at < ?",
+                (now - stale_seconds,),
+            ).rowcount
+
+    def purge(self, retention_seconds: float = JOB_RETENTION_SECONDS) -> int:
+        """Usuwa stare zakończone zadania razem z plikami wyników"""
+        with self._connect(immediate=True) as conn:
+            rows = conn.execute(
+                "DELETE FROM job WHERE status IN ('done', 'failed', 'cancelled') AND finished_at < ? RETURNING id",
+                (time.time() - retention_seconds,),
+            ).fetchall()
+        for row in rows:
+            self._remove_result(row["id"])
+        return len(rows)
+
+    # --- Wyniki ---
+
+    def result_path(self, job_id: str) -> str:
+        return os.path.join(self.result_dir, uuid.UUID(hex=job_id).hex)
+
+    def _remove_result(self, job_id: str) -> None:
+        try:
+            os.remove(self.result_path(job_id))
+        except FileNotFoundError:
+            pass
+
+    def counts(self) -> dict:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) AS n FROM job GROUP BY status").fetchall()
+        return {status: 0 for status in ACTIVE + FINISHED} | {row["status"]: row["n"] for row in rows}
+
+
+def progress_of(job: dict) -> float:
+    if job["status"] == "running":
+        return PROGRESS.get(job.get("stage") or "queued", 0.0)
+    return PROGRESS.get(job["status"], 1.0)
+
+
+job_queue = JobQueue()
@@ -0,0 +1,21 @@
+import logging
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Domyślnie tylko ostrzeżenia - komunikaty debug (np. ścieżki uwierzytelniania) są wyłączone
+LOG_LEVEL = os.getenv("LOG_LEVEL", "WARNING").upper()
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger aplikacji z poziomem z LOG_LEVEL i własnym handlerem na stderr"""
+    logger = logging.getLogger(name)
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(name)s] %(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(LOG_LEVEL)
+        logger.propagate = False
+    return logger
@@ -0,0 +1,284 @@
+"""
+Metryki w formacie tekstowym Prometheusa (bez zależności zewnętrznych).
+
+Każdy worker uvicorna ma własny rejestr - /metrics pokazuje stan procesu,
+który obsłużył zapytanie. Procesy renderujące nie zapisują metryk same:
+mierzą etapy do słownika w metadanych zadania, a worker API je rejestruje.
+"""
+import asyncio
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterable, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Co ile sekund sprawdzamy opóźnienie pętli zdarzeń
+LOOP_LAG_INTERVAL = float(os.getenv("METRICS_LOOP_LAG_INTERVAL", "0.5"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+THROUGHPUT_BUCKETS = tuple(2 ** i * 1024 * 1024 for i in range(-2, 10))  # 256 KiB/s .. 512 MiB/s
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(n, "")) for n in self.label_names)
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.label_names, k)} {_format_value(v)}" for k, v in items]
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}", *self.samples()]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set_total(self, value: float, **labels) -> None:
+        """Dla liczników prowadzonych gdzie indziej (np. trafienia w statystykach cache)"""
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = (),
+                 buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series: dict[tuple, list] = {}  # klucz -> [liczniki kubełków, suma, liczba]
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            items = [(k, list(s[0]), s[1], s[2]) for k, s in self._series.items()]
+        lines = []
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound) if math.isinf(bound) else bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: list[_Metric] = []
+        self._collectors: list[Callable[[], None]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def on_collect(self, collector: Callable[[], None]) -> Callable[[], None]:
+        """Funkcja odświeżająca metryki odczytywane ze statystyk innych modułów (przy każdym odczycie)"""
+        self._collectors.append(collector)
+        return collector
+
+    def render(self) -> str:
+        for collector in self._collectors:
+            collector()
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUEST_LATENCY = registry.register(Histogram(
+    "http_request_duration_seconds", "Czas obsługi żądania HTTP", ("method", "route", "status")))
+REQUESTS_IN_PROGRESS = registry.register(Gauge(
+    "http_requests_in_progress", "Żądania HTTP w toku"))
+RENDER_STAGE = registry.register(Histogram(
+    "render_stage_seconds", "Czas etapów renderowania wykresu", ("kind", "stage"), STAGE_BUCKETS))
+UPLOAD_BYTES = registry.register(Counter(
+    "upload_bytes_total", "Bajty zapisane z uploadów"))
+UPLOAD_SECONDS = registry.register(Histogram(
+    "upload_stream_seconds", "Czas strumieniowania uploadu na dysk"))
+UPLOAD_THROUGHPUT = registry.register(Histogram(
+    "upload_throughput_bytes_per_second", "Przepustowość pojedynczego uploadu", buckets=THROUGHPUT_BUCKETS))
+PARSE_SECONDS = registry.register(Histogram(
+    "dataset_parse_seconds", "Czas parsowania CSV do ramki danych", ("result",)))
+PROFILE_SECONDS = registry.register(Histogram(
+    "dataset_profile_seconds", "Czas profilowania kolumn po parsowaniu"))
+PARSE_ROWS = registry.register(Counter(
+    "dataset_parse_rows_total", "Wiersze sparsowane z uploadów"))
+CACHE_HITS = registry.register(Counter(
+    "cache_hits_total", "Trafienia w cache", ("cache",)))
+CACHE_MISSES = registry.register(Counter(
+    "cache_misses_total", "Chybienia w cache", ("cache",)))
+CACHE_HIT_RATIO = registry.register(Gauge(
+    "cache_hit_ratio", "Udział trafień w cache od startu workera", ("cache",)))
+CACHE_ENTRIES = registry.register(Gauge(
+    "cache_entries", "Liczba wpisów w pamięci cache", ("cache",)))
+DB_POOL = registry.register(Gauge(
+    "db_pool_connections", "Połączenia w puli bazy danych", ("engine", "state")))
+RENDER_POOL = registry.register(Gauge(
+    "render_pool_jobs", "Zadania w puli renderującej", ("state",)))
+LOOP_LAG = registry.register(Gauge(
+    "event_loop_lag_last_seconds", "Ostatnie opóźnienie pętli zdarzeń"))
+LOOP_LAG_HISTOGRAM = registry.register(Histogram(
+    "event_loop_lag_seconds", "Rozkład opóźnień pętli zdarzeń", buckets=STAGE_BUCKETS))
+RENDER_JOBS = registry.register(Gauge(
+    "render_jobs", "Zadania w trwałej kolejce renderowania", ("status",)))
+
+
+class StageTimings(dict):
+    """Słownik czasów etapów, który dodatkowo zgłasza początek etapu (postęp zadań w tle)"""
+
+    def __init__(self, on_start: Callable[[str], None]):
+        super().__init__()
+        self.on_start = on_start
+
+    def __reduce__(self):
+        return dict, (dict(self),)  # Do workera API wraca jako zwykły słownik
+
+
+def stage_started(timings: Optional[dict], stage: str) -> None:
+    if isinstance(timings, StageTimings):
+        timings.on_start(stage)
+
+
+@contextmanager
+def timed(timings: Optional[dict], stage: str):
+    """Dolicza czas bloku do timings[stage] (używane również w procesach renderujących)"""
+    stage_started(timings, stage)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+
+
+def observe_stages(kind: str, timings: Optional[dict]) -> None:
+    for stage, seconds in (timings or {}).items():
+        RENDER_STAGE.observe(seconds, kind=kind, stage=stage)
+
+
+def observe_upload(size: int, seconds: float) -> None:
+    UPLOAD_BYTES.inc(size)
+    UPLOAD_SECONDS.observe(seconds)
+    if seconds > 0:
+        UPLOAD_THROUGHPUT.observe(size / seconds)
+
+
+def observe_cache(name: str, stats: dict) -> None:
+    hits, misses = stats.get("hits", 0), stats.get("misses", 0)
+    CACHE_HITS.set_total(hits, cache=name)
+    CACHE_MISSES.set_total(misses, cache=name)
+    CACHE_HIT_RATIO.set(hits / (hits + misses) if hits + misses else 0.0, cache=name)
+    if "entries" in stats:
+        CACHE_ENTRIES.set(stats["entries"], cache=name)
+
+
+class MetricsMiddleware:
+    """Middleware ASGI mierzące czas żądań; etykietą jest szablon trasy, a nie konkretna ścieżka"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        REQUESTS_IN_PROGRESS.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUESTS_IN_PROGRESS.dec()
+            route = getattr(scope.get("route"), "path", "unmatched")
+            REQUEST_LATENCY.observe(time.perf_counter() - start,
+                                    method=scope["method"], route=route, status=status_code)
+
+
+async def monitor_loop_lag(interval: float = LOOP_LAG_INTERVAL) -> None:
+    """Mierzy, o ile później niż planowo budzi się pętla zdarzeń (blokujący kod w async)"""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lag = max(loop.time() - start - interval, 0.0)
+        LOOP_LAG.set(lag)
+        LOOP_LAG_HISTOGRAM.observe(lag)
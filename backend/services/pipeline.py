@@ -0,0 +1,256 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Iterable, Optional
+
+from dotenv import load_dotenv
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+
+load_dotenv()
+
+# Budżet pamięci na wyniki pośrednie kroków w jednym procesie
+PIPELINE_CACHE_BYTES = int(os.getenv("PIPELINE_CACHE_MB", "128")) * 1024 * 1024
+
+_KEEP = "\0keep"  # Klucz maski wierszy w cache (nie koliduje z nazwą kolumny)
+
+
+class PipelineError(ValueError):
+    """Nieprawidłowy krok przekształceń (np. nieznana kolumna)"""
+
+
+def inputs(step: dict) -> list[str]:
+    """Kolumny czytane przez krok"""
+    if step["op"] == "derive":
+        return [step["left"]] + ([step["right_column"]] if step.get("right_column") else [])
+    return list(step["columns"])
+
+
+def outputs(step: dict) -> list[str]:
+    """Kolumny zapisywane przez krok (dropna nie zmienia kolumn, tylko wiersze)"""
+    if step["op"] == "derive":
+        return [step["name"]]
+    if step["op"] == "dropna":
+        return []
+    return list(step["columns"])
+
+
+def validate(steps: list[dict], columns: Iterable[str]) -> list[str]:
+    """Sprawdza, czy każdy krok czyta istniejące kolumny; zwraca kolumny po całym potoku"""
+    available = [str(c) for c in columns]
+    for number, step in enumerate(steps, start=1):
+        missing = [c for c in inputs(step) if c not in available]
+        if missing:
+            raise PipelineError(f"Krok {number} ({step['op']}): nieznana kolumna {', '.join(missing)}")
+        available += [c for c in outputs(step) if c not in available]
+    return available
+
+
+def step_keys(fingerprint: str, steps: list[dict]) -> list[str]:
+    """
+    Klucze łańcuchowe: klucz kroku i zależy od danych i kroków 1..i,
+    więc zmiana kroku unieważnia tylko wyniki od tego kroku w górę
+    """
+    keys = [fingerprint]
+    for step in steps:
+        payload = json.dumps([keys[-1], step], sort_keys=True, default=str)
+        keys.append(hashlib.sha256(payload.encode()).hexdigest())
+    return keys
+
+
+def prune_profile(profile: Optional[dict], steps: list[dict]) -> Optional[dict]:
+    """Profil surowych danych bez kolumn zmienianych przez potok (ich statystyki są nieaktualne)"""
+    if not profile or not steps:
+        return profile
+    changed = {c for step in steps for c in outputs(step)}
+    return {**profile, "columns": {c: v for c, v in profile["columns"].items() if c not in changed}}
+
+
+class PipelineCache:
+    """LRU wyników pośrednich (kolumna lub maska wierszy po danym kroku) z limitem bajtów"""
+
+    def __init__(self, max_bytes: int = PIPELINE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[tuple[str, str], tuple[object, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, name: str):
+        with self._lock:
+            entry = self._entries.get((key, name))
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((key, name))
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: str, name: str, value) -> None:
+        size = int(value.nbytes)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop((key, name), None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[(key, name)] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "hits": self.hits, "misses": self.misses}
+
+
+pipeline_cache = PipelineCache()
+
+
+def _numeric(values: "pd.Series") -> "pd.Series":
+    import pandas as pd
+
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.astype(object)
+    return pd.to_numeric(values, errors="coerce").astype("float64")
+
+
+class _Evaluator:
+    """
+    Leniwe wykonanie potoku: kolumna po kroku i jest liczona tylko wtedy, gdy jest potrzebna.
+    Kroki, które jej nie zmieniają, przekazują dalej ten sam obiekt (bez kopiowania ramki).
+    Wszystkie kolumny mają długość surowego zbioru; dropna tylko zawęża maskę wierszy.
+    """
+
+    def __init__(self, df: "pd.DataFrame", steps: list[dict], keys: list[str], cache: PipelineCache):
+        self.df = df
+        self.steps = steps
+        self.keys = keys
+        self.cache = cache
+
+    def column(self, name: str, i: int) -> "pd.Series":
+        """Wartości kolumny po wykonaniu kroków 1..i"""
+        while i > 0 and name not in outputs(self.steps[i - 1]):
+            i -= 1
+        if i == 0:
+            if name not in self.df.columns:
+                raise PipelineError(f"Nieznana kolumna: {name}")
+            return self.df[name]
+        cached = self.cache.get(self.keys[i], name)
+        if cached is None:
+            cached = self._compute(self.steps[i - 1], name, i)
+            self.cache.put(self.keys[i], name, cached)
+        return cached
+
+    def keep(self, i: int) -> Optional["np.ndarray"]:
+        """Maska zachowanych wierszy po krokach 1..i (None - wszystkie wiersze)"""
+        while i > 0 and self.steps[i - 1]["op"] != "dropna":
+            i -= 1
+        if i == 0:
+            return None
+        cached = self.cache.get(self.keys[i], _KEEP)
+        if cached is None:
+            step = self.steps[i - 1]
+            cached = self.keep(i - 1)
+            for col in step["columns"]:
+                present = self.column(col, i - 1).notna().to_numpy()
+                cached = present if cached is None else cached & present
+            self.cache.put(self.keys[i], _KEEP, cached)
+        return cached
+
+    def _compute(self, step: dict, name: str, i: int) -> "pd.Series":
+        import numpy as np
+        import pandas as pd
+
+        op = step["op"]
+        if op == "derive":
+            left = _numeric(self.column(step["left"], i - 1))
+            if step.get("right_column"):
+                right = _numeric(self.column(step["right_column"], i - 1))
+            else:
+                right = float(step["right_value"])
+            with np.errstate(divide="ignore", invalid="ignore"):
+                result = {"+": left.add, "-": left.sub, "*": left.mul, "/": left.div}[step["operator"]](right)
+            return result.replace([np.inf, -np.inf], np.nan).rename(name)
+
+        values = self.column(name, i - 1)
+        keep = self.keep(i - 1)
+        kept = values if keep is None else values[keep]
+
+        if op == "fillna":
+            strategy = step.get("strategy", "value")
+            if strategy in ("ffill", "bfill"):
+                # Wypełnianie tylko z wierszy, które nie zostały usunięte wcześniejszym dropna
+                filled = kept.ffill() if strategy == "ffill" else kept.bfill()
+                if keep is None:
+                    return filled
+                result = values.copy()
+                result[keep] = filled
+                return result
+            if strategy == "value":
+                fill = step["value"]
+            elif strategy == "zero":
+                fill = 0
+            else:
+                if not pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values):
+                    raise PipelineError(f"fillna {strategy}: kolumna {name} nie jest liczbowa")
+                fill = kept.astype("float64").agg(strategy)
+            if isinstance(values.dtype, pd.CategoricalDtype) and fill not in values.cat.categories:
+                values = values.cat.add_categories([fill])
+            return values.fillna(fill)
+
+        if op == "scale":
+            numbers = _numeric(values)
+            sample = numbers if keep is None else numbers[keep]
+            if step.get("method", "minmax") == "zscore":
+                center, spread = sample.mean(), sample.std()
+            else:
+                center, spread = sample.min(), sample.max() - sample.min()
+            if not spread or np.isnan(spread):
+                return (numbers * 0.0).rename(name)  # Stała kolumna - wszystkie wartości 0
+            return ((numbers - center) / spread).rename(name)
+
+        if op == "cast":
+            target = step["to"]
+            if target == "int":
+                return _numeric(values).round().astype("Int64")
+            if target == "float":
+                return _numeric(values)
+            if target == "datetime":
+                return pd.to_datetime(values, errors="coerce")
+            if target == "category":
+                return values.astype("category")
+            return values.astype("string")
+
+        raise PipelineError(f"Nieznana operacja: {op}")
+
+
+def apply(df: "pd.DataFrame", steps: list[dict], columns: Iterable[str], fingerprint: str,
+          cache: PipelineCache = pipeline_cache) -> "pd.DataFrame":
+    """
+    Ramka z wybranymi kolumnami po wykonaniu potoku.
+    fingerprint to odcisk surowych danych - klucze kroków są od niego wyprowadzane.
+    """
+    import pandas as pd
+
+    if not steps:
+        return df
+    evaluator = _Evaluator(df, steps, step_keys(fingerprint, steps), cache)
+    names = list(dict.fromkeys(columns))
+    frame = pd.DataFrame({name: evaluator.column(name, len(steps)) for name in names}, copy=False)
+    keep = evaluator.keep(len(steps))
+    return frame if keep is None else frame[keep].reset_index(drop=True)
+
+
+def chart_columns(columns: dict) -> list[str]:
+    """Kolumny potrzebne do wykresu (z pól Columns)"""
+    names = []
+    for field in ("x_column", "y_columns", "category_column", "value_column"):
+        names += columns.get(field) or []
+    return names
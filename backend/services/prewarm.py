@@ -0,0 +1,28 @@
+import importlib
+import os
+import threading
+import time
+
+from services.logger import get_logger
+
+logger = get_logger("prewarm")
+
+# Moduły ładowane w tle po starcie workera, żeby pierwszy upload/wykres nie płacił za import
+PREWARM_MODULES = ("numpy", "pandas", "pyarrow", "pyarrow.parquet", "services.dtypes", "services.chart_data")
+PREWARM_ENABLED = os.getenv("PREWARM_IMPORTS", "true").lower() in ("1", "true", "yes")
+
+
+def _prewarm() -> None:
+    start = time.perf_counter()
+    for name in PREWARM_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            logger.warning("Prewarm import of %s failed: %s", name, e)
+    logger.info("Prewarmed %d modules in %.2fs", len(PREWARM_MODULES), time.perf_counter() - start)
+
+
+def start_background_prewarm() -> None:
+    """Importuje ciężkie biblioteki w wątku w tle - worker od razu przyjmuje żądania"""
+    if PREWARM_ENABLED:
+        threading.Thread(target=_prewarm, name="prewarm", daemon=True).start()
@@ -0,0 +1,148 @@
+import os
+from typing import TYPE_CHECKING, Optional
+
+from dotenv import load_dotenv
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+
+load_dotenv()
+
+PROFILE_VERSION = 1
+# Do tylu niepustych wartości liczba unikalnych jest dokładna, powyżej - estymacja HyperLogLog
+PROFILE_EXACT_DISTINCT_ROWS = int(os.getenv("PROFILE_EXACT_DISTINCT_ROWS", "100000"))
+# Rozmiar próbki, z której liczone są kwantyle dużych kolumn (błąd rzędu 1/sqrt(próbki))
+PROFILE_SAMPLE_ROWS = int(os.getenv("PROFILE_SAMPLE_ROWS", "100000"))
+PROFILE_TOP_VALUES = 10
+HLL_PRECISION = 14  # 2^14 rejestrów, błąd standardowy ~0.8%
+QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+
+
+def hll_distinct(values: "pd.Series", precision: int = HLL_PRECISION) -> int:
+    """Estymacja liczby unikalnych wartości (HyperLogLog na 64-bitowych hashach pandas)"""
+    import numpy as np
+    import pandas as pd
+
+    hashes = pd.util.hash_pandas_object(values, index=False).to_numpy()
+    m = 1 << precision
+    index = (hashes >> np.uint64(64 - precision)).astype(np.int64)
+    rest = hashes & np.uint64((1 << (64 - precision)) - 1)
+    # Pozycja pierwszej jedynki w pozostałych bitach (rest == 0 daje maksymalną wartość)
+    bit_length = np.zeros(len(rest), dtype=np.int64)
+    nonzero = rest > 0
+    bit_length[nonzero] = np.floor(np.log2(rest[nonzero].astype(np.float64))).astype(np.int64) + 1
+    rank = (64 - precision) - bit_length + 1
+
+    registers = np.zeros(m, dtype=np.int64)
+    np.maximum.at(registers, index, rank)
+    alpha = 0.7213 / (1 + 1.079 / m)
+    estimate = alpha * m * m / np.sum(np.exp2(-registers.astype(np.float64)))
+    empty = int(np.count_nonzero(registers == 0))
+    if estimate <= 2.5 * m and empty:
+        estimate = m * np.log(m / empty)  # Korekta dla małych liczności
+    return int(round(estimate))
+
+
+def _scalar(value):
+    """Wartość zgodna z JSON (NaN/inf -> None, daty w ISO 8601)"""
+    import math
+
+    if value is None:
+        return None
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    if hasattr(value, "item"):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def _kind(values: "pd.Series") -> str:
+    from pandas.api import types
+
+    if types.is_bool_dtype(values):
+        return "boolean"
+    if types.is_datetime64_any_dtype(values):
+        return "datetime"
+    if types.is_numeric_dtype(values):
+        return "number"
+    if isinstance(values.dtype, types.CategoricalDtype):
+        return "category"
+    return "text"
+
+
+def _quantiles(finite: "np.ndarray") -> tuple[dict, bool]:
+    import numpy as np
+
+    exact = len(finite) <= PROFILE_SAMPLE_ROWS
+    if not exact:
+        # Losowanie ze zwracaniem jest O(próbki), a nie O(n) jak permutacja
+        finite = finite[np.random.default_rng(0).integers(0, len(finite), PROFILE_SAMPLE_ROWS)]
+    values = np.quantile(finite, QUANTILES)
+    return {f"p{round(q * 100)}": float(v) for q, v in zip(QUANTILES, values)}, exact
+
+
+def profile_column(values: "pd.Series") -> dict:
+    import numpy as np
+
+    kind = _kind(values)
+    rows = len(values)
+    nulls = int(values.isna().sum())
+    non_null = values.dropna() if nulls else values
+    profile = {
+        "dtype": str(values.dtype),
+        "kind": kind,
+        "nulls": nulls,
+        "null_ratio": nulls / rows if rows else 0.0,
+    }
+
+    if kind in ("category", "boolean") or len(non_null) <= PROFILE_EXACT_DISTINCT_ROWS:
+        profile.update(distinct=int(non_null.nunique()), distinct_exact=True)
+    else:
+        profile.update(distinct=hll_distinct(non_null), distinct_exact=False)
+
+    if kind == "number":
+        numbers = values.to_numpy(dtype="float64", na_value=np.nan)
+        finite_mask = np.isfinite(numbers)
+        finite = numbers[finite_mask]
+        profile["infinite"] = int(np.count_nonzero(np.isinf(numbers)))
+        profile["sorted"] = bool(values.is_monotonic_increasing)
+        if len(finite):
+            quantiles, exact = _quantiles(finite)
+            profile.update(min=_scalar(finite.min()), max=_scalar(finite.max()), mean=_scalar(finite.mean()),
+                           std=_scalar(finite.std()), quantiles=quantiles, quantiles_exact=exact)
+    elif kind == "datetime":
+        profile["sorted"] = bool(values.is_monotonic_increasing)
+        if len(non_null):
+            profile.update(min=_scalar(non_null.min()), max=_scalar(non_null.max()))
+    elif kind in ("category", "boolean"):
+        top = non_null.value_counts(sort=True).head(PROFILE_TOP_VALUES)
+        profile["top"] = [{"value": _scalar(v), "count": int(c)} for v, c in top.items()]
+    return profile
+
+
+def profile_frame(df: "pd.DataFrame") -> dict:
+    """Profil wszystkich kolumn - liczony raz przy wczytywaniu, zapisywany obok zbioru"""
+    return {
+        "version": PROFILE_VERSION,
+        "rows": int(len(df)),
+        "columns": {str(col): profile_column(df.iloc[:, i]) for i, col in enumerate(df.columns)},
+    }
+
+
+def all_finite(profile: Optional[dict], *columns: str) -> bool:
+    """
+    Czy kolumny nie mają braków ani nieskończoności po zamianie na oś liczbową
+    (wtedy przy redukcji serii można pominąć maskę poprawnych wartości)
+    """
+    if not profile:
+        return False
+    for col in columns:
+        info = profile["columns"].get(col)
+        if info is None:
+            return False
+        if info["kind"] == "number" and (info["nulls"] or info.get("infinite")):
+            return False
+    return True
@@ -0,0 +1,183 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+
+from dotenv import load_dotenv
+from starlette.concurrency import run_in_threadpool
+
+from services.logger import get_logger
+
+load_dotenv()
+
+logger = get_logger("public_cache")
+
+PUBLIC_CACHE_ENTRIES = int(os.getenv("PUBLIC_CACHE_ENTRIES", "1024"))
+# Wpisy lokalne żyją krótko - inne workery nie widzą unieważnień z tego procesu
+PUBLIC_CACHE_LOCAL_TTL = float(os.getenv("PUBLIC_CACHE_LOCAL_TTL", "10"))
+PUBLIC_CACHE_SHARED_TTL = int(os.getenv("PUBLIC_CACHE_SHARED_TTL", "300"))
+# Np. redis://redis:6379/0. Unieważnienia między workerami wymagają Redisa - bez niego
+# działa tylko poziom lokalny, a zmiany widać w innych workerach po PUBLIC_CACHE_LOCAL_TTL.
+# memory:// - współdzielony poziom w pamięci procesu (MemoryTier), tylko do testów jednego workera
+PUBLIC_CACHE_REDIS_URL = os.getenv("PUBLIC_CACHE_REDIS_URL")
+# Czas przez jaki przeglądarka / nginx mogą trzymać odpowiedź bez pytania backendu
+PUBLIC_CACHE_MAX_AGE = int(os.getenv("PUBLIC_CACHE_MAX_AGE", "30"))
+
+_PREFIX = "public:"
+_GALLERY_GENERATION = _PREFIX + "gallery:generation"
+
+
+class MemoryTier:
+    """
+    Słownikowy odpowiednik Redisa (get/set z TTL, delete, incr) w pamięci jednego procesu.
+    Włączany tylko jawnie przez PUBLIC_CACHE_REDIS_URL=memory:// - workery nie dzielą tego stanu.
+    """
+
+    def __init__(self):
+        self._data: dict[str, tuple[float, bytes]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[0] and entry[0] <= time.monotonic():
+                del self._data[key]
+                return None
+            return entry[1]
+
+    def set(self, key: str, value: bytes, ex: Optional[int] = None) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + ex if ex else 0, value)
+
+    def delete(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            value = int(self._data.get(key, (0, b"0"))[1]) + 1
+            self._data[key] = (0, str(value).encode())
+            return value
+
+
+def _shared_tier():
+    if not PUBLIC_CACHE_REDIS_URL:
+        return None
+    if PUBLIC_CACHE_REDIS_URL == "memory://":
+        return MemoryTier()
+    try:
+        import redis
+    except ImportError:
+        logger.warning("PUBLIC_CACHE_REDIS_URL is set but the redis package is missing; using local cache only")
+        return None
+    return redis.Redis.from_url(PUBLIC_CACHE_REDIS_URL, socket_timeout=0.5, socket_connect_timeout=0.5)
+
+
+class PublicCache:
+    """
+    Cache zserializowanych odpowiedzi publicznych projektów (read-through).
+
+    Poziom lokalny to LRU w procesie z krótkim TTL, poziom współdzielony to Redis
+    (opcjonalny; MemoryTier w testach). Strony galerii są kluczowane numerem generacji,
+    więc każda zmiana projektu unieważnia wszystkie strony jednym INCR.
+    """
+
+    def __init__(self, shared=None, max_entries: int = PUBLIC_CACHE_ENTRIES,
+                 local_ttl: float = PUBLIC_CACHE_LOCAL_TTL, shared_ttl: int = PUBLIC_CACHE_SHARED_TTL):
+        self.shared = shared if shared is not None else _shared_tier()  # None - tylko poziom lokalny
+        self.max_entries = max_entries
+        self.local_ttl = local_ttl
+        self.shared_ttl = shared_ttl
+        self._local: "OrderedDict[str, tuple[float, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def project_key(project_id: int) -> str:
+        return f"{_PREFIX}project:{int(project_id)}"
+
+    def gallery_key(self, cursor: Optional[str], limit: int) -> str:
+        generation = self._shared_call("get", _GALLERY_GENERATION) or b"0"
+        return f"{_PREFIX}gallery:{int(generation)}:{cursor or ''}:{int(limit)}"
+
+    @staticmethod
+    def etag(payload: bytes) -> str:
+        return '"' + hashlib.sha256(payload).hexdigest()[:32] + '"'
+
+    def _shared_call(self, method: str, *args, **kwargs):
+        # Awaria Redisa nie może zatrzymać galerii - wtedy po prostu czytamy z bazy
+        if self.shared is None:
+            return None
+        try:
+            return getattr(self.shared, method)(*args, **kwargs)
+        except Exception as e:
+            logger.warning("Shared public cache %s failed: %s", method, e)
+            return None
+
+    def _get_local(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._local[key]
+                return None
+            self._local.move_to_end(key)
+            return entry[1]
+
+    def _put_local(self, key: str, payload: bytes) -> None:
+        with self._lock:
+            self._local[key] = (time.monotonic() + self.local_ttl, payload)
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_entries:
+                self._local.popitem(last=False)
+
+    def get(self, key: str) -> Optional[bytes]:
+        payload = self._get_local(key)
+        if payload is None:
+            payload = self._shared_call("get", key)
+            if payload is not None:
+                self._put_local(key, payload)
+        with self._lock:
+            if payload is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return payload
+
+    def put(self, key: str, payload: bytes) -> None:
+        self._put_local(key, payload)
+        self._shared_call("set", key, payload, ex=self.shared_ttl)
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Optional[bytes]]]) -> Optional[bytes]:
+        """Zwraca odpowiedź z cache albo wylicza ją loaderem i zapisuje (None nie jest cache'owane)"""
+        payload = await run_in_threadpool(self.get, key)
+        if payload is not None:
+            return payload
+        payload = await loader()
+        if payload is not None:
+            await run_in_threadpool(self.put, key, payload)
+        return payload
+
+    def invalidate_project(self, project_id: int) -> None:
+        """Usuwa projekt i wszystkie strony galerii (wywoływane z funkcji CRUD po zmianach)"""
+        key = self.project_key(project_id)
+        with self._lock:
+            self._local.pop(key, None)
+            for local_key in [k for k in self._local if k.startswith(_PREFIX + "gallery:")]:
+                del self._local[local_key]
+        self._shared_call("delete", key)
+        self._shared_call("incr", _GALLERY_GENERATION)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._local), "hits": self.hits, "misses": self.misses}
+
+
+public_cache = PublicCache()
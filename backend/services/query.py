@@ -0,0 +1,242 @@
+import hashlib
+import json
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    import pandas as pd
+    import pyarrow as pa
+
+_COMPARISONS = ("==", "!=", "<", "<=", ">", ">=")
+_ORDERED = ("<", "<=", ">", ">=", "between")
+
+
+class QueryError(ValueError):
+    """Filtr nie pasuje do danych (nieznana kolumna, wartość innego typu)"""
+
+
+def needed_columns(chart_columns: list[str], query: Optional[dict]) -> list[str]:
+    """Kolumny wykresu i kolumny filtrów, bez powtórzeń"""
+    names = list(chart_columns)
+    for flt in (query or {}).get("filters") or []:
+        names.append(flt["column"])
+    return list(dict.fromkeys(names))
+
+
+def scoped_fingerprint(fingerprint: str, query: Optional[dict]) -> str:
+    """
+    Odcisk podzbioru wierszy - klucze pochodnych cache (grupowania, indeksy sortowania)
+    nie mogą mieszać wyników dla całego zbioru i dla wyniku filtrowania
+    """
+    if not query:
+        return fingerprint
+    payload = json.dumps([fingerprint, query], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+# --- Dokładne filtrowanie w pandas ---
+
+def _kind(values: "pd.Series") -> str:
+    from pandas.api import types
+
+    if types.is_bool_dtype(values):
+        return "boolean"
+    if types.is_datetime64_any_dtype(values):
+        return "datetime"
+    if types.is_numeric_dtype(values):
+        return "number"
+    return "text"
+
+
+def _coerce(value, kind: str, column: str, tz=None):
+    """Wartość z żądania (JSON) w typie kolumny"""
+    import pandas as pd
+
+    try:
+        if kind == "number":
+            if isinstance(value, bool):
+                raise ValueError(value)
+            return float(value)
+        if kind == "datetime":
+            stamp = pd.Timestamp(value)
+            if tz is not None and stamp.tzinfo is None:
+                stamp = stamp.tz_localize(tz)
+            return stamp
+        if kind == "boolean":
+            if isinstance(value, bool):
+                return value
+            return {"true": True, "false": False}[str(value).lower()]
+        return str(value)
+    except (ValueError, TypeError, KeyError):
+        raise QueryError(f"Nieprawidłowa wartość filtra dla kolumny {column}: {value!r}")
+
+
+def _mask(df: "pd.DataFrame", flt: dict) -> "pd.Series":
+    import pandas as pd
+
+    column, op, value = flt["column"], flt["op"], flt.get("value")
+    if column not in df.columns:
+        raise QueryError(f"Nieznana kolumna filtra: {column}")
+    values = df[column]
+    if op == "is_null":
+        return values.isna()
+    if op == "not_null":
+        return values.notna()
+
+    kind = _kind(values)
+    tz = getattr(values.dtype, "tz", None)
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        kind = _kind(pd.Series(values.cat.categories))
+        if op in _ORDERED:
+            values = values.astype(object)  # Porządek wartości zamiast kolejności kategorii
+    if op in ("in", "not_in"):
+        result = values.isin([_coerce(v, kind, column, tz) for v in value])
+        return result if op == "in" else ~result & values.notna()
+    if op == "between":
+        low, high = (_coerce(v, kind, column, tz) for v in value)
+        try:
+            return (values >= low) & (values <= high)
+        except TypeError:
+            raise QueryError(f"Kolumna {column} nie obsługuje porównań zakresu")
+
+    target = _coerce(value, kind, column, tz)
+    try:
+        if op == "==":
+            return values == target
+        if op == "!=":
+            return (values != target) & values.notna()
+        if op == "<":
+            return values < target
+        if op == "<=":
+            return values <= target
+        if op == ">":
+            return values > target
+        return values >= target
+    except TypeError:
+        raise QueryError(f"Kolumna {column} nie obsługuje operatora {op}")
+
+
+def filter_frame(df: "pd.DataFrame", query: Optional[dict], columns: Optional[list[str]] = None) -> "pd.DataFrame":
+    """Zakres wierszy, potem filtry (AND) i projekcja na potrzebne kolumny"""
+    import numpy as np
+
+    query = query or {}
+    rows = query.get("rows")
+    if rows:
+        df = df.iloc[rows["start"]:rows.get("stop")]
+    keep = None
+    for flt in query.get("filters") or []:
+        mask = _mask(df, flt).to_numpy(dtype=bool, na_value=False)
+        keep = mask if keep is None else keep & mask
+    if columns is not None:
+        missing = [c for c in columns if c not in df.columns]
+        if missing:
+            raise QueryError(f"Nieznana kolumna: {', '.join(missing)}")
+    if keep is not None and not np.all(keep):
+        # Jedno kopiowanie: wiersze i kolumny naraz
+        df = df.loc[keep, columns] if columns is not None else df[keep]
+    elif columns is not None:
+        df = df[columns]
+    return df.reset_index(drop=True) if (rows or keep is not None) else df
+
+
+# --- Push-down do pliku Parquet ---
+
+def _stat_kind(arrow_type: "pa.DataType") -> str:
+    import pyarrow as pa
+
+    if pa.types.is_dictionary(arrow_type):
+        arrow_type = arrow_type.value_type
+    if pa.types.is_boolean(arrow_type):
+        return "boolean"
+    if pa.types.is_timestamp(arrow_type) or pa.types.is_date(arrow_type):
+        return "datetime"
+    if pa.types.is_integer(arrow_type) or pa.types.is_floating(arrow_type):
+        return "number"
+    return "text"
+
+
+def _may_match(low, high, flt: dict, kind: str) -> bool:
+    """Czy grupa wierszy o wartościach w [low, high] może zawierać pasujące wiersze"""
+    import pandas as pd
+
+    op, value = flt["op"], flt.get("value")
+    if kind == "datetime":
+        low, high = pd.Timestamp(low), pd.Timestamp(high)
+    if op in ("in", "between"):
+        values = [_coerce(v, kind, flt["column"]) for v in value]
+        if op == "between":
+            return values[0] <= high and values[1] >= low
+        return any(low <= v <= high for v in values)
+    if op not in _COMPARISONS or op == "!=":
+        return True
+    target = _coerce(value, kind, flt["column"])
+    return {
+        "==": lambda: low <= target <= high,
+        "<": lambda: low < target,
+        "<=": lambda: low <= target,
+        ">": lambda: high > target,
+        ">=": lambda: high >= target,
+    }[op]()
+
+
+def _row_group_matches(row_group, positions: dict, fields: dict, filters: list[dict]) -> bool:
+    for flt in filters:
+        index = positions.get(flt["column"])
+        if index is None:
+            continue
+        stats = row_group.column(index).statistics
+        if flt["op"] == "is_null":
+            if stats is not None and stats.has_null_count and stats.null_count == 0:
+                return False
+            continue
+        if stats is None or not stats.has_min_max:
+            continue
+        try:
+            if not _may_match(stats.min, stats.max, flt, _stat_kind(fields[flt["column"]])):
+                return False
+        except (TypeError, QueryError):
+            continue  # Statystyki nieporównywalne - decyduje dokładny filtr
+    return True
+
+
+def read_parquet(path: str, columns: list[str], query: Optional[dict]) -> tuple["pd.DataFrame", dict]:
+    """
+    Wczytuje z Parquet tylko potrzebne kolumny i grupy wierszy, które mogą spełniać
+    filtry (statystyki min/max i liczba braków) oraz nachodzą na zakres wierszy.
+    Zwraca (przefiltrowaną ramkę, statystyki odczytu).
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    query = query or {}
+    rows = query.get("rows") or {}
+    filters = query.get("filters") or []
+    start, stop = rows.get("start", 0), rows.get("stop")
+
+    parquet = pq.ParquetFile(path)
+    schema = parquet.schema_arrow
+    missing = [c for c in columns if schema.get_field_index(c) < 0]
+    if missing:
+        raise QueryError(f"Nieznana kolumna: {', '.join(missing)}")
+    metadata = parquet.metadata
+    positions = {metadata.schema.column(i).name: i for i in range(metadata.num_columns)}
+    fields = {name: schema.field(name).type for name in columns}
+
+    tables, offset, read = [], 0, 0
+    for i in range(metadata.num_row_groups):
+        row_group = metadata.row_group(i)
+        group_start, offset = offset, offset + row_group.num_rows
+        if offset <= start or (stop is not None and group_start >= stop):
+            continue
+        if not _row_group_matches(row_group, positions, fields, filters):
+            continue
+        read += 1
+        table = parquet.read_row_group(i, columns=columns)
+        # Przycięcie do zakresu wierszy na pozycjach z pliku (przed filtrami)
+        lo = max(start - group_start, 0)
+        hi = row_group.num_rows if stop is None else min(stop - group_start, row_group.num_rows)
+        tables.append(table.slice(lo, hi - lo))
+
+    stats = {"row_groups": metadata.num_row_groups, "row_groups_read": read}
+    table = pa.concat_tables(tables) if tables else schema.empty_table().select(columns)
+    return filter_frame(table.to_pandas(), {"filters": filters}, columns), stats
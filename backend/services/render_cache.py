@@ -0,0 +1,186 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+RENDER_CACHE_DIR = os.path.join(UPLOAD_DIR, "cache", "renders")
+RENDER_CACHE_MEMORY_BYTES = int(os.getenv("RENDER_CACHE_MEMORY_MB", "64")) * 1024 * 1024
+RENDER_CACHE_DISK_BYTES = int(os.getenv("RENDER_CACHE_DISK_MB", "512")) * 1024 * 1024
+# Zmiana sposobu rysowania wykresów wymaga podbicia wersji (unieważnia stare wpisy)
+RENDER_CACHE_VERSION = 5
+# Sprzątanie dysku schodzi do tego ułamka limitu, żeby kolejne zapisy nie przeglądały katalogu od razu
+_DISK_LOW_WATER = 0.9
+
+
+def make_key(fingerprint: str, chart_type: str, columns: dict, options: Optional[dict] = None) -> str:
+    """Klucz treści wykresu: hash (odcisk zbioru, typ wykresu, kolumny, opcje figury)"""
+    payload = {
+        "v": RENDER_CACHE_VERSION,
+        "dataset": fingerprint,
+        "chart_type": chart_type,
+        "columns": columns,
+        "options": options or {},
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class RenderCache:
+    """
+    Dwupoziomowy cache wyrenderowanych wykresów (pamięć procesu + dysk) z LRU.
+
+    Wpisy na dysku są pogrupowane według dataset_id, dzięki czemu zastąpienie
+    zbioru danych usuwa wszystkie jego wykresy jednym wywołaniem.
+    """
+
+    def __init__(self, root: str = RENDER_CACHE_DIR,
+                 memory_bytes: int = RENDER_CACHE_MEMORY_BYTES,
+                 disk_bytes: int = RENDER_CACHE_DISK_BYTES):
+        self.root = root
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self._memory: "OrderedDict[str, tuple[bytes, dict, str]]" = OrderedDict()
+        self._memory_used = 0
+        # Bajty plików .bin na dysku: liczone raz przeglądem katalogu, potem aktualizowane przy zapisie
+        self._disk_used: Optional[int] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, dataset_id: str, key: str, suffix: str = ".bin") -> str:
+        return os.path.join(self.root, dataset_id, key + suffix)
+
+    def get(self, dataset_id: str, key: str) -> Optional[tuple[bytes, dict]]:
+        """Zwraca (treść, metadane) wykresu albo None"""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry[0], entry[1]
+
+        path = self._path(dataset_id, key)
+        try:
+            with open(self._path(dataset_id, key, ".json"), encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(path, "rb") as f:
+                content = f.read()
+            os.utime(path)  # LRU na dysku po czasie modyfikacji
+        except (FileNotFoundError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        self._remember(dataset_id, key, content, meta)
+        with self._lock:
+            self.hits += 1
+        return content, meta
+
+    def put(self, dataset_id: str, key: str, content: bytes, meta: Optional[dict] = None) -> None:
+        meta = dict(meta or {})
+        self._remember(dataset_id, key, content, meta)
+
+        os.makedirs(os.path.join(self.root, dataset_id), exist_ok=True)
+        try:
+            replaced = os.path.getsize(self._path(dataset_id, key))
+        except FileNotFoundError:
+            replaced = 0
+        suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+        # Metadane zapisujemy przed treścią - odczyt zaczyna od metadanych
+        for path, data in ((self._path(dataset_id, key, ".json"), json.dumps(meta).encode()),
+                           (self._path(dataset_id, key), content)):
+            with open(path + suffix, "wb") as f:
+                f.write(data)
+            os.replace(path + suffix, path)
+        self._account_disk(len(content) - replaced)
+
+    def _remember(self, dataset_id: str, key: str, content: bytes, meta: dict) -> None:
+        size = len(content)
+        if size > self.memory_bytes:
+            return
+        with self._lock:
+            old = self._memory.pop(key, None)
+            if old is not None:
+                self._memory_used -= len(old[0])
+            self._memory[key] = (content, meta, dataset_id)
+            self._memory_used += size
+            while self._memory_used > self.memory_bytes and self._memory:
+                _, (evicted, _, _) = self._memory.popitem(last=False)
+                self._memory_used -= len(evicted)
+
+    def _account_disk(self, delta: int) -> None:
+        """
+        Katalog przeglądamy tylko przy pierwszym zapisie i po przekroczeniu limitu.
+        Zapisy innych procesów nie są liczone na bieżąco - przegląd przy sprzątaniu wyrównuje sumę.
+        """
+        with self._lock:
+            if self._disk_used is not None:
+                self._disk_used += delta
+            used = self._disk_used
+        if used is None:
+            used = self._scan_disk()[1]
+            with self._lock:
+                self._disk_used = used
+        if used > self.disk_bytes:
+            self._enforce_disk_limit()
+
+    def _scan_disk(self) -> tuple[list[tuple[float, int, str]], int]:
+        entries = []
+        total = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if not name.endswith(".bin"):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+        return entries, total
+
+    def _enforce_disk_limit(self) -> None:
+        entries, total = self._scan_disk()
+        if total > self.disk_bytes:
+            target = self.disk_bytes * _DISK_LOW_WATER
+            entries.sort()
+            for _, size, path in entries:
+                for victim in (path, path[:-len(".bin")] + ".json"):
+                    try:
+                        os.remove(victim)
+                    except FileNotFoundError:
+                        pass
+                total -= size
+                if total <= target:
+                    break
+        with self._lock:
+            self._disk_used = total
+
+    def invalidate_dataset(self, dataset_id: str) -> None:
+        """Usuwa wszystkie wykresy danego zbioru (np. po jego zastąpieniu)"""
+        with self._lock:
+            for key in [k for k, v in self._memory.items() if v[2] == dataset_id]:
+                content, _, _ = self._memory.pop(key)
+                self._memory_used -= len(content)
+            self._disk_used = None  # Przeliczenie przy następnym zapisie
+        shutil.rmtree(os.path.join(self.root, dataset_id), ignore_errors=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._memory),
+                "memory_bytes": self._memory_used,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+render_cache = RenderCache()
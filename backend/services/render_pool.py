@@ -0,0 +1,348 @@
+import asyncio
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import TYPE_CHECKING, Optional
+
+from dotenv import load_dotenv
+
+from services.logger import get_logger
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+load_dotenv()
+
+logger = get_logger("render_pool")
+
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", "2"))
+# Maksymalna liczba zadań w toku (wykonywanych + oczekujących) na jeden worker uvicorna
+RENDER_QUEUE_SIZE = int(os.getenv("RENDER_QUEUE_SIZE", "16"))
+RENDER_TIMEOUT_SECONDS = float(os.getenv("RENDER_TIMEOUT_SECONDS", "60"))
+RENDER_START_METHOD = os.getenv("RENDER_START_METHOD", "spawn")
+# Wykres, który przekroczył czas, jest przez tyle sekund odrzucany od razu (ponowienia po 504 nie zajmują workerów)
+RENDER_TIMEOUT_COOLDOWN_SECONDS = float(os.getenv("RENDER_TIMEOUT_COOLDOWN_SECONDS", "300"))
+
+
+class RenderPoolBusy(RuntimeError):
+    """Kolejka renderowania jest pełna"""
+
+
+class RenderTimeout(RuntimeError):
+    """Renderowanie przekroczyło limit czasu"""
+
+
+def _init_worker(pids=None) -> None:
+    """
+    Zgłasza PID procesu (_retire kończy go przy wymianie puli) i rozgrzewa go:
+    backend Agg, import matplotlib/pandas i pierwszy rysunek.
+    """
+    if pids is not None:
+        pids.put(os.getpid())
+    os.environ["MPLBACKEND"] = "Agg"
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import pandas  # noqa: F401
+    import crud.chart  # noqa: F401
+
+    plt.figure()
+    plt.plot([0, 1], [0, 1])
+    plt.close("all")
+
+
+def _warmup() -> int:
+    return os.getpid()
+
+
+def _timings(job_id: Optional[str]) -> dict:
+    """Czasy etapów; dla zadania z kolejki początek etapu trafia też do kolejki jako postęp"""
+    if job_id is None:
+        return {}
+    from functools import partial
+
+    from services.jobs import job_queue
+    from services.metrics import StageTimings
+
+    return StageTimings(partial(job_queue.progress, job_id))
+
+
+def _load(user_id: int, dataset_id: str, columns: dict, timings: dict,
+          query: Optional[dict] = None) -> tuple["pd.DataFrame", str, Optional[dict]]:
+    """
+    Ramka, którą widzi wykres: kroki przekształceń zbioru, potem zakres wierszy i filtry.
+    Zwraca (ramkę, odcisk tych danych, aktualny profil).
+    """
+    from services import pipeline
+    from services import query as row_query
+    from services.dataset_store import dataset_store
+    from services.metrics import timed
+
+    profile = dataset_store.profile(user_id, dataset_id)
+    steps = dataset_store.pipeline(user_id, dataset_id)
+    needed = row_query.needed_columns(pipeline.chart_columns(columns), query)
+    df, pending = None, query
+    if query and not steps:
+        df = dataset_store.peek(user_id, dataset_id)
+        if df is None:
+            # Zbioru nie ma w pamięci - z pliku czytamy tylko potrzebne kolumny i grupy wierszy
+            try:
+                with timed(timings, "load"):
+                    df, _ = row_query.read_parquet(dataset_store.path(user_id, dataset_id), needed, query)
+            except FileNotFoundError:
+                df = None
+            else:
+                pending = None
+    if df is None:
+        with timed(timings, "load"):
+            df = dataset_store.load(user_id, dataset_id)
+    if steps:
+        with timed(timings, "transform"):
+            df = pipeline.apply(df, steps, needed, dataset_store.base_fingerprint(user_id, dataset_id))
+        profile = pipeline.prune_profile(profile, steps)
+    if pending:
+        with timed(timings, "filter"):
+            df = row_query.filter_frame(df, pending, needed)
+    return df, row_query.scoped_fingerprint(dataset_store.fingerprint(user_id, dataset_id), query), profile
+
+
+def render_job(user_id: int, dataset_id: str, chart_type: str, columns: dict,
+               max_points: Optional[int] = None, aggregation: str = "sum",
+               top_n: Optional[int] = None, fmt: str = "png",
+               figure: Optional[dict] = None, query: Optional[dict] = None,
+               resample: Optional[dict] = None, job_id: Optional[str] = None) -> tuple[str, object, dict]:
+    """
+    Zadanie wykonywane w procesie renderującym.
+
+    Zbiór danych przekazywany jest przez referencję (user_id, dataset_id) -
+    proces wczytuje plik Parquet przez własny DatasetStore zamiast
+    odbierać zpiklowaną ramkę danych.
+    job_id - zadanie z kolejki (services/jobs.py), któremu zgłaszane są kolejne etapy.
+    """
+    from crud.chart import create_plot
+    from schemas.chart import Columns, IMAGE_MEDIA_TYPES
+    from services.pipeline import PipelineError
+    from services.query import QueryError
+
+    meta = {"timings": _timings(job_id)}
+    try:
+        df, fingerprint, profile = _load(user_id, dataset_id, columns, meta["timings"], query)
+    except (PipelineError, QueryError) as e:
+        return "message", str(e), {}
+    result = create_plot(df, chart_type, Columns(**columns), max_points=max_points, meta=meta,
+                         aggregation=aggregation, top_n=top_n, dataset_id=dataset_id, fingerprint=fingerprint,
+                         fmt=fmt, profile=profile, resample=resample, **(figure or {}))
+    if isinstance(result, str):
+        return "message", result, meta
+    meta["media_type"] = IMAGE_MEDIA_TYPES[fmt]
+    return "image", result.getvalue(), meta
+
+
+def chart_data_job(user_id: int, dataset_id: str, chart_type: str, columns: dict,
+                   max_points: Optional[int] = None, aggregation: str = "sum", top_n: Optional[int] = None,
+                   output: str = "json", prefer_arrow: bool = False,
+                   figure: Optional[dict] = None, query: Optional[dict] = None,
+                   resample: Optional[dict] = None, job_id: Optional[str] = None) -> tuple[str, object, dict]:
+    """Zadanie trybu danych: zwraca zredukowane serie jako JSON lub Arrow IPC zamiast obrazu"""
+    from schemas.chart import Columns
+    from services.chart_data import CHART_TYPES, DEFAULT_WIDTH_PX, prepare_chart_data, serialize
+    from services.metrics import timed
+    from services.pipeline import PipelineError
+    from services.query import QueryError
+
+    if chart_type not in CHART_TYPES:
+        return "message", f"Nieznany typ wykresu: {chart_type}", {}
+    timings = _timings(job_id)
+    try:
+        df, fingerprint, profile = _load(user_id, dataset_id, columns, timings, query)
+    except (PipelineError, QueryError) as e:
+        return "message", str(e), {}
+    if df.empty:
+        return "message", "Brak danych do wygenerowania wykresu.", {}
+    width_px = (figure or {}).get("width", DEFAULT_WIDTH_PX)
+    with timed(timings, "prepare"):
+        chart = prepare_chart_data(df, chart_type, Columns(**columns), width_px, max_points=max_points,
+                                   aggregation=aggregation, top_n=top_n, dataset_id=dataset_id, fingerprint=fingerprint,
+                                   profile=profile, resample=resample)
+    if isinstance(chart, str):
+        return "message", chart, {}
+    with timed(timings, "encode"):
+        content, media_type = serialize(chart, output, prefer_arrow)
+    return "data", content, {**chart["meta"], "media_type": media_type, "timings": timings}
+
+
+class RenderPool:
+    """Pula wstępnie rozgrzanych procesów renderujących wykresy matplotlib"""
+
+    def __init__(self, workers: int = RENDER_WORKERS, queue_size: int = RENDER_QUEUE_SIZE,
+                 timeout: float = RENDER_TIMEOUT_SECONDS):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pids = None  # Kolejka, do której procesy bieżącej puli zgłaszają swoje PID-y
+        self._in_flight = 0
+        self._flights: "dict[str, asyncio.Future]" = {}  # klucz -> renderowanie w toku (single-flight)
+        self._timed_out: dict[str, tuple[float, float]] = {}  # klucz -> (odrzucany do, limit czasu)
+        self._lock = threading.Lock()
+        self.recycled = 0
+
+    def start(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                return
+            context = multiprocessing.get_context(RENDER_START_METHOD)
+            self._pids = context.SimpleQueue()
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(self._pids,),
+            )
+            executor = self._executor
+        # Uruchamia wszystkie procesy od razu, zamiast przy pierwszym żądaniu
+        for _ in range(self.workers):
+            executor.submit(_warmup)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _retire(self, executor: ProcessPoolExecutor) -> None:
+        """
+        Wymienia pulę na nową i kończy procesy starej - future.cancel() nie przerywa
+        zadania, które już się wykonuje. Pozostałe zadania starej puli kończą się
+        BrokenProcessPool i są wysyłane ponownie (submit).
+        """
+        with self._lock:
+            if self._executor is not executor:
+                return  # Wymieniona już przez inne żądanie
+            self._executor, pids = None, self._pids
+            self.recycled += 1
+        workers = set()
+        while not pids.empty():
+            workers.add(pids.get())
+        pids.close()
+        executor.shutdown(wait=False)
+        if not workers:
+            logger.error("Render pool retired without known worker processes - a stuck render may keep running")
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass  # Proces już się zakończył
+        self.start()
+
+    def _release(self, _future) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+    def _admit(self, key: Optional[str], timeout: float) -> ProcessPoolExecutor:
+        with self._lock:
+            if key is not None:
+                until, limit = self._timed_out.get(key, (0.0, 0.0))
+                if time.monotonic() < until and timeout <= limit:
+                    raise RenderTimeout("Render timed out recently")
+            if self._in_flight >= self.queue_size:
+                raise RenderPoolBusy("Render queue is full")
+            self._in_flight += 1
+            return self._executor
+
+    async def submit(self, fn, *args, timeout: Optional[float] = None, key: Optional[str] = None):
+        """
+        Wysyła zadanie do puli; RenderPoolBusy przy pełnej kolejce, RenderTimeout po przekroczeniu czasu.
+        key - klucz wyniku: żądania o klucz, który już się renderuje (np. ponowienie po rozłączeniu),
+        czekają na ten sam wynik, a klucz, który przekroczył czas, jest odrzucany
+        przez RENDER_TIMEOUT_COOLDOWN_SECONDS.
+        """
+        timeout = timeout or self.timeout
+        if key is None:
+            return await self._run(fn, *args, timeout=timeout, key=None)
+        flight = self._flights.get(key)
+        joined = flight is not None
+        if not joined:
+            # Renderowanie jest osobnym zadaniem - rozłączenie pierwszego klienta nie przerywa go pozostałym
+            flight = asyncio.ensure_future(self._run(fn, *args, timeout=timeout, key=key))
+            self._flights[key] = flight
+            flight.add_done_callback(self._land(key))
+        try:
+            # Limit czasu pierwszego żądania pilnuje _run; dołączające czekają najwyżej własny limit
+            return await asyncio.wait_for(asyncio.shield(flight), timeout if joined else None)
+        except asyncio.TimeoutError:
+            raise RenderTimeout("Render timed out")
+        except Exception as e:
+            from services.jobs import JobCancelled
+
+            if joined and isinstance(e, JobCancelled):
+                # Anulowano zadanie, do którego dołączyliśmy - to żądanie renderuje samo
+                return await self.submit(fn, *args, timeout=timeout, key=key)
+            raise
+
+    def _land(self, key: str):
+        def land(flight: asyncio.Future) -> None:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            if not flight.cancelled():
+                flight.exception()  # Błąd odebrany, nawet gdy wszyscy oczekujący się rozłączyli
+        return land
+
+    async def _run(self, fn, *args, timeout: float, key: Optional[str]):
+        deadline = time.monotonic() + timeout
+        self.start()
+        executor = self._admit(key, timeout)
+        try:
+            future = executor.submit(fn, *args)
+        except BrokenProcessPool:
+            self._release(None)
+            self._discard(executor)
+            return await self._run(fn, *args, timeout=timeout, key=key)
+        # Miejsce w kolejce zwalniamy dopiero, gdy proces naprawdę skończy pracę
+        future.add_done_callback(self._release)
+
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            if not future.cancelled():
+                # Zadanie już się wykonuje - bez wymiany puli zajmowałoby worker do końca
+                if key is not None:
+                    self._cool_down(key, timeout)
+                self._retire(executor)
+            raise RenderTimeout("Render timed out")
+        except BrokenProcessPool:
+            remaining = deadline - time.monotonic()
+            with self._lock:
+                replaced = self._executor is not executor
+            if replaced and remaining > 0:
+                # Pula wymieniona po przekroczeniu czasu przez inne zadanie - to zadanie było niewinne
+                return await self._run(fn, *args, timeout=remaining, key=key)
+            self._discard(executor)
+            raise
+
+    def _cool_down(self, key: str, timeout: float) -> None:
+        now = time.monotonic()
+        with self._lock:
+            for expired in [k for k, (until, _) in self._timed_out.items() if until <= now]:
+                del self._timed_out[expired]
+            self._timed_out[key] = (now + RENDER_TIMEOUT_COOLDOWN_SECONDS, timeout)
+
+    def _discard(self, executor: ProcessPoolExecutor) -> None:
+        """Zamyka zepsutą pulę, o ile nie została już wymieniona na nową"""
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"workers": self.workers, "in_flight": self._in_flight, "queue_size": self.queue_size,
+                    "running": self._executor is not None, "recycled": self.recycled}
+
+
+render_pool = RenderPool()
@@ -0,0 +1,205 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Pamięć na posortowane indeksy czasu w jednym procesie renderującym
+TIME_INDEX_CACHE_MB = int(os.getenv("TIME_INDEX_CACHE_MB", "256"))
+# Automatyczny kubełek: co najwyżej jeden punkt na tyle pikseli szerokości wykresu
+RESAMPLE_PX_PER_BUCKET = int(os.getenv("RESAMPLE_PX_PER_BUCKET", "2"))
+# Jawny kubełek nie może dać więcej punktów niż tyle (np. "1s" dla kilku lat danych)
+RESAMPLE_MAX_BUCKETS = int(os.getenv("RESAMPLE_MAX_BUCKETS", "200000"))
+
+RESAMPLE_AGGREGATIONS = ("mean", "sum", "min", "max", "count", "first", "last")
+# Kubełki dobierane automatycznie, od najmniejszego
+BUCKETS = ("1s", "5s", "10s", "15s", "30s", "1min", "5min", "10min", "15min", "30min",
+           "1h", "2h", "3h", "6h", "12h", "1d", "2d", "7d", "14d", "30d", "90d", "365d")
+_NAT = np.iinfo(np.int64).min
+
+
+def is_time_axis(values: pd.Series) -> bool:
+    return pd.api.types.is_datetime64_any_dtype(values)
+
+
+def _ns(values: pd.Series) -> np.ndarray:
+    """Znaczniki czasu jako int64 ns (kolumny ze strefą - w UTC), NaT jako minimum int64"""
+    return values.to_numpy(dtype="datetime64[ns]").view("int64")
+
+
+class TimeIndex:
+    """
+    Posortowane znaczniki czasu kolumny i permutacja wierszy, która je sortuje (None - dane już
+    posortowane). Wiersze z NaT są pominięte, więc okno czasu to dwa wyszukiwania binarne.
+    """
+
+    def __init__(self, values: np.ndarray, order: Optional[np.ndarray], rows: int, tz=None):
+        self.values = values
+        self.order = order
+        self.rows = rows
+        self.tz = tz
+
+    @classmethod
+    def build(cls, values: pd.Series) -> "TimeIndex":
+        stamps = _ns(values)
+        valid = stamps != _NAT
+        if valid.all() and np.all(stamps[1:] >= stamps[:-1]):
+            return cls(stamps, None, len(stamps), getattr(values.dtype, "tz", None))
+        positions = np.flatnonzero(valid)
+        order = positions[np.argsort(stamps[positions], kind="stable")]
+        return cls(stamps[order], order, len(stamps), getattr(values.dtype, "tz", None))
+
+    @property
+    def nbytes(self) -> int:
+        return self.values.nbytes + (self.order.nbytes if self.order is not None else 0)
+
+    def _bound(self, value) -> int:
+        """Granica okna z żądania w skali indeksu (daty bez strefy - w strefie kolumny)"""
+        stamp = pd.Timestamp(value)
+        if stamp.tzinfo is None and self.tz is not None:
+            stamp = stamp.tz_localize(self.tz)
+        if stamp.tzinfo is not None:
+            stamp = stamp.tz_convert("UTC").tz_localize(None)
+        return stamp.as_unit("ns").value
+
+    def window(self, start=None, end=None) -> tuple[int, int]:
+        """Pozycje [lo, hi) w posortowanym indeksie dla czasu w [start, end] - O(log n)"""
+        lo = 0 if start is None else int(np.searchsorted(self.values, self._bound(start), side="left"))
+        hi = len(self.values) if end is None else int(np.searchsorted(self.values, self._bound(end), side="right"))
+        return lo, max(lo, hi)
+
+    def take(self, df: pd.DataFrame, lo: int, hi: int) -> pd.DataFrame:
+        """Wiersze okna w kolejności czasu (dla posortowanych danych - wycinek bez permutacji)"""
+        if self.order is None:
+            return df.iloc[lo:hi]
+        return df.iloc[self.order[lo:hi]]
+
+
+class TimeIndexCache:
+    """
+    LRU indeksów czasu per (odcisk danych, kolumna) w procesie renderującym.
+    Odcisk obejmuje przekształcenia i filtry, więc kolejne okna na tych samych danych
+    nie sortują kolumny od nowa.
+    """
+
+    def __init__(self, max_bytes: int = TIME_INDEX_CACHE_MB * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[tuple[str, str], TimeIndex]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, fingerprint: str, column: str, values: pd.Series) -> TimeIndex:
+        key = (fingerprint, column)
+        with self._lock:
+            index = self._entries.get(key)
+            if index is not None and index.rows == len(values):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return index
+            self.misses += 1
+        index = TimeIndex.build(values)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.nbytes
+            if index.nbytes <= self.max_bytes:
+                self._entries[key] = index
+                self._bytes += index.nbytes
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+        return index
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "hits": self.hits, "misses": self.misses}
+
+
+time_index_cache = TimeIndexCache()
+
+
+def time_index(values: pd.Series, fingerprint: Optional[str] = None, column: Optional[str] = None) -> TimeIndex:
+    if fingerprint is None:
+        return TimeIndex.build(values)
+    return time_index_cache.get(fingerprint, column or str(values.name), values)
+
+
+# --- Agregacja w kubełkach czasu ---
+
+def choose_bucket(span_ns: int, width_px: int) -> str:
+    """Najmniejszy kubełek z BUCKETS, przy którym zakres czasu mieści się w szerokości wykresu"""
+    target = max(width_px // RESAMPLE_PX_PER_BUCKET, 1)
+    for bucket in BUCKETS:
+        if span_ns // pd.Timedelta(bucket).value < target:
+            return bucket
+    return BUCKETS[-1]
+
+
+def plan(index: TimeIndex, lo: int, hi: int, bucket: str, width_px: int, crowded: bool) -> Optional[str]:
+    """
+    Kubełek dla okna [lo, hi) albo None - bez agregacji.
+    "auto" agreguje tylko serie wymagające redukcji (crowded), "none" - nigdy.
+    """
+    if bucket == "none" or hi <= lo:
+        return None
+    span = int(index.values[hi - 1] - index.values[lo])
+    if bucket != "auto":
+        if span // pd.Timedelta(bucket).value >= RESAMPLE_MAX_BUCKETS:
+            raise ValueError(f"Kubełek {bucket} daje zbyt wiele punktów dla tego zakresu czasu")
+        return bucket
+    return choose_bucket(span, width_px) if crowded else None
+
+
+def _aggregate(values: np.ndarray, starts: np.ndarray, agg: str) -> np.ndarray:
+    """Agregacja w kolejnych kubełkach zaczynających się na pozycjach starts (braki pomijane)"""
+    valid = ~np.isnan(values)
+    if agg in ("min", "max"):
+        reduce = np.fmin if agg == "min" else np.fmax
+        return reduce.reduceat(values, starts)
+    if agg in ("first", "last"):
+        n = len(values)
+        positions = np.arange(n)
+        if agg == "first":
+            picked = np.minimum.reduceat(np.where(valid, positions, n), starts)
+            ends = np.r_[starts[1:], n]
+            found = picked < ends
+        else:
+            picked = np.maximum.reduceat(np.where(valid, positions, -1), starts)
+            found = picked >= starts
+        return np.where(found, values[np.clip(picked, 0, n - 1)], np.nan)
+    counts = np.add.reduceat(valid.astype("int64"), starts).astype("float64")
+    if agg == "count":
+        return counts
+    sums = np.add.reduceat(np.where(valid, values, 0.0), starts)
+    if agg == "sum":
+        return sums
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+
+def resample(df: pd.DataFrame, x_col: str, y_cols: list[str], bucket: str,
+             agg: str = "mean") -> tuple[pd.DatetimeIndex, dict]:
+    """
+    Wektorowa agregacja serii posortowanych po czasie w kubełkach stałej długości
+    (wyrównanych do epoki). Zwraca (początki niepustych kubełków, {kolumna: wartości}).
+    """
+    from services.downsample import as_numeric
+
+    if agg not in RESAMPLE_AGGREGATIONS:
+        raise ValueError(f"Nieobsługiwana agregacja: {agg}")
+    step = pd.Timedelta(bucket).value
+    buckets = _ns(df[x_col]) // step
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    x = pd.DatetimeIndex(buckets[starts] * step)
+    tz = getattr(df[x_col].dtype, "tz", None)
+    if tz is not None:
+        x = x.tz_localize("UTC").tz_convert(tz)
+    return x, {y: _aggregate(as_numeric(df[y]), starts, agg) for y in y_cols}
+